@@ -0,0 +1,365 @@
+"""
+Аналитика для /stats: поток заявок по дням, неделям и месяцам,
+медиана и 90-й перцентиль длительности ремонта, разбивки по мастерам
+и приоритетам.
+
+Запросы читают не requests, а сводки (миграция analytics_rollups
+в schema.py):
+  analytics_daily     — (день, приоритет): ряды, длительности, разбивка
+                        по приоритетам;
+  analytics_masters   — (месяц, мастер): разбивка по мастерам. Мастеров
+                        может быть много, поэтому она помесячная и фильтр
+                        дат для неё округляется до месяцев;
+и к каждой — гистограмма длительностей по корзинам DURATION_BUCKETS.
+Перцентиль оценивается по гистограмме — линейно внутри корзины, — так
+что запрос за любой период складывает строки сводки и ничего не сортирует.
+
+Сводки дозаполняются функцией refresh(): отметки в analytics_state
+хранят последние обработанные request_id и history_id, и каждый вызов
+учитывает только новые строки, пачками по CHUNK_SIZE. События:
+  создание   — новая строка requests, день — start_date;
+  завершение — строка request_history со сменой статуса на «Завершена»,
+               день — completion_date (если не указана — дата смены),
+               мастер — changed_by; заявки, загруженные сразу
+               завершёнными (импорт), учитываются так же по completion_date.
+Повторное завершение после возврата в работу считается ещё одним
+завершением. Длительность — от start_date до completion_date (или до
+смены статуса), в днях, как средняя длительность на /stats.
+
+refresh() берёт блокировку на запись, поэтому в веб-приложении его
+вызывает фоновый поток Refresher раз в REFRESH_INTERVAL секунд (и сразу
+по wake()), а /api/stats только читает сводки.
+
+Запуск из консоли (например, после импорта большой БД):
+    python analytics.py --db climate_repair.db
+"""
+import argparse
+import json
+import logging
+import sqlite3
+import threading
+
+from inventory import immediate
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUS = "Завершена"
+
+# Верхние границы корзин гистограммы длительностей, дней;
+# последняя корзина — «не меньше DURATION_BUCKETS[-1]»
+DURATION_BUCKETS = (1, 2, 3, 5, 7, 10, 14, 21, 30, 45, 60, 90, 180)
+
+PERIODS = {
+    "day": "day",
+    # Неделя обозначается датой её понедельника
+    "week": "DATE(day, '-6 days', 'weekday 1')",
+    "month": "SUBSTR(day, 1, 7)",
+}
+
+CHUNK_SIZE = 100_000
+REFRESH_INTERVAL = 60.0
+
+_BUCKET_SQL = "CASE " + " ".join(
+    f"WHEN days < {edge} THEN {i}" for i, edge in enumerate(DURATION_BUCKETS)
+) + f" ELSE {len(DURATION_BUCKETS)} END"
+
+# События между отметками: (day, master_key, priority, created, finished, days)
+_EVENTS_SQL = f"""
+    SELECT DATE(r.start_date) AS day, COALESCE(r.master_id, 0) AS master_key,
+           COALESCE(r.priority, 'Средний') AS priority, 1 AS created, 0 AS finished, NULL AS days
+    FROM requests r
+    WHERE r.request_id > :request_from AND r.request_id <= :request_to
+    UNION ALL
+    SELECT DATE(r.completion_date), COALESCE(r.master_id, 0), COALESCE(r.priority, 'Средний'), 0, 1,
+           MAX(0, JULIANDAY(r.completion_date) - JULIANDAY(r.start_date))
+    FROM requests r
+    WHERE r.request_id > :request_from AND r.request_id <= :request_to
+      AND r.request_status = '{FINISHED_STATUS}' AND r.completion_date IS NOT NULL
+      AND NOT EXISTS (
+          SELECT 1 FROM request_history h
+          WHERE h.request_id = r.request_id AND h.new_status = '{FINISHED_STATUS}'
+      )
+    UNION ALL
+    SELECT DATE(COALESCE(r.completion_date, h.changed_at)), COALESCE(h.changed_by, 0),
+           COALESCE(r.priority, 'Средний'), 0, 1,
+           MAX(0, JULIANDAY(COALESCE(r.completion_date, h.changed_at)) - JULIANDAY(r.start_date))
+    FROM request_history h
+    JOIN requests r ON r.request_id = h.request_id
+    WHERE h.history_id > :history_from AND h.history_id <= :history_to
+      AND h.new_status = '{FINISHED_STATUS}' AND h.old_status IS NOT '{FINISHED_STATUS}'
+"""
+
+# (сводка, её гистограмма, столбцы ключа, выражения ключа по событию)
+_ROLLUPS = (
+    ("analytics_daily", "analytics_daily_buckets", ("day", "priority"), ("day", "priority")),
+    ("analytics_masters", "analytics_master_buckets", ("month", "master_key"),
+     ("SUBSTR(day, 1, 7)", "master_key")),
+)
+
+
+def _next_chunk(conn, chunk_size):
+    """Границы следующей пачки от отметок analytics_state или None, если новых строк нет."""
+    marks = dict(conn.execute("SELECT name, last_id FROM analytics_state").fetchall())
+    request_from, history_from = marks.get("requests", 0), marks.get("history", 0)
+    request_max = conn.execute("SELECT COALESCE(MAX(request_id), 0) FROM requests").fetchone()[0]
+    history_max = conn.execute("SELECT COALESCE(MAX(history_id), 0) FROM request_history").fetchone()[0]
+    params = {
+        "request_from": request_from,
+        "request_to": max(request_from, min(request_max, request_from + chunk_size)),
+        "history_from": history_from,
+        "history_to": max(history_from, min(history_max, history_from + chunk_size)),
+    }
+    if params["request_to"] == request_from and params["history_to"] == history_from:
+        return None
+    return params
+
+
+def _add_events(conn):
+    """Прибавляет события из temp.analytics_events ко всем сводкам."""
+    for table, buckets, key, source in _ROLLUPS:
+        columns = ", ".join(key)
+        keys = ", ".join(source)
+        conn.execute(
+            f"""
+            INSERT INTO {table} ({columns}, created_count, finished_count, duration_sum)
+            SELECT {keys}, SUM(created), SUM(finished), TOTAL(days)
+            FROM temp.analytics_events WHERE day IS NOT NULL
+            GROUP BY {keys}
+            ON CONFLICT ({columns}) DO UPDATE SET
+                created_count = created_count + excluded.created_count,
+                finished_count = finished_count + excluded.finished_count,
+                duration_sum = duration_sum + excluded.duration_sum
+            """
+        )
+        conn.execute(
+            f"""
+            INSERT INTO {buckets} ({columns}, bucket, finished_count)
+            SELECT {keys}, {_BUCKET_SQL}, COUNT(*)
+            FROM temp.analytics_events WHERE day IS NOT NULL AND finished = 1
+            GROUP BY 1, 2, 3
+            ON CONFLICT ({columns}, bucket) DO UPDATE SET
+                finished_count = finished_count + excluded.finished_count
+            """
+        )
+
+
+def refresh(conn, chunk_size=CHUNK_SIZE):
+    """
+    Дозаполняет сводки новыми заявками и сменами статуса.
+    Каждая пачка — отдельная транзакция; если новых строк нет,
+    блокировка на запись не берётся. Возвращает число учтённых строк.
+    """
+    total = 0
+    while _next_chunk(conn, chunk_size) is not None:
+        with immediate(conn):
+            # Отметки перечитываются под блокировкой: параллельный refresh мог их сдвинуть
+            params = _next_chunk(conn, chunk_size)
+            if params is None:
+                break
+            conn.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS analytics_events "
+                "(day TEXT, master_key INTEGER, priority TEXT, created INTEGER, finished INTEGER, days REAL)"
+            )
+            conn.execute("DELETE FROM temp.analytics_events")
+            conn.execute(f"INSERT INTO temp.analytics_events {_EVENTS_SQL}", params)
+            _add_events(conn)
+            conn.execute("DELETE FROM temp.analytics_events")
+            conn.executemany(
+                "INSERT INTO analytics_state (name, last_id) VALUES (?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET last_id = excluded.last_id",
+                [("requests", params["request_to"]), ("history", params["history_to"])],
+            )
+        total += (params["request_to"] - params["request_from"]
+                  + params["history_to"] - params["history_from"])
+    return total
+
+
+class Refresher:
+    """Фоновый поток, который дозаполняет сводки аналитики."""
+
+    def __init__(self, db_path, interval=REFRESH_INTERVAL):
+        self.db_path = db_path
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.rows = 0
+        self.errors = 0
+
+    def run_once(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute("PRAGMA busy_timeout = 5000")
+            count = refresh(conn)
+        finally:
+            conn.close()
+        self.rows += count
+        return count
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except sqlite3.Error:
+                self.errors += 1
+                logger.exception("Ошибка дозаполнения сводок аналитики")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="analytics", daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        """Попросить поток дозаполнить сводки, не дожидаясь интервала."""
+        self._wake.set()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stats(self):
+        return {"running": self.running, "rows": self.rows, "errors": self.errors}
+
+
+def percentile(counts, q):
+    """
+    Оценка перцентиля q (0..1) по гистограмме {корзина: число}:
+    линейно внутри корзины; для последней, открытой, — её нижняя граница.
+    """
+    total = sum(counts.values())
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    for bucket in range(len(DURATION_BUCKETS) + 1):
+        count = counts.get(bucket, 0)
+        if count and seen + count >= rank:
+            low = DURATION_BUCKETS[bucket - 1] if bucket else 0
+            if bucket == len(DURATION_BUCKETS):
+                return float(low)
+            high = DURATION_BUCKETS[bucket]
+            return low + (high - low) * max(0.0, rank - seen) / count
+        seen += count
+    return float(DURATION_BUCKETS[-1])
+
+
+def _where(filters, column="day"):
+    """
+    Условие по датам и приоритету. Для помесячной сводки мастеров
+    (column="month") даты округляются до месяца, приоритет не применяется.
+    """
+    clauses, params = [], []
+    for name, op in (("date_from", ">="), ("date_to", "<=")):
+        if filters.get(name):
+            clauses.append(f"{column} {op} ?")
+            params.append(filters[name] if column == "day" else filters[name][:7])
+    if filters.get("priority") and column == "day":
+        clauses.append("priority = ?")
+        params.append(filters["priority"])
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def series(conn, period="day", filters=None):
+    """Созданные и завершённые заявки по периодам: [{"period", "created", "finished"}]."""
+    key = PERIODS[period]
+    where, params = _where(filters or {})
+    rows = conn.execute(
+        f"""
+        SELECT {key} AS period, SUM(created_count), SUM(finished_count)
+        FROM analytics_daily {where}
+        GROUP BY period ORDER BY period
+        """,
+        params,
+    ).fetchall()
+    return [{"period": row[0], "created": row[1], "finished": row[2]} for row in rows]
+
+
+def _duration_stats(finished, duration_sum, counts):
+    return {
+        "finished": finished,
+        "avg_days": duration_sum / finished if finished else None,
+        "p50_days": percentile(counts, 0.5),
+        "p90_days": percentile(counts, 0.9),
+    }
+
+
+def durations(conn, filters=None):
+    """Длительность ремонта за период: число, среднее, медиана и p90 (дни)."""
+    where, params = _where(filters or {})
+    finished, duration_sum = conn.execute(
+        f"SELECT COALESCE(SUM(finished_count), 0), TOTAL(duration_sum) FROM analytics_daily {where}",
+        params,
+    ).fetchone()
+    counts = dict(conn.execute(
+        f"SELECT bucket, SUM(finished_count) FROM analytics_daily_buckets {where} GROUP BY bucket",
+        params,
+    ).fetchall())
+    return _duration_stats(finished, duration_sum, counts)
+
+
+def breakdown(conn, dimension, filters=None):
+    """
+    Разбивка по "master" или "priority": для каждого значения — созданные,
+    завершённые, средняя длительность, медиана и p90.
+    """
+    table, buckets, key, _ = _ROLLUPS[1] if dimension == "master" else _ROLLUPS[0]
+    column = "master_key" if dimension == "master" else "priority"
+    where, params = _where(filters or {}, key[0])
+    totals = conn.execute(
+        f"""
+        SELECT {column}, SUM(created_count), SUM(finished_count), TOTAL(duration_sum)
+        FROM {table} {where}
+        GROUP BY {column}
+        """,
+        params,
+    ).fetchall()
+    histograms = {}
+    for value, bucket, count in conn.execute(
+        f"SELECT {column}, bucket, SUM(finished_count) FROM {buckets} {where} GROUP BY {column}, bucket",
+        params,
+    ):
+        histograms.setdefault(value, {})[bucket] = count
+
+    names = {}
+    if dimension == "master":
+        names = dict(conn.execute(
+            "SELECT user_id, fio FROM users WHERE user_id IN (SELECT value FROM json_each(?))",
+            (json.dumps([row[0] for row in totals]),),
+        ).fetchall())
+    result = []
+    for value, created, finished, duration_sum in totals:
+        item = {"key": value, "created": created}
+        if dimension == "master":
+            item["key"] = value or None
+            item["name"] = names.get(value, "— не назначен —")
+        item.update(_duration_stats(finished, duration_sum, histograms.get(value, {})))
+        result.append(item)
+    result.sort(key=lambda item: (-item["finished"], -item["created"]))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Дозаполнение сводок аналитики")
+    parser.add_argument("--db", required=True, help="путь к файлу БД")
+    args = parser.parse_args()
+
+    from schema import apply_migrations
+
+    conn = sqlite3.connect(args.db)
+    conn.execute("PRAGMA busy_timeout = 5000")
+    apply_migrations(conn)
+    print(f"Учтено строк: {refresh(conn)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Архив закрытых заявок: отдельный файл SQLite рядом с основной БД.
+
+Большинство заявок давно завершены или отменены, их почти не открывают,
+но они занимают индексы requests, по которым работают список заявок,
+сроки и поиск. Архивирование (archive_closed) переносит закрытые заявки
+старше ARCHIVE_AFTER_DAYS (по дате завершения, для отменённых — по дате
+заявки) вместе с комментариями, историей статусов, деталями и отзывами
+в архивную БД пачками по CHUNK_SIZE.
+
+Пачка переносится так. Соединение основной БД берёт блокировку на запись
+(BEGIN IMMEDIATE) и выбирает заявки; второе соединение — к архиву,
+с основной БД, подключённой как hot, — копирует их строки и фиксирует
+архив; затем первое удаляет заявки из основной БД и фиксирует её.
+Пока держится блокировка, заявки никто не меняет, а архив фиксируется
+раньше, поэтому при сбое между фиксациями заявка остаётся в обеих БД
+(её пересоздаст следующий запуск), но не теряется. Одна транзакция
+по двум файлам этого не гарантирует: в режиме WAL SQLite фиксирует
+их по отдельности, основную — первой.
+
+При удалении из основной БД:
+  * stats_summary не меняется — /stats считает и архивные заявки
+    (триггер удаления вычитает их, перенос заранее прибавляет обратно;
+    stats_summary.find_differences учитывает архив);
+  * сводки analytics.py — история, их перед переносом дозаполняют;
+  * у уведомлений о заявке снимается ссылка (related_request_id),
+    текст с номером заявки остаётся;
+  * полнотекстовый поиск архивные заявки больше не находит.
+
+Веб-приложение подключает архив к каждому соединению как archive
+(ATTACH, см. init_app), и список заявок с фильтром «включая архив»
+добавляет архивные строки (pagination.page_sql), только для чтения.
+
+Запуск из консоли (например, по расписанию):
+    python archive.py --db climate_repair.db --days 365
+"""
+import argparse
+import json
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+import analytics
+from db import DEFAULT_PRAGMAS
+from inventory import immediate
+from schema import apply_migrations
+
+ARCHIVE_AFTER_DAYS = 365
+CHUNK_SIZE = 500
+
+CLOSED_STATUSES = ("Завершена", "Отменена")
+
+# Переносимые таблицы -> первичный ключ; подчинённые — до requests
+ARCHIVED_TABLES = {
+    "comments": "comment_id",
+    "request_history": "history_id",
+    "request_parts": "request_part_id",
+    "reviews": "review_id",
+    "requests": "request_id",
+}
+
+# Индексы архива: страницы списка заявок (как в основной БД) и строки заявки
+ARCHIVE_INDEXES = {
+    "idx_archive_requests_date": "requests(start_date, request_id)",
+    "idx_archive_requests_status": "requests(request_status, start_date, request_id)",
+    "idx_archive_requests_client": "requests(client_id, start_date, request_id)",
+    "idx_archive_requests_master": "requests(master_id, start_date, request_id)",
+    "idx_archive_requests_tech_type": "requests(climate_tech_type, start_date, request_id)",
+    "idx_archive_comments_request": "comments(request_id)",
+    "idx_archive_history_request": "request_history(request_id)",
+    "idx_archive_parts_request": "request_parts(request_id)",
+    "idx_archive_reviews_request": "reviews(request_id)",
+}
+
+_CLOSED_PLACEHOLDERS = ", ".join("?" * len(CLOSED_STATUSES))
+
+
+def archive_path(db_path):
+    """Путь к архиву по умолчанию: climate_repair.db -> climate_repair_archive.db."""
+    return os.path.splitext(db_path)[0] + "_archive.db"
+
+
+def _columns(conn, schema, tables):
+    """{таблица: [(столбец, тип), ...]} таблиц схемы schema (main, archive, ...)."""
+    columns = {table: [] for table in tables}
+    rows = conn.execute(
+        f"SELECT m.name, p.name, p.type FROM {schema}.sqlite_master m, pragma_table_info(m.name, ?) p "
+        f"WHERE m.type = 'table' AND m.name IN ({', '.join('?' * len(tables))}) ORDER BY m.name, p.cid",
+        (schema, *tables),
+    )
+    for table, column, kind in rows:
+        columns[table].append((column, kind))
+    return columns
+
+
+def ensure_schema(conn, archive="archive", hot="main"):
+    """
+    Создаёт в схеме archive таблицы и индексы архива по образцу таблиц
+    схемы hot и добавляет столбцы, появившиеся в hot после создания архива.
+    Ограничений (внешних ключей, CHECK) в архиве нет: строки в нём уже проверены.
+    """
+    source = _columns(conn, hot, list(ARCHIVED_TABLES))
+    existing = _columns(conn, archive, list(ARCHIVED_TABLES))
+    statements = []
+    for table, key in ARCHIVED_TABLES.items():
+        have = {column for column, _ in existing[table]}
+        if not have:
+            definitions = [
+                f'"{column}" INTEGER PRIMARY KEY' if column == key else f'"{column}" {kind}'
+                for column, kind in source[table]
+            ]
+            if table == "requests":
+                definitions.append("archived_at TEXT")
+            statements.append(f"CREATE TABLE IF NOT EXISTS {archive}.{table} ({', '.join(definitions)})")
+        else:
+            statements += [
+                f'ALTER TABLE {archive}.{table} ADD COLUMN "{column}" {kind}'
+                for column, kind in source[table] if column not in have
+            ]
+    indexes = {row[0] for row in conn.execute(f"SELECT name FROM {archive}.sqlite_master WHERE type = 'index'")}
+    statements += [
+        f"CREATE INDEX IF NOT EXISTS {archive}.{name} ON {definition}"
+        for name, definition in ARCHIVE_INDEXES.items() if name not in indexes
+    ]
+    if statements:
+        # Отложенная транзакция: блокируется только архив (BEGIN IMMEDIATE
+        # взял бы на запись и основную БД)
+        conn.execute("BEGIN")
+        try:
+            for sql in statements:
+                conn.execute(sql)
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+
+def is_attached(conn):
+    return any(row[1] == "archive" for row in conn.execute("PRAGMA database_list"))
+
+
+def attach(conn, path):
+    """Подключает архив path к соединению как archive (файл создаётся при первом подключении)."""
+    if not is_attached(conn):
+        conn.execute("ATTACH DATABASE ? AS archive", (path,))
+    ensure_schema(conn)
+
+
+def _select_chunk(conn, cutoff, limit):
+    return [
+        row[0] for row in conn.execute(
+            f"""
+            SELECT request_id FROM requests
+            WHERE request_status IN ({_CLOSED_PLACEHOLDERS})
+              AND start_date < ? AND COALESCE(completion_date, start_date) < ?
+            LIMIT ?
+            """,
+            (*CLOSED_STATUSES, cutoff, cutoff, limit),
+        )
+    ]
+
+
+def _copy_chunk(archive_conn, batch):
+    """Копирует заявки batch (JSON-список id) и их строки из hot в архив и фиксирует архив."""
+    columns = _columns(archive_conn, "hot", list(ARCHIVED_TABLES))
+    # Отложенная транзакция пишет только в архив; hot заблокирована на запись conn
+    archive_conn.execute("BEGIN")
+    try:
+        for table in ARCHIVED_TABLES:
+            names = ", ".join(f'"{column}"' for column, _ in columns[table])
+            # Повторный перенос (после сбоя между фиксациями) заменяет прежнюю копию
+            archive_conn.execute(
+                f"DELETE FROM main.{table} WHERE request_id IN (SELECT value FROM json_each(?))", (batch,)
+            )
+            extra, values = ("", "") if table != "requests" else (", archived_at", ", DATETIME('now')")
+            archive_conn.execute(
+                f"INSERT INTO main.{table} ({names}{extra}) SELECT {names}{values} FROM hot.{table} "
+                "WHERE request_id IN (SELECT value FROM json_each(?))",
+                (batch,),
+            )
+    except BaseException:
+        archive_conn.rollback()
+        raise
+    archive_conn.commit()
+
+
+def _delete_chunk(conn, batch):
+    """Удаляет перенесённые заявки из основной БД (в уже открытой транзакции)."""
+    # Триггер stats_summary_delete вычтет заявки — заранее прибавляем их обратно
+    conn.execute(
+        """
+        INSERT INTO stats_summary (request_status, climate_tech_type, request_count, duration_count, duration_sum)
+        SELECT request_status, climate_tech_type, COUNT(*),
+               COUNT(JULIANDAY(completion_date) - JULIANDAY(start_date)),
+               COALESCE(SUM(JULIANDAY(completion_date) - JULIANDAY(start_date)), 0)
+        FROM requests WHERE request_id IN (SELECT value FROM json_each(?))
+        GROUP BY request_status, climate_tech_type
+        ON CONFLICT (request_status, climate_tech_type) DO UPDATE SET
+            request_count = request_count + excluded.request_count,
+            duration_count = duration_count + excluded.duration_count,
+            duration_sum = duration_sum + excluded.duration_sum
+        """,
+        (batch,),
+    )
+    conn.execute(
+        "UPDATE notifications SET related_request_id = NULL "
+        "WHERE related_request_id IN (SELECT value FROM json_each(?))",
+        (batch,),
+    )
+    for table in ARCHIVED_TABLES:
+        conn.execute(f"DELETE FROM {table} WHERE request_id IN (SELECT value FROM json_each(?))", (batch,))
+
+
+def archive_chunk(conn, archive_conn, cutoff, limit=CHUNK_SIZE):
+    """
+    Переносит до limit закрытых заявок, завершённых раньше cutoff (ГГГГ-ММ-ДД).
+    conn — основная БД, archive_conn — архив с основной БД, подключённой как hot.
+    Возвращает число перенесённых заявок.
+    """
+    with immediate(conn):
+        ids = _select_chunk(conn, cutoff, limit)
+        if ids:
+            batch = json.dumps(ids)
+            _copy_chunk(archive_conn, batch)
+            _delete_chunk(conn, batch)
+    return len(ids)
+
+
+def archive_closed(db_path, archive_db=None, days=ARCHIVE_AFTER_DAYS, chunk_size=CHUNK_SIZE, now=None):
+    """Переносит в архив все закрытые заявки старше days дней. Возвращает их число."""
+    cutoff = ((now or datetime.now()) - timedelta(days=days)).strftime("%Y-%m-%d")
+    conn = sqlite3.connect(db_path)
+    archive_conn = sqlite3.connect(archive_db or archive_path(db_path))
+    try:
+        for c in (conn, archive_conn):
+            for name, value in DEFAULT_PRAGMAS:
+                c.execute(f"PRAGMA {name} = {value}")
+        apply_migrations(conn)
+        archive_conn.execute("ATTACH DATABASE ? AS hot", (db_path,))
+        ensure_schema(archive_conn, archive="main", hot="hot")
+        # Сводки аналитики учитывают строки до их переноса
+        analytics.refresh(conn)
+
+        total = 0
+        while True:
+            count = archive_chunk(conn, archive_conn, cutoff, chunk_size)
+            total += count
+            if count < chunk_size:
+                return total
+    finally:
+        archive_conn.close()
+        conn.close()
+
+
+def init_app(app):
+    """Подключает архив к каждому соединению приложения (ARCHIVE_DATABASE или путь рядом с БД)."""
+    app.config.setdefault("ARCHIVE_DATABASE", None)
+
+    def attach_archive(conn):
+        main_file = conn.execute("PRAGMA database_list").fetchone()[2]
+        if main_file:
+            attach(conn, app.config["ARCHIVE_DATABASE"] or archive_path(main_file))
+
+    app.extensions.setdefault("db_on_connect", []).append(attach_archive)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Перенос закрытых заявок в архивную БД")
+    parser.add_argument("--db", required=True, help="путь к файлу БД")
+    parser.add_argument("--archive", help="путь к архиву (по умолчанию — рядом с БД, *_archive.db)")
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS,
+                        help="переносить заявки, закрытые раньше стольких дней назад")
+    parser.add_argument("--chunk", type=int, default=CHUNK_SIZE, help="заявок в одной транзакции")
+    args = parser.parse_args()
+
+    total = archive_closed(args.db, args.archive, args.days, args.chunk)
+    print(f"Перенесено в архив заявок: {total}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Автоматическое назначение мастеров на заявки.
+
+Кандидаты — активные специалисты, у которых в specializations есть тип
+оборудования заявки. Из них выбирается мастер с наименьшей нагрузкой
+с учётом квалификации: число открытых заявок делится на вес уровня
+(эксперт тянет втрое больше начинающего), при равенстве побеждает
+более опытный, затем меньший user_id. Если специалиста по типу
+оборудования нет, заявка остаётся без мастера.
+
+Нагрузка — счётчик открытых заявок на мастера в памяти процесса:
+он строится одним GROUP BY при первом обращении (rebuild) и дальше
+меняется вызовами apply_change на каждое назначение и смену статуса,
+без запросов к БД. Запись в БД из других процессов счётчик не видит —
+для этого есть rebuild() (в веб-приложении — /requests/assign с rebuild=1).
+
+Пакетный режим (assign_backlog) за один проход распределяет все
+открытые заявки без мастера и записывает назначения одним UPDATE.
+
+Запуск из консоли:
+    python assignment.py --db climate_repair.db
+"""
+import argparse
+import json
+import sqlite3
+import threading
+
+# Статусы, в которых заявка занимает мастера
+OPEN_STATUSES = ("Новая заявка", "В процессе ремонта", "Ожидание комплектующих")
+
+SKILL_WEIGHTS = {"Начальный": 1, "Средний": 2, "Эксперт": 3}
+
+_OPEN_PLACEHOLDERS = ", ".join("?" * len(OPEN_STATUSES))
+
+
+def _master_key(value):
+    """user_id мастера из БД или формы (строка) -> int или None."""
+    try:
+        return int(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _type_key(equipment_type):
+    return " ".join((equipment_type or "").split()).casefold()
+
+
+class AssignmentEngine:
+    """Выбор мастера и счётчики нагрузки для одной БД."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._load = None
+        # тип оборудования -> [(user_id, вес квалификации)]
+        self._candidates = None
+        self.assigned = 0
+        self.rebuilds = 0
+
+    def rebuild(self, conn):
+        """Перечитывает нагрузку мастеров и специализации из БД."""
+        load = dict(conn.execute(
+            f"""
+            SELECT master_id, COUNT(*) FROM requests
+            WHERE master_id IS NOT NULL AND request_status IN ({_OPEN_PLACEHOLDERS})
+            GROUP BY master_id
+            """,
+            OPEN_STATUSES,
+        ).fetchall())
+        candidates = {}
+        for user_id, equipment_type, skill in conn.execute(
+            """
+            SELECT s.user_id, s.equipment_type, s.skill_level
+            FROM specializations s
+            JOIN users u ON u.user_id = s.user_id
+            WHERE u.user_type = 'Специалист' AND u.is_active = 1
+            ORDER BY s.user_id
+            """
+        ):
+            weight = SKILL_WEIGHTS.get(skill, 1)
+            candidates.setdefault(_type_key(equipment_type), []).append((user_id, weight))
+        with self._lock:
+            self._load = load
+            self._candidates = candidates
+            self.rebuilds += 1
+
+    def invalidate(self):
+        """Сбросить состояние (сменились роли или специализации); перечитается при обращении."""
+        with self._lock:
+            self._load = None
+            self._candidates = None
+
+    def _ensure(self, conn):
+        if self._load is None:
+            self.rebuild(conn)
+
+    def load(self, conn, master_id):
+        self._ensure(conn)
+        with self._lock:
+            return self._load.get(master_id, 0)
+
+    def _choose(self, equipment_type):
+        """Мастер для типа оборудования или None; вызывается под self._lock."""
+        best = None
+        for user_id, weight in self._candidates.get(_type_key(equipment_type), ()):
+            key = (self._load.get(user_id, 0) / weight, -weight, user_id)
+            if best is None or key < best[0]:
+                best = (key, user_id)
+        return best[1] if best else None
+
+    def choose(self, conn, equipment_type):
+        """Кого назначить на заявку с таким оборудованием (без записи в БД)."""
+        self._ensure(conn)
+        with self._lock:
+            return self._choose(equipment_type)
+
+    def apply_change(self, old_master, old_status, new_master, new_status):
+        """
+        Учесть изменение заявки: мастер и/или статус были old_*, стали new_*.
+        Вызывается после успешной записи в БД.
+        """
+        old_master, new_master = _master_key(old_master), _master_key(new_master)
+        with self._lock:
+            if self._load is None:
+                return
+            if old_master is not None and old_status in OPEN_STATUSES:
+                self._load[old_master] = max(0, self._load.get(old_master, 0) - 1)
+            if new_master is not None and new_status in OPEN_STATUSES:
+                self._load[new_master] = self._load.get(new_master, 0) + 1
+
+    def assign_request(self, conn, request_id):
+        """
+        Назначает мастера на открытую заявку без мастера.
+        Пишет в уже открытой транзакции conn и не фиксирует её — в веб-приложении
+        это та же операция очереди записи, что и INSERT заявки.
+        Возвращает user_id назначенного мастера или None.
+        """
+        self._ensure(conn)
+        row = conn.execute(
+            "SELECT climate_tech_type, request_status, master_id FROM requests WHERE request_id = ?",
+            (request_id,),
+        ).fetchone()
+        if row is None or row[2] is not None or row[1] not in OPEN_STATUSES:
+            return None
+        with self._lock:
+            master_id = self._choose(row[0])
+            if master_id is None:
+                return None
+            # Место занимается сразу, чтобы параллельный выбор его учёл
+            self._load[master_id] = self._load.get(master_id, 0) + 1
+        try:
+            updated = conn.execute(
+                "UPDATE requests SET master_id = ?, updated_at = DATETIME('now') "
+                "WHERE request_id = ? AND master_id IS NULL",
+                (master_id, request_id),
+            ).rowcount
+        except BaseException:
+            self.apply_change(master_id, row[1], None, None)
+            raise
+        if not updated:
+            # Мастера успели назначить вручную
+            self.apply_change(master_id, row[1], None, None)
+            return None
+        self.assigned += 1
+        return master_id
+
+    def assign_backlog(self, conn, limit=None):
+        """
+        Распределяет открытые заявки без мастера, от старых к новым.
+        Возвращает {"assigned": n, "skipped": m} (skipped — нет подходящего специалиста).
+        """
+        self._ensure(conn)
+        sql = f"""
+            SELECT request_id, climate_tech_type, request_status FROM requests
+            WHERE master_id IS NULL AND request_status IN ({_OPEN_PLACEHOLDERS})
+            ORDER BY start_date, request_id
+        """
+        params = list(OPEN_STATUSES)
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        backlog = conn.execute(sql, params).fetchall()
+
+        plan = []
+        with self._lock:
+            for request_id, equipment_type, _ in backlog:
+                master_id = self._choose(equipment_type)
+                if master_id is not None:
+                    self._load[master_id] = self._load.get(master_id, 0) + 1
+                    plan.append((request_id, master_id))
+
+        updated = 0
+        if plan:
+            with conn:
+                updated = conn.execute(
+                    """
+                    UPDATE requests SET master_id = plan.master_id, updated_at = DATETIME('now')
+                    FROM (
+                        SELECT json_extract(value, '$[0]') AS request_id,
+                               json_extract(value, '$[1]') AS master_id
+                        FROM json_each(?)
+                    ) AS plan
+                    WHERE requests.request_id = plan.request_id AND requests.master_id IS NULL
+                    """,
+                    (json.dumps(plan),),
+                ).rowcount
+            if updated != len(plan):
+                # Часть заявок назначили параллельно — счётчики надёжнее перечитать
+                self.rebuild(conn)
+        self.assigned += updated
+        return {"assigned": updated, "skipped": len(backlog) - len(plan)}
+
+    def stats(self):
+        with self._lock:
+            load = dict(self._load or {})
+            types = sorted(self._candidates or {})
+        return {
+            "assigned": self.assigned,
+            "rebuilds": self.rebuilds,
+            "open_by_master": load,
+            "equipment_types": types,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Распределение заявок без мастера")
+    parser.add_argument("--db", required=True, help="путь к файлу БД")
+    parser.add_argument("--limit", type=int, help="не больше стольких заявок за проход")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    conn.execute("PRAGMA busy_timeout = 5000")
+    result = AssignmentEngine(args.db).assign_backlog(conn, args.limit)
+    print(f"Назначено: {result['assigned']}, без подходящего специалиста: {result['skipped']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Бенчмарк потоковой выгрузки: время до первого куска и пик памяти
+при выгрузке всех заявок в CSV и XLSX.
+
+Запуск:
+    python benchmarks/bench_export.py --sizes 10000 100000
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from bench_requests_list import build_database
+from export import export_stream
+
+
+def measure(path, fmt):
+    conn = sqlite3.connect(path)
+    tracemalloc.start()
+    started = time.perf_counter()
+    stream = export_stream(conn, {}, fmt)
+    total = len(next(stream))
+    first_byte = time.perf_counter() - started
+    for chunk in stream:
+        total += len(chunk)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    conn.close()
+    return first_byte, elapsed, peak, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    print(f"{'заявок':>8} {'формат':>6} {'1-й байт, мс':>13} {'всего, с':>9} {'пик, МБ':>8} {'файл, МБ':>9}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.db")
+            build_database(path, size)
+            for fmt in ("csv", "xlsx"):
+                first_byte, elapsed, peak, total = measure(path, fmt)
+                print(
+                    f"{size:>8} {fmt:>6} {first_byte * 1000:>13.1f} {elapsed:>9.2f} "
+                    f"{peak / 2**20:>8.1f} {total / 2**20:>9.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""
+Бенчмарк HTTP-маршрутов: задержки p50/p95/p99 и пропускная способность
+на сгенерированных БД разного размера.
+
+Для каждого размера создаётся БД (import_data.synthetic_dataset),
+затем через тестовый клиент Flask последовательно вызываются /login,
+/requests, /requests/new, /requests/<id>/edit, /stats и /qr/<id>
+(в том числе повторное сканирование с If-None-Match, ответ 304).
+Результаты сохраняются в JSON, чтобы сравнивать их между коммитами.
+
+Запуск:
+    python benchmarks/bench_http.py --sizes 10000 100000 1000000 --out results.json
+    python benchmarks/bench_http.py --sizes 10000 --compare results.json
+    python benchmarks/bench_http.py --cache-dir /tmp/bench_db ...  # не генерировать БД заново
+    python benchmarks/bench_http.py --no-metrics ...  # без счётчиков SQL (metrics.py) — их цена
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import import_data
+import metrics
+import web_app
+
+PERCENTILES = (50, 95, 99)
+
+
+class Context:
+    """Данные сгенерированной БД, нужные сценариям."""
+
+    def __init__(self, path, n_requests, seed):
+        self.n_requests = n_requests
+        self.rnd = random.Random(seed)
+        ids = import_data.synthetic_user_ids(n_requests)
+        # Заказчик с наибольшим числом заявок (самое тяжёлое для него чтение)
+        self.users = {
+            "Менеджер": ids["Менеджер"][0],
+            "Специалист": ids["Специалист"][0],
+            "Заказчик": ids["Заказчик"][0],
+        }
+        self.master_id = ids["Специалист"][0]
+        self.client_id = ids["Заказчик"][0]
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        # Тестовый клиент текущего сценария и ETag уже полученных ответов
+        self.client = None
+        self.etags = {}
+
+    def random_request_id(self):
+        return self.rnd.randint(1, self.n_requests)
+
+    def credentials(self, role):
+        user_id = self.users[role]
+        return {"login": f"login{user_id}", "password": f"pass{user_id}"}
+
+
+def _edit_form(ctx, request_id):
+    row = ctx.conn.execute(
+        "SELECT * FROM requests WHERE request_id = ?", (request_id,)
+    ).fetchone()
+    return {
+        "start_date": row["start_date"],
+        "climate_tech_type": row["climate_tech_type"],
+        "climate_tech_model": row["climate_tech_model"],
+        "problem_description": row["problem_description"],
+        "request_status": ctx.rnd.choice(web_app.REQUEST_STATUSES),
+        "completion_date": row["completion_date"] or "",
+        "master_id": str(ctx.master_id),
+        "client_id": str(row["client_id"]),
+    }
+
+
+def _new_request_form(ctx):
+    return {
+        "client_id": str(ctx.client_id),
+        "start_date": datetime.date.today().isoformat(),
+        "climate_tech_type": "Кондиционер",
+        "climate_tech_model": "Бенчмарк-1",
+        "problem_description": "Не охлаждает воздух",
+        "master_id": "",
+    }
+
+
+def _edit_submit(ctx):
+    request_id = ctx.random_request_id()
+    return f"/requests/{request_id}/edit", _edit_form(ctx, request_id)
+
+
+def _qr_repeat(ctx):
+    """Повторное сканирование: If-None-Match с ETag первого ответа, ожидается 304."""
+    url = f"/qr/{ctx.n_requests}"
+    if url not in ctx.etags:
+        first = ctx.client.get(url)
+        assert first.status_code == 200, f"qr_repeat: {url} -> {first.status_code}"
+        ctx.etags[url] = first.headers["ETag"]
+        first.close()
+    return url, None, {"If-None-Match": ctx.etags[url]}
+
+
+# (имя, роль, метод, функция ctx -> (url, данные формы[, заголовки]), ожидаемый код ответа)
+SCENARIOS = (
+    ("login", None, "POST", lambda ctx: ("/login", ctx.credentials("Менеджер")), 302),
+    ("requests_list", "Менеджер", "GET", lambda ctx: ("/requests", None), 200),
+    ("requests_list_filtered", "Менеджер", "GET",
+     lambda ctx: ("/requests?status=В процессе ремонта", None), 200),
+    ("requests_list_client", "Заказчик", "GET", lambda ctx: ("/requests", None), 200),
+    ("new_request_form", "Менеджер", "GET", lambda ctx: ("/requests/new", None), 200),
+    ("client_lookup", "Менеджер", "GET", lambda ctx: ("/api/clients?q=петров", None), 200),
+    ("new_request_submit", "Менеджер", "POST",
+     lambda ctx: ("/requests/new", _new_request_form(ctx)), 302),
+    ("edit_request_form", "Менеджер", "GET",
+     lambda ctx: (f"/requests/{ctx.random_request_id()}/edit", None), 200),
+    ("edit_request_submit", "Менеджер", "POST", _edit_submit, 302),
+    ("timeline", "Менеджер", "GET",
+     lambda ctx: (f"/api/requests/{ctx.random_request_id()}/timeline", None), 200),
+    ("deadlines_overdue", "Менеджер", "GET", lambda ctx: ("/requests/deadlines?view=overdue", None), 200),
+    ("stats", "Менеджер", "GET", lambda ctx: ("/stats", None), 200),
+    ("qr", "Специалист", "GET", lambda ctx: (f"/qr/{ctx.random_request_id()}", None), 200),
+    ("qr_repeat", "Специалист", "GET", _qr_repeat, 304),
+)
+
+
+def percentile(sorted_values, p):
+    """Перцентиль методом ближайшего ранга."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(latencies, elapsed):
+    values = sorted(latencies)
+    result = {f"p{p}_ms": percentile(values, p) * 1000 for p in PERCENTILES}
+    result["mean_ms"] = sum(values) / len(values) * 1000
+    result["count"] = len(values)
+    result["rps"] = len(values) / elapsed
+    return result
+
+
+def run_scenario(client, ctx, scenario, repeats, max_seconds, warmup=2):
+    name, role, method, build, expected = scenario
+    if role:
+        resp = client.post("/login", data=ctx.credentials(role))
+        assert resp.status_code == 302, f"{name}: вход под ролью {role} не удался"
+    ctx.client = client
+
+    def call():
+        url, data, *headers = build(ctx)
+        if method == "POST":
+            resp = client.post(url, data=data, headers=headers[0] if headers else None)
+        else:
+            resp = client.get(url, headers=headers[0] if headers else None)
+        assert resp.status_code == expected, f"{name}: {url} -> {resp.status_code}"
+        resp.close()
+
+    for _ in range(warmup):
+        call()
+
+    latencies = []
+    started = time.perf_counter()
+    deadline = started + max_seconds
+    while len(latencies) < repeats:
+        t0 = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - t0)
+        # На больших БД медленные сценарии ограничиваются по времени
+        if len(latencies) >= 5 and time.perf_counter() > deadline:
+            break
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def prepare_database(workdir, n_requests, seed, cache_dir=None):
+    """Сгенерированная БД в workdir (копия из cache_dir, если она там уже есть)."""
+    path = os.path.join(workdir, "bench.db")
+    if cache_dir:
+        cached = os.path.join(cache_dir, f"synthetic_{n_requests}_{seed}.db")
+        if not os.path.exists(cached):
+            os.makedirs(cache_dir, exist_ok=True)
+            import_data.import_dataset(cached, import_data.synthetic_dataset(n_requests, seed))
+        shutil.copyfile(cached, path)
+    else:
+        import_data.import_dataset(path, import_data.synthetic_dataset(n_requests, seed))
+    return path
+
+
+def measure(n_requests, args):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        path = prepare_database(tmp, n_requests, args.seed, args.cache_dir)
+        print(f"БД на {n_requests} заявок готова за {time.perf_counter() - started:.1f} с", flush=True)
+
+        app = web_app.app
+        app.config["TESTING"] = True
+        app.config["DATABASE"] = path
+        app.config["QR_CACHE_DIR"] = os.path.join(tmp, "qr_cache")
+        hooks = app.extensions["db_on_connect"]
+        if args.no_metrics and metrics.instrument_connection in hooks:
+            hooks.remove(metrics.instrument_connection)
+        ctx = Context(path, n_requests, args.seed)
+        try:
+            for scenario in SCENARIOS:
+                if args.only and scenario[0] not in args.only:
+                    continue
+                with app.test_client() as client:
+                    summary = run_scenario(client, ctx, scenario, args.repeats, args.max_seconds)
+                summary = {"requests": n_requests, "scenario": scenario[0], **summary}
+                results.append(summary)
+                print(format_row(summary), flush=True)
+        finally:
+            ctx.conn.close()
+            pool = app.extensions.pop("db_pool", None)
+            if pool is not None:
+                pool.close_all()
+    return results
+
+
+HEADER = f"{'заявок':>8} {'сценарий':<24} {'n':>5} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9} {'запр/с':>8}"
+
+
+def format_row(r):
+    return (
+        f"{r['requests']:>8} {r['scenario']:<24} {r['count']:>5} {r['p50_ms']:>9.2f} "
+        f"{r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['rps']:>8.1f}"
+    )
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous, results):
+    """Печатает изменение p95 относительно сохранённого прогона."""
+    old = {(r["requests"], r["scenario"]): r for r in previous["results"]}
+    print(f"\nСравнение с {previous['meta'].get('commit') or 'предыдущим прогоном'}:")
+    print(f"{'заявок':>8} {'сценарий':<24} {'было p95':>9} {'стало p95':>10} {'изменение':>10}")
+    for r in results:
+        before = old.get((r["requests"], r["scenario"]))
+        if before is None:
+            continue
+        ratio = r["p95_ms"] / before["p95_ms"] if before["p95_ms"] else float("inf")
+        print(
+            f"{r['requests']:>8} {r['scenario']:<24} {before['p95_ms']:>9.2f} "
+            f"{r['p95_ms']:>10.2f} {ratio:>9.2f}x"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeats", type=int, default=50, help="вызовов на сценарий")
+    parser.add_argument("--max-seconds", type=float, default=20.0,
+                        help="предел времени на сценарий (не меньше 5 вызовов)")
+    parser.add_argument("--only", nargs="+", help="запустить только эти сценарии")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache-dir", help="папка для сгенерированных БД между запусками")
+    parser.add_argument("--no-metrics", action="store_true",
+                        help="не подключать счётчики SQL к соединениям пула")
+    parser.add_argument("--out", help="файл JSON с результатами")
+    parser.add_argument("--compare", help="JSON предыдущего прогона для сравнения")
+    args = parser.parse_args()
+
+    print(HEADER)
+    results = []
+    for size in args.sizes:
+        results.extend(measure(size, args))
+
+    report = {
+        "meta": {
+            "commit": git_revision(),
+            "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeats": args.repeats,
+            "max_seconds": args.max_seconds,
+            "seed": args.seed,
+            "metrics": not args.no_metrics,
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nРезультаты сохранены: {args.out}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
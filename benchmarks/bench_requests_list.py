@@ -0,0 +1,112 @@
+"""
+Бенчмарк страницы /requests: число открытий БД и время на одну заявку
+в зависимости от количества заявок.
+
+Запуск:
+    python benchmarks/bench_requests_list.py --sizes 100 1000 5000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import web_app
+from schema import create_database
+
+TECH_TYPES = ("Кондиционер", "Увлажнитель воздуха", "Сплит-система", "Вентиляция")
+STATUSES = ("Новая заявка", "В процессе ремонта", "Ожидание комплектующих", "Готова к выдаче")
+
+
+def build_database(path, n_requests):
+    """Создаёт БД по схеме проекта и заполняет её n_requests заявками."""
+    conn = create_database(path)
+    with conn:
+        conn.executemany(
+            "INSERT INTO users (user_id, fio, login, password, user_type) VALUES (?, ?, ?, ?, ?)",
+            [
+                (1, "Специалист Бенчмарк", "bench_master", "bench", "Специалист"),
+                (2, "Заказчик Бенчмарк", "bench_client", "bench", "Заказчик"),
+            ],
+        )
+        rnd = random.Random(n_requests)
+        conn.executemany(
+            """
+            INSERT INTO requests (start_date, climate_tech_type, climate_tech_model,
+                                  problem_description, request_status, client_id, master_id)
+            VALUES (?, ?, 'Модель', 'Не работает', ?, 2, ?)
+            """,
+            [
+                (
+                    f"2024-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+                    rnd.choice(TECH_TYPES),
+                    rnd.choice(STATUSES),
+                    rnd.choice((1, None)),
+                )
+                for _ in range(n_requests)
+            ],
+        )
+    conn.close()
+
+
+def measure(n_requests, repeats):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        build_database(path, n_requests)
+        web_app.app.config["DATABASE"] = path
+
+        opened = 0
+        original = web_app.get_connection
+
+        def counting_connection():
+            nonlocal opened
+            opened += 1
+            return original()
+
+        web_app.get_connection = counting_connection
+        web_app.app.config["TESTING"] = True
+        try:
+            with web_app.app.test_client() as client:
+                with client.session_transaction() as sess:
+                    sess["user"] = {"user_id": 1, "fio": "Бенчмарк", "user_type": "Специалист"}
+                client.get("/requests")  # прогрев
+
+                opened = 0
+                started = time.perf_counter()
+                for _ in range(repeats):
+                    resp = client.get("/requests")
+                    assert resp.status_code == 200
+                elapsed = (time.perf_counter() - started) / repeats
+        finally:
+            web_app.get_connection = original
+
+    return {
+        "requests": n_requests,
+        "connections_per_render": opened / repeats,
+        "ms_per_render": elapsed * 1000,
+        "us_per_row": elapsed * 1_000_000 / n_requests,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'заявок':>8} {'соединений':>11} {'мс/страница':>12} {'мкс/строка':>11}")
+    for size in args.sizes:
+        r = measure(size, args.repeats)
+        print(
+            f"{r['requests']:>8} {r['connections_per_render']:>11.1f} "
+            f"{r['ms_per_render']:>12.1f} {r['us_per_row']:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
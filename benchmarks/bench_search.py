@@ -0,0 +1,88 @@
+"""
+Бенчмарк полнотекстового поиска: время запроса /api/search
+в зависимости от количества заявок.
+
+Запуск:
+    python benchmarks/bench_search.py --size 100000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from schema import create_database
+from search import search_requests
+
+TECH = {
+    "Кондиционер": ["TCL TAC-12CHSA", "Electrolux EACS/I-09HAT", "Ballu BSD-07HN1"],
+    "Увлажнитель воздуха": ["Xiaomi Smart Humidifier 2", "Polaris PUH 2300", "Boneco U350"],
+    "Сушилка для рук": ["Ballu BAHD-1250", "Dyson Airblade V"],
+}
+PROBLEMS = [
+    "Не охлаждает воздух", "Выключается сам по себе", "Пар имеет неприятный запах",
+    "Течёт конденсат", "Не работает пульт", "Шумит вентилятор", "Не включается",
+    "Пропал холодный обдув", "Мигает индикатор ошибки", "Сильная вибрация корпуса",
+]
+QUERIES = ["пульт", "конденсат", "Xiaomi", "вентилятор шумит", "TCL", "индикатор ошибки"]
+
+
+def build_database(path, size):
+    conn = create_database(path)
+    rnd = random.Random(size)
+    with conn:
+        conn.execute(
+            "INSERT INTO users (user_id, fio, login, password, user_type) "
+            "VALUES (1, 'Заказчик Бенчмарк', 'bench_client', 'bench', 'Заказчик')"
+        )
+        rows = []
+        for _ in range(size):
+            tech_type = rnd.choice(list(TECH))
+            rows.append((
+                f"2024-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+                tech_type,
+                rnd.choice(TECH[tech_type]),
+                f"{rnd.choice(PROBLEMS)}, {rnd.choice(PROBLEMS).lower()}",
+            ))
+        conn.executemany(
+            "INSERT INTO requests (start_date, climate_tech_type, climate_tech_model, "
+            "problem_description, client_id) VALUES (?, ?, ?, ?, 1)",
+            rows,
+        )
+    conn.execute("INSERT INTO requests_fts(requests_fts) VALUES ('optimize')")
+    return conn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    manager = {"user_id": 0, "user_type": "Менеджер"}
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        conn = build_database(os.path.join(tmp, "bench.db"), args.size)
+        print(f"БД на {args.size} заявок создана за {time.perf_counter() - started:.1f} с")
+        conn.row_factory = sqlite3.Row
+
+        print(f"{'запрос':<20} {'медиана, мс':>12} {'макс, мс':>10}")
+        for query in QUERIES:
+            timings = []
+            for _ in range(args.repeats):
+                t0 = time.perf_counter()
+                search_requests(conn, query, manager)
+                timings.append((time.perf_counter() - t0) * 1000)
+            print(f"{query:<20} {statistics.median(timings):>12.2f} {max(timings):>10.2f}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Бенчмарк одновременной записи: пропускная способность и задержка
+сохранения заявок из многих потоков — каждая запись в своей транзакции
+на своём соединении (как раньше) и через очередь записи writer.py
+с групповой фиксацией.
+
+Запуск:
+    python benchmarks/bench_write_queue.py --threads 16 --ops 200 --synchronous FULL
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import schema
+from db import DEFAULT_PRAGMAS
+from writer import WriteQueue
+
+COLUMNS = ("start_date", "climate_tech_type", "climate_tech_model",
+           "problem_description", "request_status", "client_id", "master_id")
+INSERT_SQL = schema.insert_request_sql(COLUMNS)
+
+
+def build_database(path, size):
+    conn = schema.create_database(path)
+    with conn:
+        conn.execute(
+            "INSERT INTO users (user_id, fio, login, password, user_type) "
+            "VALUES (1, 'Заказчик Бенчмарк', 'bench_client', 'bench', 'Заказчик')"
+        )
+        conn.executemany(
+            "INSERT INTO requests (start_date, climate_tech_type, climate_tech_model, "
+            "problem_description, client_id) VALUES ('2024-05-01', 'Кондиционер', 'TCL', ?, 1)",
+            ((f"Заявка {i}",) for i in range(size)),
+        )
+    conn.close()
+
+
+def insert_request(conn, number):
+    return conn.execute(INSERT_SQL, {
+        "start_date": "2025-01-15", "climate_tech_type": "Кондиционер", "climate_tech_model": "TCL",
+        "problem_description": f"Сохранение {number}", "request_status": "Новая заявка",
+        "client_id": 1, "master_id": None,
+    }).fetchall()[0]
+
+
+def connect(path, pragmas):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    for name, value in pragmas:
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+def run(path, pragmas, threads, ops, mode):
+    """Возвращает (операций в секунду, задержки в мс, ошибки, число фиксаций)."""
+    queue = WriteQueue(path, pragmas) if mode == "очередь" else None
+    latencies, errors = [], []
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(index):
+        conn = connect(path, pragmas) if queue is None else None
+        own = []
+        barrier.wait()
+        for i in range(ops):
+            t0 = time.perf_counter()
+            try:
+                if queue is None:
+                    with conn:
+                        insert_request(conn, index * ops + i)
+                else:
+                    queue.execute(insert_request, index * ops + i)
+            except sqlite3.OperationalError as exc:
+                with lock:
+                    errors.append(str(exc))
+            own.append((time.perf_counter() - t0) * 1000)
+        with lock:
+            latencies.extend(own)
+        if conn is not None:
+            conn.close()
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    commits = threads * ops - len(errors)
+    if queue is not None:
+        commits = queue.stats()["batches"]
+        queue.stop()
+    return threads * ops / elapsed, sorted(latencies), errors, commits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=10_000, help="заявок в БД до замера")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--ops", type=int, default=200, help="сохранений на поток")
+    parser.add_argument("--synchronous", default="NORMAL", choices=("OFF", "NORMAL", "FULL"))
+    args = parser.parse_args()
+
+    pragmas = [(name, value) for name, value in DEFAULT_PRAGMAS if name != "synchronous"]
+    pragmas.append(("synchronous", args.synchronous))
+    print(f"{args.threads} потоков × {args.ops} сохранений, synchronous={args.synchronous}")
+    print(f"{'запись':<12} {'оп/с':>8} {'p50, мс':>9} {'p99, мс':>9} {'фиксаций':>9} {'ошибок':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("транзакции", "очередь"):
+            path = os.path.join(tmp, f"{mode}.db")
+            build_database(path, args.size)
+            rate, latencies, errors, commits = run(path, pragmas, args.threads, args.ops, mode)
+            p99 = latencies[int(len(latencies) * 0.99) - 1]
+            print(f"{mode:<12} {rate:>8.0f} {statistics.median(latencies):>9.2f} {p99:>9.2f} "
+                  f"{commits:>9} {len(errors):>7}")
+            for message in sorted(set(errors)):
+                print(f"    {message}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Бенчмарк записи заявок: сколько строк и страниц пишет одна операция
+формы (новая заявка, сохранение заявки) при прежних триггерах
+(номер, срок и updated_at дописываются отдельными UPDATE) и при записи
+одним оператором: INSERT ... RETURNING из schema.insert_request_sql,
+UPDATE с updated_at.
+
+Страницы считаются по кадрам WAL: каждая операция — отдельная
+транзакция, автоматический checkpoint отключён.
+
+Запуск:
+    python benchmarks/bench_writes.py --size 100000 --ops 2000
+"""
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import schema
+from db import DEFAULT_PRAGMAS
+
+# Триггеры, которые миграция requests_single_writes сделала условными
+CONDITIONAL_TRIGGERS = ("generate_request_number", "requests_due_at_insert", "update_requests_timestamp")
+
+NEW_COLUMNS = ("start_date", "climate_tech_type", "climate_tech_model",
+               "problem_description", "request_status", "client_id", "master_id")
+
+LEGACY_INSERT = """
+    INSERT INTO requests (start_date, climate_tech_type, climate_tech_model,
+                          problem_description, request_status, client_id, master_id)
+    VALUES (:start_date, :climate_tech_type, :climate_tech_model,
+            :problem_description, :request_status, :client_id, :master_id)
+"""
+UPDATE = """
+    UPDATE requests SET problem_description = :problem_description, priority = :priority{extra}
+    WHERE request_id = :request_id
+"""
+
+
+def build_database(path, size):
+    conn = schema.create_database(path)
+    # Как у соединений приложения, но без автоматического checkpoint
+    for name, value in DEFAULT_PRAGMAS:
+        conn.execute(f"PRAGMA {name} = {value}")
+    conn.execute("PRAGMA wal_autocheckpoint = 0")
+    rnd = random.Random(size)
+    with conn:
+        conn.execute(
+            "INSERT INTO users (user_id, fio, login, password, user_type) "
+            "VALUES (1, 'Заказчик Бенчмарк', 'bench_client', 'bench', 'Заказчик')"
+        )
+        conn.executemany(
+            "INSERT INTO requests (start_date, climate_tech_type, climate_tech_model, "
+            "problem_description, client_id) VALUES (?, 'Кондиционер', 'TCL', ?, 1)",
+            ((f"2024-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}", f"Заявка {i}")
+             for i in range(size)),
+        )
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return conn
+
+
+def use_legacy_triggers(conn):
+    """Прежние безусловные триггеры: те же тела без WHEN."""
+    with conn:
+        for name in CONDITIONAL_TRIGGERS:
+            sql = conn.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (name,)
+            ).fetchone()[0]
+            conn.execute(f"DROP TRIGGER {name}")
+            conn.execute(re.sub(r"\bWHEN\b.*?(?=\bBEGIN\b)", "", sql, flags=re.S))
+
+
+def measure(conn, path, operation, ops):
+    """Прогоняет operation(i) ops раз по транзакции на каждый; строк и кадров WAL на операцию."""
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    wal = path + "-wal"
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    frames = os.path.getsize(wal) // (page_size + 24) if os.path.exists(wal) else 0
+    changes = conn.total_changes
+    timings = []
+    for i in range(ops):
+        t0 = time.perf_counter()
+        with conn:
+            operation(i)
+        timings.append((time.perf_counter() - t0) * 1000)
+    frames = os.path.getsize(wal) // (page_size + 24) - frames
+    return (conn.total_changes - changes) / ops, frames / ops, statistics.median(timings)
+
+
+def run(path, size, ops, legacy):
+    conn = build_database(path, size)
+    if legacy:
+        use_legacy_triggers(conn)
+    insert_sql = schema.insert_request_sql(NEW_COLUMNS)
+    rnd = random.Random(ops)
+
+    def insert(i):
+        values = {
+            "start_date": "2025-01-15", "climate_tech_type": "Кондиционер",
+            "climate_tech_model": "TCL", "problem_description": f"Новая {i}",
+            "request_status": "Новая заявка", "client_id": 1, "master_id": None,
+        }
+        if legacy:
+            request_id = conn.execute(LEGACY_INSERT, values).lastrowid
+            conn.execute("SELECT request_number FROM requests WHERE request_id = ?", (request_id,)).fetchone()
+        else:
+            conn.execute(insert_sql, values).fetchall()
+
+    def update(i):
+        values = {
+            "request_id": rnd.randint(1, size), "problem_description": f"Правка {i}",
+            "priority": rnd.choice(("Низкий", "Средний", "Высокий")),
+        }
+        if legacy:
+            conn.execute(UPDATE.format(extra=""), values)
+        else:
+            conn.execute(UPDATE.format(extra=", updated_at = DATETIME('now')"), values)
+
+    results = {"insert": measure(conn, path, insert, ops), "update": measure(conn, path, update, ops)}
+    conn.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--ops", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {
+            mode: run(os.path.join(tmp, f"{mode}.db"), args.size, args.ops, mode == "триггеры")
+            for mode in ("триггеры", "один оператор")
+        }
+    print(f"{'операция':<10} {'запись':<15} {'строк':>7} {'страниц WAL':>12} {'медиана, мс':>12}")
+    for operation in ("insert", "update"):
+        for mode, result in results.items():
+            rows, frames, median = result[operation]
+            print(f"{operation:<10} {mode:<15} {rows:>7.2f} {frames:>12.2f} {median:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Поиск заказчика по началу ФИО, телефона или логина (автодополнение в формах).
+
+Каждая ветка запроса читает диапазон своего индекса (fio >= префикс AND
+fio < префикс + максимальный символ) и останавливается на LIMIT, поэтому
+время ответа не зависит от числа заказчиков. Индексы по
+(user_type, is_active, fio) и (user_type, is_active, phone) создаются
+миграцией в schema.py, для логина используется idx_users_login
+(унарный «+» в условиях ветки логина не даёт планировщику выбрать
+индекс по роли, в котором диапазон логинов пришлось бы сортировать).
+"""
+import re
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+# Больше любого символа в кодировке UTF-8: верхняя граница диапазона префикса
+_PREFIX_END = "\U0010ffff"
+
+_NON_DIGITS_RE = re.compile(r"\D")
+_PHONE_RE = re.compile(r"^[\d\s()+\-]+$")
+
+_BRANCH_SQL = {
+    "fio": """
+        SELECT user_id, fio, phone FROM users
+        WHERE user_type = 'Заказчик' AND is_active = 1 AND fio >= ? AND fio < ?
+        ORDER BY fio LIMIT ?
+    """,
+    "phone": """
+        SELECT user_id, fio, phone FROM users
+        WHERE user_type = 'Заказчик' AND is_active = 1 AND phone >= ? AND phone < ?
+        ORDER BY phone LIMIT ?
+    """,
+    "login": """
+        SELECT user_id, fio, phone FROM users
+        WHERE login >= ? AND login < ? AND +user_type = 'Заказчик' AND +is_active = 1
+        ORDER BY login LIMIT ?
+    """,
+}
+
+
+def _fio_prefixes(text):
+    """
+    Варианты префикса ФИО. Сравнение в индексе регистрозависимое
+    (NOCASE в SQLite не знает кириллицы), а ФИО хранятся с заглавных
+    букв, поэтому кроме введённого текста ищется вариант «Петров Ни».
+    """
+    capitalized = " ".join(word[:1].upper() + word[1:] for word in text.split(" "))
+    return list(dict.fromkeys((text, capitalized)))
+
+
+def _phone_prefixes(text):
+    """
+    Варианты префикса телефона: как введено, только цифры и с 8 вместо 7
+    в начале (телефоны хранятся и как 89..., и как +7 ...).
+    """
+    if not _PHONE_RE.match(text):
+        return []
+    digits = _NON_DIGITS_RE.sub("", text)
+    if not digits:
+        return []
+    variants = [text, digits]
+    if digits.startswith("7"):
+        variants.append("8" + digits[1:])
+    return list(dict.fromkeys(variants))
+
+
+def lookup_clients(conn, text, limit=DEFAULT_LIMIT):
+    """
+    Активные заказчики, у которых ФИО, телефон или логин начинается с text.
+    Возвращает до limit словарей {user_id, fio, phone}, отсортированных по ФИО.
+    """
+    text = " ".join((text or "").split())
+    if not text:
+        return []
+    limit = max(1, min(int(limit), MAX_LIMIT))
+
+    branches = []
+    params = []
+    for column, prefixes in (
+        ("fio", _fio_prefixes(text)),
+        ("phone", _phone_prefixes(text)),
+        ("login", [text]),
+    ):
+        for prefix in prefixes:
+            branches.append(f"SELECT * FROM ({_BRANCH_SQL[column]})")
+            params += [prefix, prefix + _PREFIX_END, limit]
+
+    sql = " UNION ".join(branches) + " ORDER BY fio, user_id LIMIT ?"
+    rows = conn.execute(sql, params + [limit]).fetchall()
+    return [{"user_id": r[0], "fio": r[1], "phone": r[2]} for r in rows]
+
+
+def find_client(conn, user_id):
+    """Активный заказчик по user_id из формы или None."""
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    row = conn.execute(
+        "SELECT user_id, fio, phone FROM users "
+        "WHERE user_id = ? AND user_type = 'Заказчик' AND is_active = 1",
+        (user_id,),
+    ).fetchone()
+    if row is None:
+        return None
+    return {"user_id": row[0], "fio": row[1], "phone": row[2]}
@@ -0,0 +1,78 @@
+"""
+Комментарии к заявкам.
+
+Внутренние комментарии (is_internal = 1) видят только сотрудники.
+Несколько комментариев добавляются одной транзакцией (один COMMIT на пачку).
+Счётчики на самой заявке — comment_count / last_comment_at по всем
+комментариям и public_comment_count / last_public_comment_at по видимым
+заказчику — поддерживают триггеры миграции comment_counters (schema.py),
+поэтому списку заявок не нужен COUNT по комментариям для каждой строки.
+"""
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+MAX_LENGTH = 2000
+
+COMMENT_COLUMNS = ("comment_id", "request_id", "user_id", "user_fio", "message", "is_internal", "created_at")
+
+
+def normalize_comments(items, allow_internal):
+    """
+    Комментарии [{"message": ..., "is_internal": ...}, ...] -> [(message, is_internal)].
+    Пустые сообщения пропускаются, слишком длинные — ValueError.
+    Без allow_internal (заказчик) все комментарии становятся публичными.
+    """
+    result = []
+    for item in items:
+        if isinstance(item, str):
+            item = {"message": item}
+        message = str(item.get("message") or "").strip()
+        if not message:
+            continue
+        if len(message) > MAX_LENGTH:
+            raise ValueError(f"Комментарий длиннее {MAX_LENGTH} символов.")
+        is_internal = 1 if allow_internal and item.get("is_internal") in (True, 1, "1", "on") else 0
+        result.append((message, is_internal))
+    return result
+
+
+def add_comments(conn, request_id, user_id, comments):
+    """
+    Добавляет комментарии [(message, is_internal), ...] одной транзакцией.
+    Возвращает их comment_id.
+    """
+    ids = []
+    with conn:
+        for message, is_internal in comments:
+            cur = conn.execute(
+                "INSERT INTO comments (request_id, user_id, message, is_internal) VALUES (?, ?, ?, ?)",
+                (request_id, user_id, message, is_internal),
+            )
+            ids.append(cur.lastrowid)
+    return ids
+
+
+def list_comments(conn, request_id, include_internal=True, after_id=0, limit=PAGE_SIZE):
+    """
+    Комментарии заявки по возрастанию comment_id, начиная после after_id
+    (для дозагрузки новых). Возвращает список словарей COMMENT_COLUMNS.
+    """
+    sql = """
+        SELECT c.comment_id, c.request_id, c.user_id, u.fio, c.message, c.is_internal, c.created_at
+        FROM comments c
+        LEFT JOIN users u ON u.user_id = c.user_id
+        WHERE c.request_id = ? AND c.comment_id > ?
+    """
+    if not include_internal:
+        sql += " AND c.is_internal = 0"
+    rows = conn.execute(
+        sql + " ORDER BY c.comment_id LIMIT ?",
+        (request_id, after_id, max(1, min(int(limit), MAX_PAGE_SIZE))),
+    ).fetchall()
+    return [dict(zip(COMMENT_COLUMNS, row)) for row in rows]
+
+
+def counters(row, include_internal=True):
+    """(число комментариев, время последнего) для строки заявки с полями счётчиков."""
+    if include_internal:
+        return row["comment_count"], row["last_comment_at"]
+    return row["public_comment_count"], row["last_public_comment_at"]
@@ -0,0 +1,213 @@
+"""
+Пул соединений SQLite, привязанный к контексту приложения Flask.
+
+Соединения открываются по мере надобности (не больше max_size), выдаются
+контексту приложения при первом обращении и возвращаются в пул в его
+конце (незавершённая транзакция откатывается). Следующий запрос — в любом
+потоке, в том числе новом потоке на запрос у сервера разработки — берёт
+уже открытое соединение. PRAGMA и хуки on_connect (счётчики metrics.py,
+подключение архива) выполняются один раз на соединение, а не на запрос.
+Если все max_size соединений заняты, запрос ждёт освобождения не дольше
+timeout секунд.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+from flask import current_app, g
+
+from schema import apply_migrations
+
+
+DEFAULT_DB_NAME = "climate_repair.db"
+
+# PRAGMA, которые выставляются один раз на каждое новое соединение
+DEFAULT_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("busy_timeout", 5000),
+    ("foreign_keys", "ON"),
+    ("mmap_size", 256 * 1024 * 1024),
+    ("cache_size", -20000),  # в КиБ, т.е. ~20 МБ
+    # Временные таблицы (RETURNING, списки IN в триггерах) — в памяти, без файла
+    ("temp_store", "MEMORY"),
+)
+
+
+# Сколько соединений пул держит открытыми и сколько запрос ждёт свободного, с
+POOL_SIZE = 16
+POOL_TIMEOUT = 10
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    """Все соединения пула заняты дольше timeout."""
+
+
+class ConnectionPool:
+    """Ограниченный пул: соединение выдаётся на запрос и возвращается после него."""
+
+    def __init__(self, path, pragmas=DEFAULT_PRAGMAS, migrate=True, max_size=POOL_SIZE,
+                 timeout=POOL_TIMEOUT):
+        self.path = path
+        self.pragmas = pragmas
+        # Миграции схемы (schema.py) применяются при первом открытии соединения
+        self.migrate = migrate
+        self.max_size = max_size
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._migrate_lock = threading.Lock()
+        # Свободные соединения: последнее возвращённое выдаётся первым (его страницы в кэше)
+        self._idle = []
+        self._in_use = set()
+        # Открытые и открываемые сейчас соединения
+        self._size = 0
+        self._checked_path = False
+        # Функции, вызываемые для каждого нового соединения: hook(conn)
+        self.on_connect = []
+        self._stats = {"opened": 0, "reused": 0, "released": 0, "closed": 0, "waits": 0}
+
+    def _check_path(self):
+        if self._checked_path:
+            return
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(
+                f"Файл базы данных '{self.path}' не найден. "
+                f"Сначала создайте БД: python import_data.py seed --db {self.path}"
+            )
+        self._checked_path = True
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas:
+            conn.execute(f"PRAGMA {name} = {value}")
+        if self.migrate:
+            with self._migrate_lock:
+                if self.migrate:
+                    apply_migrations(conn)
+                    self.migrate = False
+        for hook in self.on_connect:
+            hook(conn)
+        return conn
+
+    def acquire(self):
+        """Свободное соединение пула; новое открывается, пока их меньше max_size."""
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while not self._idle and self._size >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f"Все {self.max_size} соединений с БД заняты")
+                self._stats["waits"] += 1
+                self._cond.wait(remaining)
+            if self._idle:
+                conn = self._idle.pop()
+                self._in_use.add(conn)
+                self._stats["reused"] += 1
+                return conn
+            self._size += 1
+
+        try:
+            self._check_path()
+            conn = self._open()
+        except BaseException:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._in_use.add(conn)
+            self._stats["opened"] += 1
+        return conn
+
+    def release(self, conn):
+        """Возвращает соединение в пул (незавершённая транзакция откатывается)."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # Соединение уже закрыто (пул был закрыт во время запроса)
+            pass
+        with self._cond:
+            self._stats["released"] += 1
+            if conn not in self._in_use:
+                # Пул закрыт, пока соединение было выдано
+                return
+            self._in_use.discard(conn)
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._cond:
+            self._stats["closed"] += 1
+
+    def close_all(self):
+        """Закрывает все соединения пула, в том числе выданные."""
+        with self._cond:
+            connections = self._idle + list(self._in_use)
+            self._idle.clear()
+            self._in_use.clear()
+            self._size -= len(connections)
+            self._cond.notify_all()
+        for conn in connections:
+            self._close(conn)
+
+    def stats(self):
+        with self._cond:
+            return dict(
+                self._stats,
+                path=self.path,
+                max_size=self.max_size,
+                open=len(self._idle) + len(self._in_use),
+                in_use=len(self._in_use),
+            )
+
+
+def get_pool(app=None):
+    """Пул для текущего значения app.config['DATABASE'].
+
+    Если путь к БД поменялся (например, в тестах), старый пул закрывается.
+    """
+    app = app or current_app
+    path = app.config.get("DATABASE", DEFAULT_DB_NAME)
+    pool = app.extensions.get("db_pool")
+    if pool is None or pool.path != path:
+        if pool is not None:
+            pool.close_all()
+        pool = ConnectionPool(
+            path,
+            migrate=app.config.get("DATABASE_MIGRATE", True),
+            max_size=app.config.get("DATABASE_POOL_SIZE", POOL_SIZE),
+        )
+        for hook in app.extensions.get("db_on_connect", []):
+            pool.on_connect.append(hook)
+        app.extensions["db_pool"] = pool
+    return pool
+
+
+def get_db():
+    """Соединение для текущего контекста приложения."""
+    if "db" not in g:
+        g.db_pool = get_pool()
+        g.db = g.db_pool.acquire()
+    return g.db
+
+
+def close_db(exc=None):
+    conn = g.pop("db", None)
+    pool = g.pop("db_pool", None)
+    if conn is not None:
+        pool.release(conn)
+
+
+def init_app(app):
+    app.config.setdefault("DATABASE", DEFAULT_DB_NAME)
+    app.config.setdefault("DATABASE_MIGRATE", True)
+    app.config.setdefault("DATABASE_POOL_SIZE", POOL_SIZE)
+    app.extensions.setdefault("db_on_connect", [])
+    app.teardown_appcontext(close_db)
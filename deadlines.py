@@ -0,0 +1,290 @@
+"""
+Сроки выполнения заявок: списки «просрочено» и «срок сегодня», эскалация.
+
+Срок хранится в самой заявке (requests.due_at) и пересчитывается
+триггерами миграции request_deadlines (schema.py) при создании заявки
+и при изменении даты, приоритета, оценки времени или продления срока.
+Правило расчёта описано там же, у выражения _DUE_AT.
+
+Списки читают индекс requests(request_status, due_at): для каждого
+открытого статуса — диапазон по сроку с LIMIT, затем ветки сливаются
+(как ветки ленты событий в timeline.py). Поэтому страница стоит
+одинаково при любом числе заявок в БД.
+
+Эскалация (escalate) раз в несколько минут отбирает просроченные заявки,
+по которым ещё не было эскалации (частичный индекс idx_requests_escalation),
+уведомляет мастера и менеджеров и ставит escalated_at. Новый срок
+сбрасывает отметку, и пропуск продлённого срока эскалируется заново.
+Запуск — поток Escalator в веб-приложении или из консоли:
+    python deadlines.py --db climate_repair.db
+"""
+import argparse
+import base64
+import binascii
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+from assignment import OPEN_STATUSES
+from inventory import immediate
+from schema import apply_migrations
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = ("Низкий", "Средний", "Высокий", "Критичный")
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+BATCH_SIZE = 500
+ESCALATION_INTERVAL = 300.0
+
+VIEWS = {"overdue": "Просроченные", "today": "Срок сегодня"}
+
+DEADLINE_COLUMNS = (
+    "request_id", "request_number", "request_status", "priority", "due_at",
+    "climate_tech_type", "climate_tech_model", "master_id", "master_fio", "client_fio",
+    "escalated_at",
+)
+
+
+def now_text(now=None):
+    """Момент времени в формате столбцов БД (UTC, как DATETIME('now'))."""
+    now = now or datetime.now(timezone.utc)
+    if now.tzinfo is not None:
+        now = now.astimezone(timezone.utc).replace(tzinfo=None)
+    return now.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def encode_cursor(due_at, request_id):
+    return base64.urlsafe_b64encode(f"{due_at}|{request_id}".encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(value):
+    """Возвращает (срок, request_id) или None для пустого/битого курсора."""
+    if not value:
+        return None
+    try:
+        due_at, request_id = base64.urlsafe_b64decode(value.encode("ascii")).decode("utf-8").rsplit("|", 1)
+        return due_at, int(request_id)
+    except (ValueError, binascii.Error, UnicodeError):
+        return None
+
+
+def page_size(value):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def _bounds(view, now):
+    """Диапазон срока [from, to) для списка view."""
+    if view == "overdue":
+        return "", now
+    if view == "today":
+        tomorrow = datetime.strptime(now, "%Y-%m-%d %H:%M:%S").date().toordinal() + 1
+        return now, datetime.fromordinal(tomorrow).strftime("%Y-%m-%d %H:%M:%S")
+    raise ValueError(f"Неизвестный список сроков: {view}")
+
+
+def _branches(extra=""):
+    """По ветке на открытый статус: диапазон индекса (request_status, due_at)."""
+    return " UNION ALL ".join(
+        f"""
+        SELECT * FROM (
+            SELECT request_id, due_at FROM requests
+            WHERE request_status = :status{i} AND due_at >= :lo AND due_at < :hi {extra}
+            ORDER BY due_at, request_id
+            LIMIT :limit
+        )
+        """
+        for i in range(len(OPEN_STATUSES))
+    )
+
+
+def fetch(conn, view, now=None, master_id=None, cursor=None, limit=PAGE_SIZE):
+    """
+    Одна страница списка view ("overdue" или "today") по возрастанию срока.
+    master_id ограничивает список заявками одного мастера.
+    Возвращает (rows, next_cursor); next_cursor = None на последней странице.
+    """
+    lo, hi = _bounds(view, now_text(now))
+    extra = ""
+    params = {"lo": lo, "hi": hi, "limit": limit + 1}
+    params.update({f"status{i}": status for i, status in enumerate(OPEN_STATUSES)})
+    if master_id is not None:
+        extra += " AND master_id = :master_id"
+        params["master_id"] = master_id
+    if cursor is not None:
+        extra += " AND (due_at, request_id) > (:after_due, :after_id)"
+        params["after_due"], params["after_id"] = cursor
+
+    rows = conn.execute(
+        f"""
+        SELECT r.request_id, r.request_number, r.request_status, r.priority, d.due_at,
+               r.climate_tech_type, r.climate_tech_model, r.master_id, m.fio, u.fio,
+               r.escalated_at
+        FROM ({_branches(extra)}) AS d
+        JOIN requests r ON r.request_id = d.request_id
+        LEFT JOIN users m ON m.user_id = r.master_id
+        LEFT JOIN users u ON u.user_id = r.client_id
+        ORDER BY d.due_at, d.request_id
+        LIMIT :limit
+        """,
+        params,
+    ).fetchall()
+    items = [dict(zip(DEADLINE_COLUMNS, row)) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(items[-1]["due_at"], items[-1]["request_id"])
+    return items, next_cursor
+
+
+def counts(conn, now=None, master_id=None):
+    """Размеры списков: {"overdue": n, "today": m}."""
+    now = now_text(now)
+    result = {}
+    placeholders = ", ".join("?" * len(OPEN_STATUSES))
+    for view in VIEWS:
+        lo, hi = _bounds(view, now)
+        sql = (
+            f"SELECT COUNT(*) FROM requests WHERE request_status IN ({placeholders}) "
+            "AND due_at >= ? AND due_at < ?"
+        )
+        params = list(OPEN_STATUSES) + [lo, hi]
+        if master_id is not None:
+            sql += " AND master_id = ?"
+            params.append(master_id)
+        result[view] = conn.execute(sql, params).fetchone()[0]
+    return result
+
+
+_ESCALATION_FIELDS = """
+    'Срок заявки истёк',
+    'Заявка ' || COALESCE(r.request_number, r.request_id) || ' (' || r.request_status
+        || ') должна была быть выполнена до ' || r.due_at,
+    'error',
+    r.request_id
+"""
+
+
+def escalate(conn, now=None, limit=BATCH_SIZE):
+    """
+    Эскалирует до limit просроченных заявок без эскалации: уведомление
+    мастеру и активным менеджерам, отметка escalated_at. Возвращает их число.
+    """
+    now = now_text(now)
+    params = {"lo": "", "hi": now, "limit": limit}
+    params.update({f"status{i}": status for i, status in enumerate(OPEN_STATUSES)})
+    with immediate(conn):
+        ids = [
+            row[0] for row in conn.execute(
+                f"SELECT request_id FROM ({_branches('AND escalated_at IS NULL')}) "
+                "ORDER BY due_at, request_id LIMIT :limit",
+                params,
+            )
+        ]
+        if ids:
+            batch = json.dumps(ids)
+            # Мастер-менеджер получит одно уведомление: UNION убирает дубли
+            conn.execute(
+                f"""
+                INSERT INTO notifications (user_id, title, message, notification_type, related_request_id)
+                SELECT r.master_id, {_ESCALATION_FIELDS}
+                FROM json_each(:batch) AS batch JOIN requests r ON r.request_id = batch.value
+                WHERE r.master_id IS NOT NULL
+                UNION
+                SELECT u.user_id, {_ESCALATION_FIELDS}
+                FROM json_each(:batch) AS batch JOIN requests r ON r.request_id = batch.value
+                JOIN users u ON u.user_type = 'Менеджер' AND u.is_active = 1
+                """,
+                {"batch": batch},
+            )
+            conn.execute(
+                "UPDATE requests SET escalated_at = ?, updated_at = DATETIME('now') "
+                "WHERE request_id IN (SELECT value FROM json_each(?))",
+                (now, batch),
+            )
+    return len(ids)
+
+
+def escalate_all(conn, now=None, batch_size=BATCH_SIZE):
+    """Эскалирует все просроченные заявки пачками. Возвращает их число."""
+    total = 0
+    while True:
+        count = escalate(conn, now, batch_size)
+        total += count
+        if count < batch_size:
+            return total
+
+
+class Escalator:
+    """Фоновый поток, который периодически запускает эскалацию."""
+
+    def __init__(self, db_path, interval=ESCALATION_INTERVAL, on_escalated=None):
+        self.db_path = db_path
+        self.interval = interval
+        # Вызывается после эскалации (например, разбудить доставку уведомлений)
+        self.on_escalated = on_escalated
+        self._stop = threading.Event()
+        self._thread = None
+        self.escalated = 0
+        self.errors = 0
+
+    def run_once(self, now=None):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute("PRAGMA busy_timeout = 5000")
+            count = escalate_all(conn, now)
+        finally:
+            conn.close()
+        self.escalated += count
+        if count and self.on_escalated is not None:
+            self.on_escalated()
+        return count
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except sqlite3.Error:
+                self.errors += 1
+                logger.exception("Ошибка эскалации просроченных заявок")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="escalation", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stats(self):
+        return {"running": self.running, "escalated": self.escalated, "errors": self.errors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Эскалация просроченных заявок")
+    parser.add_argument("--db", required=True, help="путь к файлу БД")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    conn.execute("PRAGMA busy_timeout = 5000")
+    apply_migrations(conn)
+    print(f"Эскалировано заявок: {escalate_all(conn)}")
+
+
+if __name__ == "__main__":
+    main()
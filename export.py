@@ -0,0 +1,192 @@
+"""
+Потоковая выгрузка заявок в CSV и XLSX.
+
+Строки читаются из курсора SQLite пачками (fetchmany) и сразу отдаются
+клиенту генератором, поэтому расход памяти не зависит от числа заявок.
+XLSX собирается без сторонних библиотек: zip-архив пишется в поток,
+а лист заполняется строками по мере чтения из БД.
+"""
+import csv
+import io
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+import pagination
+
+BATCH_SIZE = 1000
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+# (заголовок, выражение SQL)
+EXPORT_COLUMNS = (
+    ("ID", "r.request_id"),
+    ("Номер", "r.request_number"),
+    ("Дата", "r.start_date"),
+    ("Тип оборудования", "r.climate_tech_type"),
+    ("Модель", "r.climate_tech_model"),
+    ("Проблема", "r.problem_description"),
+    ("Статус", "r.request_status"),
+    ("Приоритет", "r.priority"),
+    ("Дата завершения", "r.completion_date"),
+    ("Клиент", "u.fio"),
+    ("Мастер", "m.fio"),
+)
+
+EXPORT_SQL = (
+    "SELECT " + ", ".join(expr for _, expr in EXPORT_COLUMNS) + """
+    FROM requests r
+    LEFT JOIN users u ON r.client_id = u.user_id
+    LEFT JOIN users m ON r.master_id = m.user_id
+"""
+)
+
+# С этих символов Excel и LibreOffice начинают формулу при открытии CSV
+_CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+# Символы, недопустимые в XML 1.0
+_XML_ILLEGAL_RE = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def iter_rows(conn, filters, batch_size=BATCH_SIZE):
+    """
+    Строки выгрузки с теми же фильтрами, что и в списке заявок,
+    в порядке списка (по индексу, без сортировки в памяти).
+    """
+    clauses, params = pagination.build_where(filters)
+    sql = EXPORT_SQL
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY r.start_date DESC, r.request_id DESC"
+
+    cursor = conn.execute(sql, params)
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cursor.close()
+
+
+def _csv_cell(value):
+    """
+    Текст, похожий на формулу (описание проблемы и ФИО вводят заказчики),
+    выгружается с апострофом впереди — Excel покажет его как текст.
+    """
+    if isinstance(value, str) and value.startswith(_CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_stream(batches):
+    """CSV (UTF-8 с BOM, разделитель «;» — как ожидает русский Excel)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=";")
+    writer.writerow([title for title, _ in EXPORT_COLUMNS])
+    yield ("\ufeff" + buffer.getvalue()).encode("utf-8")
+
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_csv_cell(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Поток без seek для zipfile: записанные куски забираются методом drain()."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+</Types>"""
+
+_ROOT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>"""
+
+_WORKBOOK = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="Заявки" sheetId="1" r:id="rId1"/></sheets>
+</workbook>"""
+
+_WORKBOOK_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+</Relationships>"""
+
+_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_TAIL = "</sheetData></worksheet>"
+
+
+def _xlsx_cell(value):
+    if value is None:
+        return "<c/>"
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f"<c><v>{value}</v></c>"
+    text = escape(_XML_ILLEGAL_RE.sub("", str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return "<row>" + "".join(_xlsx_cell(v) for v in values) + "</row>"
+
+
+def xlsx_stream(batches):
+    """XLSX с одним листом; каждая пачка строк сразу уходит клиенту."""
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        archive.writestr("_rels/.rels", _ROOT_RELS)
+        archive.writestr("xl/workbook.xml", _WORKBOOK)
+        archive.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        with archive.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(_SHEET_HEAD.encode("utf-8"))
+            sheet.write(_xlsx_row(title for title, _ in EXPORT_COLUMNS).encode("utf-8"))
+            yield sink.drain()
+            for rows in batches:
+                sheet.write("".join(_xlsx_row(row) for row in rows).encode("utf-8"))
+                yield sink.drain()
+            sheet.write(_SHEET_TAIL.encode("utf-8"))
+    yield sink.drain()
+
+
+def export_stream(conn, filters, fmt):
+    """Генератор байтов файла выгрузки в формате fmt ('csv' или 'xlsx')."""
+    batches = iter_rows(conn, filters)
+    if fmt == "xlsx":
+        return xlsx_stream(batches)
+    return csv_stream(batches)
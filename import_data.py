@@ -0,0 +1,389 @@
+"""
+Массовая загрузка пользователей, заявок и комментариев в новую БД.
+
+Источники данных:
+  seed      — таблицы из TZ_no_zip/.../Кондиционеры_данные (CSV, разделитель «;»);
+  synthetic — сгенерированные данные заданного объёма (для замеров).
+
+Загрузка идёт в новую БД со схемой database_schema.sql. Чтобы миллион
+заявок грузился секунды, а не часы:
+  * строки вставляются executemany пачками внутри одной транзакции;
+  * индексы и триггеры загружаемых таблиц на время загрузки удаляются,
+    а индексы строятся один раз по готовым данным;
+  * построчный триггер generate_request_number (лишний UPDATE каждой
+    заявки) отключён, номер заявки вычисляется тем же выражением прямо
+    в INSERT;
+  * производные данные (FTS, stats_summary) строят миграции schema.py,
+    которые применяются уже после загрузки.
+
+Запуск:
+    python import_data.py seed --db climate_repair.db
+    python import_data.py synthetic --requests 1000000 --db big.db
+"""
+import argparse
+import bisect
+import csv
+import datetime
+import itertools
+import os
+import random
+import time
+
+import schema
+
+DATA_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "TZ_no_zip", "2 неделя", "Ресурсы", "Кондиционеры_данные",
+)
+SEED_FILES = {
+    "users": os.path.join("Пользователи", "inputDataUsers.csv"),
+    "requests": os.path.join("Заявки", "inputDataRequests.csv"),
+    "comments": os.path.join("Комментарии", "inputDataComments.csv"),
+}
+
+BATCH_SIZE = 50_000
+
+# Порядок важен: заявки ссылаются на пользователей, комментарии — на заявки
+INSERT_SQL = {
+    "users": """
+        INSERT INTO users (user_id, fio, phone, login, password, user_type)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """,
+    "requests": """
+        INSERT INTO requests (request_id, start_date, climate_tech_type, climate_tech_model,
+                              problem_description, request_status, completion_date,
+                              repair_parts, master_id, client_id, request_number)
+        VALUES (?1, ?2, ?3, ?4, ?5, ?6, ?7, ?8, ?9, ?10, {number})
+    """.format(number=schema.REQUEST_NUMBER.format(id="?1")),
+    "comments": """
+        INSERT INTO comments (comment_id, message, user_id, request_id)
+        VALUES (?, ?, ?, ?)
+    """,
+}
+
+# Настройки только на время загрузки: новая БД при сбое просто удаляется
+LOAD_PRAGMAS = {
+    "journal_mode": "MEMORY",
+    "synchronous": "OFF",
+    "temp_store": "MEMORY",
+    "cache_size": "-200000",
+}
+
+
+# --- Исходные таблицы ---
+
+def _null(value):
+    """В таблицах ТЗ пустое значение записано как «null» или пустой строкой."""
+    value = value.strip()
+    return None if value in ("", "null") else value
+
+
+def read_table(path):
+    """Строки CSV-файла ТЗ как словари (пустые значения -> None)."""
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f, delimiter=";"):
+            yield {key.strip(): _null(value or "") for key, value in row.items()}
+
+
+def seed_dataset(data_dir=DATA_DIR):
+    """Строки для INSERT_SQL из таблиц ТЗ: {таблица: итератор кортежей}."""
+    def path(table):
+        return os.path.join(data_dir, SEED_FILES[table])
+
+    users = (
+        (int(r["userID"]), r["fio"], r["phone"], r["login"], r["password"], r["type"])
+        for r in read_table(path("users"))
+    )
+    requests = (
+        (
+            int(r["requestID"]), r["startDate"], r["climateTechType"], r["climateTechModel"],
+            r["problemDescryption"], r["requestStatus"], r["completionDate"], r["repairParts"],
+            int(r["masterID"]) if r["masterID"] else None, int(r["clientID"]),
+        )
+        for r in read_table(path("requests"))
+    )
+    comments = (
+        (int(r["commentID"]), r["message"], int(r["masterID"]), int(r["requestID"]))
+        for r in read_table(path("comments"))
+    )
+    return {"users": users, "requests": requests, "comments": comments}
+
+
+# --- Сгенерированные данные ---
+
+TECH_MODELS = {
+    "Кондиционер": ("TCL TAC-12CHSA/TPG-W белый", "Electrolux EACS/I-09HAT/N3_21Y белый",
+                    "Ballu BSD-09HN1", "Haier AS07TT4HRA"),
+    "Увлажнитель воздуха": ("Xiaomi Smart Humidifier 2", "Polaris PUH 2300 WIFI IQ Home",
+                            "Boneco S200"),
+    "Сушилка для рук": ("Ballu BAHD-1250", "Electrolux EHDA-2500"),
+    "Сплит-система": ("Mitsubishi Electric MSZ-LN25VG", "Daikin FTXF25C"),
+    "Вентиляция": ("Systemair K 160", "Ballu Machine BVM-200"),
+}
+PROBLEMS = (
+    "Не охлаждает воздух", "Выключается сам по себе", "Пар имеет неприятный запах",
+    "Не работает", "Течёт вода из внутреннего блока", "Сильно шумит при работе",
+    "Не включается с пульта", "Горит индикатор ошибки", "Слабый поток воздуха",
+    "Не греет в режиме обогрева", "Обмерзает теплообменник", "Вибрирует наружный блок",
+)
+COMMENTS = (
+    "Всё сделаем!", "Починим в момент.", "Заказали комплектующие.",
+    "Требуется выезд на объект.", "Клиент не выходит на связь.", "Ремонт завершён, проверено.",
+)
+# Доля статусов зависит от возраста заявки: свежие ещё в работе, старые закрыты.
+# (возраст в днях не больше, ((статус, вес), ...)); None — все остальные
+STATUS_BY_AGE = (
+    (14, (("Новая заявка", 40), ("В процессе ремонта", 35), ("Ожидание комплектующих", 15),
+          ("Готова к выдаче", 5), ("Завершена", 5))),
+    (60, (("Новая заявка", 5), ("В процессе ремонта", 25), ("Ожидание комплектующих", 15),
+          ("Готова к выдаче", 15), ("Завершена", 35), ("Отменена", 5))),
+    (None, (("В процессе ремонта", 1), ("Ожидание комплектующих", 1), ("Готова к выдаче", 2),
+            ("Завершена", 90), ("Отменена", 6))),
+)
+# Статусы, у которых есть дата завершения
+COMPLETED_STATUSES = ("Готова к выдаче", "Завершена")
+# Длительность ремонта в днях: обычно несколько дней, редко до двух месяцев
+REPAIR_DAYS_MEAN = 7
+REPAIR_DAYS_MAX = 60
+FIRST_DATE = datetime.date(2022, 1, 1)
+DATE_SPAN_DAYS = 4 * 365
+
+SURNAMES = ("Иванов", "Петров", "Смирнов", "Кузнецов", "Попов", "Васильев", "Соколов",
+            "Михайлов", "Новиков", "Фёдоров", "Морозов", "Волков", "Алексеев", "Лебедев",
+            "Семёнов", "Егоров", "Павлов", "Козлов", "Степанов", "Николаев", "Орлов",
+            "Андреев", "Макаров", "Никитин", "Захаров", "Зайцев", "Соловьёв", "Борисов")
+FIRST_NAMES = ("Александр", "Дмитрий", "Максим", "Сергей", "Андрей", "Алексей", "Артём",
+               "Илья", "Кирилл", "Михаил", "Никита", "Матвей", "Роман", "Егор", "Иван")
+PATRONYMICS = ("Александрович", "Дмитриевич", "Сергеевич", "Андреевич", "Алексеевич",
+               "Иванович", "Михайлович", "Николаевич", "Петрович", "Викторович")
+
+
+def synthetic_sizes(n_requests):
+    """Число пользователей по ролям для n_requests заявок."""
+    return {
+        "Менеджер": 1,
+        "Оператор": 2,
+        "Специалист": max(3, n_requests // 500),
+        "Заказчик": max(5, n_requests // 5),
+    }
+
+
+def synthetic_user_ids(n_requests):
+    """Диапазоны user_id по ролям в synthetic_dataset(n_requests)."""
+    ranges = {}
+    next_id = 1
+    for role, count in synthetic_sizes(n_requests).items():
+        ranges[role] = range(next_id, next_id + count)
+        next_id += count
+    return ranges
+
+
+def _skewed_weights(count, exponent):
+    """Накопленные веса 1/k^exponent для выбора через bisect: первые значения встречаются чаще."""
+    total = 0.0
+    weights = []
+    for k in range(1, count + 1):
+        total += 1.0 / k ** exponent
+        weights.append(total)
+    return weights
+
+
+def synthetic_dataset(n_requests, seed=0, comments_per_request=0.5):
+    """
+    Детерминированный набор данных: n_requests заявок, пользователи всех ролей
+    (логин loginN, пароль passN, где N — user_id) и комментарии специалистов.
+
+    Распределения приближены к реальным: request_id растёт вместе с датой
+    заявки, статус зависит от её возраста, у части заказчиков много заявок,
+    а нагрузка между специалистами распределена неравномерно.
+    Строки генерируются лениво, поэтому объём не ограничен памятью.
+    """
+    ids = synthetic_user_ids(n_requests)
+    masters = list(ids["Специалист"])
+    clients = list(ids["Заказчик"])
+
+    def users():
+        rnd = random.Random(seed)
+        for role, user_ids in ids.items():
+            for user_id in user_ids:
+                fio = f"{rnd.choice(SURNAMES)} {rnd.choice(FIRST_NAMES)} {rnd.choice(PATRONYMICS)}"
+                yield (
+                    user_id, fio, f"89{rnd.randrange(10**9):09d}",
+                    f"login{user_id}", f"pass{user_id}", role,
+                )
+
+    dates = [(FIRST_DATE + datetime.timedelta(days=d)).isoformat()
+             for d in range(DATE_SPAN_DAYS)]
+    status_buckets = [
+        (max_age, [status for status, _ in weights], list(itertools.accumulate(w for _, w in weights)))
+        for max_age, weights in STATUS_BY_AGE
+    ]
+    tech_types = list(TECH_MODELS)
+    master_weights = _skewed_weights(len(masters), 0.5)
+    client_weights = _skewed_weights(len(clients), 0.6)
+
+    def requests():
+        rnd = random.Random(seed + 1)
+        rand = rnd.random
+        master_total = master_weights[-1]
+        client_total = client_weights[-1]
+        for request_id in range(1, n_requests + 1):
+            day = min(DATE_SPAN_DAYS - 1, request_id * DATE_SPAN_DAYS // n_requests + rnd.randrange(3))
+            age = DATE_SPAN_DAYS - 1 - day
+            for max_age, statuses, weights in status_buckets:
+                if max_age is None or age <= max_age:
+                    break
+            status = statuses[bisect.bisect(weights, rand() * weights[-1])]
+            completion_date = None
+            if status in COMPLETED_STATUSES:
+                repair_days = min(REPAIR_DAYS_MAX, int(rnd.expovariate(1 / REPAIR_DAYS_MEAN)) + 1)
+                completion_date = dates[min(DATE_SPAN_DAYS - 1, day + repair_days)]
+            master_id = None
+            if status != "Новая заявка":
+                master_id = masters[bisect.bisect(master_weights, rand() * master_total)]
+            tech_type = tech_types[int(rand() * len(tech_types))]
+            models = TECH_MODELS[tech_type]
+            yield (
+                request_id, dates[day], tech_type, models[int(rand() * len(models))],
+                PROBLEMS[int(rand() * len(PROBLEMS))], status, completion_date,
+                None, master_id,
+                clients[bisect.bisect(client_weights, rand() * client_total)],
+            )
+
+    def comments():
+        rnd = random.Random(seed + 2)
+        comment_id = itertools.count(1)
+        for request_id in range(1, n_requests + 1):
+            if rnd.random() < comments_per_request:
+                yield next(comment_id), rnd.choice(COMMENTS), rnd.choice(masters), request_id
+
+    return {"users": users(), "requests": requests(), "comments": comments()}
+
+
+# --- Загрузка ---
+
+def _batches(rows, batch_size):
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _deferred_objects(conn):
+    """Индексы и триггеры загружаемых таблиц (кроме автоматических индексов UNIQUE)."""
+    placeholders = ", ".join("?" * len(INSERT_SQL))
+    return conn.execute(
+        f"""
+        SELECT type, name, sql FROM sqlite_master
+        WHERE type IN ('index', 'trigger') AND sql IS NOT NULL
+          AND tbl_name IN ({placeholders})
+        ORDER BY type, name
+        """,
+        list(INSERT_SQL),
+    ).fetchall()
+
+
+def bulk_load(conn, dataset, batch_size=BATCH_SIZE, progress=None):
+    """
+    Загружает dataset ({таблица: строки}) в БД с исходной схемой
+    (миграции ещё не применены). Индексы и триггеры удаляются на время
+    загрузки; триггеры восстанавливаются в конце транзакции, а удалённые
+    индексы возвращаются списком (name, sql) — их нужно создать после
+    миграций, которые часть из них пересоздают по-своему.
+    Возвращает ({таблица: число строк}, индексы).
+    """
+    if schema.get_version(conn):
+        raise ValueError("Массовая загрузка выполняется только в БД без применённых миграций")
+
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        deferred = _deferred_objects(conn)
+        for kind, name, _ in deferred:
+            conn.execute(f'DROP {kind.upper()} "{name}"')
+
+        counts = {}
+        for table, sql in INSERT_SQL.items():
+            counts[table] = 0
+            for batch in _batches(dataset.get(table, ()), batch_size):
+                conn.executemany(sql, batch)
+                counts[table] += len(batch)
+                if progress:
+                    progress(table, counts[table])
+
+        for kind, _, sql in deferred:
+            if kind == "trigger":
+                conn.execute(sql)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return counts, [(name, sql) for kind, name, sql in deferred if kind == "index"]
+
+
+def import_dataset(path, dataset, batch_size=BATCH_SIZE, progress=None):
+    """
+    Создаёт БД path, загружает в неё dataset и применяет миграции.
+    Возвращает {таблица: число строк}.
+    """
+    if os.path.exists(path):
+        raise FileExistsError(path)
+
+    conn = schema.create_database(path, migrate=False)
+    try:
+        for name, value in LOAD_PRAGMAS.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        counts, indexes = bulk_load(conn, dataset, batch_size, progress)
+
+        # Миграции строят свои индексы, FTS и сводные таблицы уже по данным
+        schema.apply_migrations(conn)
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        with conn:
+            for name, sql in indexes:
+                if name not in existing:
+                    conn.execute(sql)
+        conn.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        conn.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Загрузка данных в новую БД")
+    parser.add_argument("source", choices=("seed", "synthetic"))
+    parser.add_argument("--db", required=True, help="путь к новому файлу БД")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="папка с таблицами ТЗ (для seed)")
+    parser.add_argument("--requests", type=int, default=10_000, help="число заявок (для synthetic)")
+    parser.add_argument("--seed", type=int, default=0, help="зерно генератора (для synthetic)")
+    parser.add_argument("--replace", action="store_true", help="перезаписать существующий файл")
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        if not args.replace:
+            raise SystemExit(f"Файл '{args.db}' уже существует (используйте --replace).")
+        os.remove(args.db)
+
+    if args.source == "seed":
+        dataset = seed_dataset(args.data_dir)
+    else:
+        dataset = synthetic_dataset(args.requests, args.seed)
+
+    def progress(table, count):
+        print(f"{table}: {count}", flush=True)
+
+    started = time.perf_counter()
+    try:
+        counts = import_dataset(args.db, dataset, progress=progress)
+    except BaseException:
+        if os.path.exists(args.db):
+            os.remove(args.db)
+        raise
+    print(", ".join(f"{table}: {count}" for table, count in counts.items()))
+    print(f"Готово за {time.perf_counter() - started:.1f} с: {args.db}")
+
+
+if __name__ == "__main__":
+    main()
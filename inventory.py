@@ -0,0 +1,307 @@
+"""
+Склад комплектующих: резерв под заявку, списание и пополнение.
+
+Каждая операция — одна транзакция BEGIN IMMEDIATE: блокировка на запись
+берётся сразу, поэтому два мастера, резервирующие одну деталь, выполняются
+по очереди, а не натыкаются на SQLITE_BUSY посреди транзакции. Остаток
+уменьшается одним UPDATE на все позиции с условием
+quantity_in_stock >= количество: если хотя бы одной детали не хватает,
+число изменённых строк меньше числа позиций и транзакция откатывается
+целиком — продать больше, чем лежит на складе, нельзя.
+
+Позиции передаются в SQL одним параметром (JSON-массив [[part_id, qty], ...]
+и json_each), так что пополнение тысяч позиций — тоже один оператор.
+
+Жизненный цикл строки request_parts при работе со складом:
+  резерв   — деталь взята со склада под заявку, статус 'Поступил';
+  списание — quantity_used растёт, при полном списании статус 'Установлен';
+  возврат  — несписанный остаток возвращается на склад, статус 'Отменен'
+             (или 'Установлен', если часть деталей уже списана).
+"""
+import json
+from contextlib import contextmanager
+
+# Статус строки request_parts, пока детали зарезервированы под заявку
+RESERVED = "Поступил"
+INSTALLED = "Установлен"
+CANCELLED = "Отменен"
+
+# Заявки в этих статусах закрыты: резервировать под них нельзя
+CLOSED_REQUEST_STATUSES = ("Завершена", "Отменена")
+
+_LOW_COLUMNS = ("part_id", "part_code", "quantity_in_stock", "min_quantity")
+
+PART_COLUMNS = (
+    "part_id", "part_code", "part_name", "category", "manufacturer",
+    "quantity_in_stock", "min_quantity", "price", "unit", "last_restock_date",
+)
+
+REQUEST_PART_COLUMNS = (
+    "request_part_id", "part_id", "part_code", "part_name",
+    "quantity_needed", "quantity_used", "status", "actual_date",
+)
+
+# Позиции из JSON-параметра как таблица (part_id, qty). Подзапрос, а не
+# WITH: для операторов, начинающихся с WITH, модуль sqlite3 не заполняет
+# cursor.rowcount, а по нему проверяется, что изменены все позиции.
+_WANTED = """(
+    SELECT json_extract(value, '$[0]') AS part_id, json_extract(value, '$[1]') AS qty
+    FROM json_each(?)
+) AS wanted"""
+
+
+class InventoryError(Exception):
+    """Операцию со складом выполнить нельзя; part_ids — проблемные позиции."""
+
+    def __init__(self, message, part_ids=()):
+        super().__init__(message)
+        self.part_ids = list(part_ids)
+
+
+@contextmanager
+def immediate(conn):
+    """Транзакция BEGIN IMMEDIATE: фиксируется при выходе, откатывается при ошибке."""
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+def normalize_items(items):
+    """
+    Позиции [(part_id, qty), ...] или [{"part_id": ..., "quantity": ...}, ...]
+    -> {part_id: qty}; количества одинаковых деталей складываются.
+    """
+    totals = {}
+    for item in items:
+        if isinstance(item, dict):
+            part_id, qty = item.get("part_id"), item.get("quantity")
+        else:
+            part_id, qty = item
+        try:
+            part_id, qty = int(part_id), int(qty)
+        except (TypeError, ValueError):
+            raise InventoryError("Некорректная позиция: нужны part_id и целое количество.")
+        if qty <= 0:
+            raise InventoryError("Количество должно быть положительным.", [part_id])
+        totals[part_id] = totals.get(part_id, 0) + qty
+    if not totals:
+        raise InventoryError("Не указано ни одной позиции.")
+    return totals
+
+
+def _shortages(conn, positions):
+    """Позиции, которых нет на складе или не хватает."""
+    rows = conn.execute(
+        f"""
+        SELECT wanted.part_id FROM {_WANTED}
+        LEFT JOIN spare_parts p ON p.part_id = wanted.part_id
+        WHERE p.part_id IS NULL OR p.quantity_in_stock < wanted.qty
+        ORDER BY wanted.part_id
+        """,
+        (positions,),
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def _check_request_open(conn, request_id):
+    row = conn.execute(
+        "SELECT request_status FROM requests WHERE request_id = ?", (request_id,)
+    ).fetchone()
+    if row is None:
+        raise InventoryError("Заявка не найдена.")
+    if row[0] in CLOSED_REQUEST_STATUSES:
+        raise InventoryError(f"Заявка в статусе «{row[0]}»: операции с деталями недоступны.")
+
+
+def reserve(conn, request_id, items):
+    """
+    Резервирует детали под заявку: списывает их со склада и добавляет
+    к зарезервированной строке request_parts (или создаёт её).
+    Всё или ничего: при нехватке хотя бы одной позиции — InventoryError.
+    """
+    totals = normalize_items(items)
+    positions = json.dumps(sorted(totals.items()))
+    with immediate(conn):
+        _check_request_open(conn, request_id)
+        taken = conn.execute(
+            f"""
+            UPDATE spare_parts SET quantity_in_stock = quantity_in_stock - wanted.qty
+            FROM {_WANTED}
+            WHERE spare_parts.part_id = wanted.part_id
+              AND spare_parts.quantity_in_stock >= wanted.qty
+            """,
+            (positions,),
+        ).rowcount
+        if taken != len(totals):
+            short = _shortages(conn, positions)
+            raise InventoryError("Недостаточно деталей на складе.", short)
+        conn.execute(
+            f"""
+            UPDATE request_parts SET quantity_needed = quantity_needed + wanted.qty
+            FROM {_WANTED}
+            WHERE request_parts.request_id = ? AND request_parts.part_id = wanted.part_id
+              AND request_parts.status = ?
+            """,
+            (positions, request_id, RESERVED),
+        )
+        conn.execute(
+            f"""
+            INSERT INTO request_parts (request_id, part_id, quantity_needed, status, actual_date)
+            SELECT ?, wanted.part_id, wanted.qty, ?, DATE('now') FROM {_WANTED}
+            WHERE NOT EXISTS (
+                SELECT 1 FROM request_parts rp
+                WHERE rp.request_id = ? AND rp.part_id = wanted.part_id AND rp.status = ?
+            )
+            """,
+            (request_id, RESERVED, positions, request_id, RESERVED),
+        )
+    return request_parts(conn, request_id)
+
+
+def consume(conn, request_id, items):
+    """
+    Списывает зарезервированные под заявку детали (установлены при ремонте).
+    Списать больше, чем зарезервировано, нельзя.
+    """
+    totals = normalize_items(items)
+    positions = json.dumps(sorted(totals.items()))
+    with immediate(conn):
+        used = conn.execute(
+            f"""
+            UPDATE request_parts SET
+                quantity_used = quantity_used + wanted.qty,
+                status = CASE WHEN quantity_used + wanted.qty = quantity_needed
+                              THEN ? ELSE status END
+            FROM {_WANTED}
+            WHERE request_parts.request_id = ? AND request_parts.part_id = wanted.part_id
+              AND request_parts.status = ?
+              AND request_parts.quantity_used + wanted.qty <= request_parts.quantity_needed
+            """,
+            (INSTALLED, positions, request_id, RESERVED),
+        ).rowcount
+        if used != len(totals):
+            reserved = {
+                row[0]: row[1] for row in conn.execute(
+                    "SELECT part_id, quantity_needed - quantity_used FROM request_parts "
+                    "WHERE request_id = ? AND status = ?",
+                    (request_id, RESERVED),
+                )
+            }
+            short = sorted(pid for pid, qty in totals.items() if reserved.get(pid, 0) < qty)
+            raise InventoryError("Списать можно только зарезервированные под заявку детали.", short)
+    return request_parts(conn, request_id)
+
+
+def release(conn, request_id, part_ids=None):
+    """
+    Возвращает на склад несписанный остаток резерва заявки
+    (всех деталей или только part_ids). Возвращает число вернувшихся деталей.
+    """
+    try:
+        ids = json.dumps(sorted({int(pid) for pid in part_ids})) if part_ids else None
+    except (TypeError, ValueError):
+        raise InventoryError("Некорректный список деталей.")
+    scope = "request_id = ? AND status = ?"
+    params = [request_id, RESERVED]
+    if ids is not None:
+        scope += " AND part_id IN (SELECT value FROM json_each(?))"
+        params.append(ids)
+    with immediate(conn):
+        back = conn.execute(
+            f"""
+            SELECT part_id, SUM(quantity_needed - quantity_used) FROM request_parts
+            WHERE {scope} GROUP BY part_id
+            """,
+            params,
+        ).fetchall()
+        conn.execute(
+            f"""
+            UPDATE spare_parts SET quantity_in_stock = quantity_in_stock + wanted.qty
+            FROM {_WANTED} WHERE spare_parts.part_id = wanted.part_id
+            """,
+            (json.dumps([list(row) for row in back]),),
+        )
+        conn.execute(
+            f"""
+            UPDATE request_parts SET
+                status = CASE WHEN quantity_used > 0 THEN ? ELSE ? END,
+                quantity_needed = CASE WHEN quantity_used > 0
+                                       THEN quantity_used ELSE quantity_needed END
+            WHERE {scope}
+            """,
+            [INSTALLED, CANCELLED] + params,
+        )
+    return sum(qty for _, qty in back)
+
+
+def restock(conn, items):
+    """
+    Пополнение склада: одна транзакция и один UPDATE на все позиции.
+    Триггер check_min_quantity срабатывает только при уменьшении остатка
+    (миграция inventory_low_stock_trigger), поэтому пополнение не создаёт
+    уведомлений. Возвращает детали, которые и после пополнения остаются
+    на минимуме или ниже.
+    """
+    totals = normalize_items(items)
+    positions = json.dumps(sorted(totals.items()))
+    with immediate(conn):
+        updated = conn.execute(
+            f"""
+            UPDATE spare_parts SET
+                quantity_in_stock = quantity_in_stock + wanted.qty,
+                last_restock_date = DATE('now')
+            FROM {_WANTED}
+            WHERE spare_parts.part_id = wanted.part_id
+            """,
+            (positions,),
+        ).rowcount
+        if updated != len(totals):
+            known = {
+                row[0] for row in conn.execute(
+                    "SELECT part_id FROM spare_parts "
+                    "WHERE part_id IN (SELECT json_extract(value, '$[0]') FROM json_each(?))",
+                    (positions,),
+                )
+            }
+            raise InventoryError("Неизвестные детали.", sorted(set(totals) - known))
+        low = conn.execute(
+            f"""
+            SELECT p.part_id, p.part_code, p.quantity_in_stock, p.min_quantity
+            FROM {_WANTED} JOIN spare_parts p ON p.part_id = wanted.part_id
+            WHERE p.quantity_in_stock <= p.min_quantity
+            ORDER BY p.part_id
+            """,
+            (positions,),
+        ).fetchall()
+    return {"updated": updated, "below_min": [dict(zip(_LOW_COLUMNS, row)) for row in low]}
+
+
+def list_parts(conn, low_only=False):
+    """Детали на складе (все или только на минимуме и ниже)."""
+    sql = f"SELECT {', '.join(PART_COLUMNS)} FROM spare_parts"
+    if low_only:
+        sql += " WHERE quantity_in_stock <= min_quantity"
+    rows = conn.execute(sql + " ORDER BY part_code").fetchall()
+    return [dict(zip(PART_COLUMNS, row)) for row in rows]
+
+
+def request_parts(conn, request_id):
+    """Детали заявки с кодом и названием."""
+    rows = conn.execute(
+        """
+        SELECT rp.request_part_id, rp.part_id, p.part_code, p.part_name,
+               rp.quantity_needed, rp.quantity_used, rp.status, rp.actual_date
+        FROM request_parts rp
+        JOIN spare_parts p ON p.part_id = rp.part_id
+        WHERE rp.request_id = ?
+        ORDER BY rp.request_part_id
+        """,
+        (request_id,),
+    ).fetchall()
+    return [dict(zip(REQUEST_PART_COLUMNS, row)) for row in rows]
@@ -0,0 +1,394 @@
+"""
+Живая лента изменений заявок для страницы списка (Server-Sent Events).
+
+Один фоновый поток RequestWatcher на процесс следит за БД и раздаёт
+события всем подключённым браузерам, поэтому число открытых страниц
+не умножает число запросов к БД. Поток опрашивает PRAGMA data_version
+(дёшево, без чтения таблиц) и только после чужой записи читает:
+  - request_history с history_id больше прочитанного — смены статуса;
+  - requests с updated_at не раньше прочитанного (индекс
+    idx_requests_updated_at, см. schema.py) — новые и изменённые заявки.
+updated_at хранится с точностью до секунды, поэтому строки, уже
+отправленные в последнюю секунду отметки, запоминаются: повторно
+отправляется только строка, которая с тех пор изменилась.
+
+Событие содержит строку заявки и её прежние статус, мастера и заказчика
+(если поток их видел), а фильтрацию по роли и фильтрам списка делает
+scope() для каждого подключения отдельно: заявка, переставшая подходить
+под фильтр (например, переназначенная другому мастеру), удаляется со
+страницы.
+
+Каждое подключение занимает поток (или процесс) сервера на всё время,
+пока открыта страница: поток ждёт событий своей очереди и шлёт ping.
+При пуле из N потоков N открытых списков не оставят места обычным
+запросам, поэтому число подписчиков ограничено MAX_SUBSCRIBERS: сверх
+него subscribe() отказывает (TooManySubscribers), маршрут отвечает 503
+с Retry-After, а страница продолжает работать без живой ленты и
+пробует подключиться позже.
+"""
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 1.0
+KEEPALIVE = 15.0
+# Сколько последних событий хранится для переподключения по Last-Event-ID
+REPLAY_SIZE = 500
+# Очередь одного подключения; медленный клиент при переполнении получает reload
+QUEUE_SIZE = 1000
+# Больше изменений за один опрос (массовое обновление) — клиенты перезагружают страницу
+MAX_EVENTS = 500
+# Сколько последних состояний заявок помнить, чтобы распознавать переназначение
+SNAPSHOT_SIZE = 10_000
+# Одновременных подключений на процесс (None — без ограничения) и через сколько
+# секунд отклонённому клиенту пробовать снова
+MAX_SUBSCRIBERS = 50
+RETRY_AFTER = 30
+
+ROW_SQL = """
+    SELECT
+        r.request_id,
+        r.request_number,
+        r.start_date,
+        r.climate_tech_type,
+        r.climate_tech_model,
+        r.problem_description,
+        r.request_status,
+        r.master_id,
+        r.client_id,
+        r.updated_at,
+        u.fio AS client_fio,
+        m.fio AS master_fio,
+        m.phone AS master_phone,
+        r.comment_count,
+        r.last_comment_at,
+        r.public_comment_count,
+        r.last_public_comment_at
+    FROM requests r
+    LEFT JOIN users u ON r.client_id = u.user_id
+    LEFT JOIN users m ON r.master_id = m.user_id
+"""
+
+# Событие без номера: клиенту нужно перезагрузить страницу
+RELOAD = {"id": None, "kind": "reload", "request_id": None, "row": None, "previous": None}
+
+# Поля заявки, по которым проверяется попадание в фильтр (см. pagination.py)
+_FILTER_FIELDS = {
+    "status": "request_status",
+    "tech_type": "climate_tech_type",
+    "master_id": "master_id",
+    "client_id": "client_id",
+}
+
+
+def matches(values, filters):
+    """Подходит ли заявка (словарь полей) под фильтры списка."""
+    for name, field in _FILTER_FIELDS.items():
+        if name in filters and values.get(field) != filters[name]:
+            return False
+    start_date = values.get("start_date") or ""
+    if "date_from" in filters and start_date < filters["date_from"]:
+        return False
+    if "date_to" in filters and start_date > filters["date_to"]:
+        return False
+    return True
+
+
+def scope(event, filters):
+    """
+    Что делать со строкой события на странице с такими фильтрами:
+    "upsert" — показать или обновить, "remove" — убрать, "reload" —
+    перезагрузить страницу целиком, None — не отправлять.
+    Для заказчика в filters должен быть его client_id, как в списке заявок.
+    """
+    if event["kind"] == "reload":
+        return "reload"
+    row = event["row"]
+    if matches(row, filters):
+        return "upsert"
+    previous = event.get("previous")
+    if previous and matches({**row, **previous}, filters):
+        return "remove"
+    return None
+
+
+class TooManySubscribers(Exception):
+    """Подписчиков уже max_subscribers — новое подключение не принимается."""
+
+
+class Subscription:
+    """Очередь событий одного подключения."""
+
+    def __init__(self, maxsize=QUEUE_SIZE):
+        self.queue = queue.Queue(maxsize)
+        self.overflowed = False
+
+    def put(self, event):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # Клиент не успевает читать — пусть перезагрузит страницу
+            self.overflowed = True
+
+    def events(self, keepalive=KEEPALIVE):
+        """
+        События по мере поступления; None раз в keepalive секунд тишины
+        (чтобы отправить комментарий и заметить закрытое соединение).
+        После переполнения выдаёт одно событие reload и завершается.
+        """
+        while True:
+            if self.overflowed:
+                yield RELOAD
+                return
+            try:
+                yield self.queue.get(timeout=keepalive)
+            except queue.Empty:
+                yield None
+
+
+class RequestWatcher:
+    """Общий для всех подключений поток, читающий изменения заявок."""
+
+    def __init__(self, db_path, poll_interval=POLL_INTERVAL, max_subscribers=MAX_SUBSCRIBERS):
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self.max_subscribers = max_subscribers
+        # Номера событий начинаются заново после перезапуска процесса;
+        # эпоха в id не даёт принять старый Last-Event-ID за новый
+        self.epoch = str(int(time.time()))
+        self._seq = 0
+        self._replay = deque(maxlen=REPLAY_SIZE)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._conn = None
+        self._data_version = None
+        self._marked = False
+        self._history_mark = 0
+        self._updated_mark = ""
+        self._seen_at_mark = {}
+        self._max_request_id = 0
+        self._snapshot = OrderedDict()
+        self.polls = 0
+        self.reads = 0
+        self.rejected = 0
+
+    def _connection(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA busy_timeout = 5000")
+            if not self._marked:
+                # Первое открытие: изменения до него не нужны никому
+                self._set_marks(conn)
+            # data_version своя у каждого соединения; после переоткрытия
+            # (stop/start) первый опрос просто перечитает изменения с отметок
+            self._data_version = None
+            self._conn = conn
+        return self._conn
+
+    def _set_marks(self, conn):
+        """Отметки — на текущий конец таблиц."""
+        self._marked = True
+        self._history_mark = conn.execute(
+            "SELECT COALESCE(MAX(history_id), 0) FROM request_history"
+        ).fetchone()[0]
+        self._max_request_id = conn.execute(
+            "SELECT COALESCE(MAX(request_id), 0) FROM requests"
+        ).fetchone()[0]
+        self._updated_mark = conn.execute(
+            "SELECT COALESCE(MAX(updated_at), '') FROM requests"
+        ).fetchone()[0]
+        self._seen_at_mark = {
+            row["request_id"]: dict(row)
+            for row in conn.execute(ROW_SQL + " WHERE r.updated_at = ?", (self._updated_mark,))
+        }
+
+    def _remember(self, row):
+        self._snapshot[row["request_id"]] = {
+            "request_status": row["request_status"],
+            "master_id": row["master_id"],
+            "client_id": row["client_id"],
+        }
+        self._snapshot.move_to_end(row["request_id"])
+        if len(self._snapshot) > SNAPSHOT_SIZE:
+            self._snapshot.popitem(last=False)
+
+    def poll(self):
+        """
+        Один опрос БД. Возвращает список новых событий (они уже разосланы
+        подписчикам); пустой список, если с прошлого опроса записей не было.
+        """
+        conn = self._connection()
+        self.polls += 1
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return []
+        self._data_version = version
+        self.reads += 1
+
+        history = conn.execute(
+            """
+            SELECT history_id, request_id, old_status, new_status FROM request_history
+            WHERE history_id > ? ORDER BY history_id LIMIT ?
+            """,
+            (self._history_mark, MAX_EVENTS + 1),
+        ).fetchall()
+        rows = [
+            row for row in conn.execute(
+                ROW_SQL + " WHERE r.updated_at >= ? ORDER BY r.updated_at, r.request_id LIMIT ?",
+                (self._updated_mark, MAX_EVENTS + len(self._seen_at_mark) + 1),
+            )
+            if not (row["updated_at"] == self._updated_mark
+                    and self._seen_at_mark.get(row["request_id"]) == dict(row))
+        ]
+        if len(history) > MAX_EVENTS or len(rows) > MAX_EVENTS:
+            return self._overflow(conn)
+
+        if history:
+            self._history_mark = history[-1]["history_id"]
+        status_changes = {}
+        for entry in history:
+            if entry["old_status"] != entry["new_status"]:
+                status_changes.setdefault(entry["request_id"], entry["old_status"])
+        # Статус мог смениться и вернуться в пределах секунды: строка
+        # та же, что уже отправлена, но смену из истории нужно показать
+        missing = set(status_changes) - {row["request_id"] for row in rows}
+        if missing:
+            placeholders = ", ".join("?" * len(missing))
+            rows += conn.execute(
+                ROW_SQL + f" WHERE r.request_id IN ({placeholders})", sorted(missing)
+            ).fetchall()
+
+        for row in rows:
+            if row["updated_at"] > self._updated_mark:
+                self._updated_mark = row["updated_at"]
+                self._seen_at_mark = {}
+            if row["updated_at"] == self._updated_mark:
+                self._seen_at_mark[row["request_id"]] = dict(row)
+
+        events = []
+        for row in rows:
+            request_id = row["request_id"]
+            previous = dict(self._snapshot.get(request_id) or {})
+            if request_id in status_changes:
+                previous["request_status"] = status_changes[request_id]
+            if request_id > self._max_request_id:
+                kind = "created"
+            elif request_id in status_changes:
+                kind = "status"
+            elif "master_id" in previous and previous["master_id"] != row["master_id"]:
+                kind = "reassigned"
+            else:
+                kind = "updated"
+            self._remember(row)
+            events.append(self._event(kind, request_id, dict(row), previous or None))
+        self._max_request_id = max([self._max_request_id] + [row["request_id"] for row in rows])
+        self._publish(events)
+        return events
+
+    def _overflow(self, conn):
+        """Слишком много изменений сразу: отметки — на конец, клиентам — reload."""
+        self._set_marks(conn)
+        self._snapshot.clear()
+        events = [self._event("reload", None, None, None)]
+        self._publish(events)
+        return events
+
+    def _event(self, kind, request_id, row, previous):
+        self._seq += 1
+        return {
+            "id": f"{self.epoch}-{self._seq}",
+            "kind": kind,
+            "request_id": request_id,
+            "row": row,
+            "previous": previous,
+        }
+
+    def _publish(self, events):
+        if not events:
+            return
+        with self._lock:
+            self._replay.extend(events)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            for event in events:
+                subscription.put(event)
+
+    def subscribe(self, last_event_id=None):
+        """
+        Новое подключение. С last_event_id (заголовок Last-Event-ID при
+        переподключении браузера) в очередь сразу попадают пропущенные
+        события, а если их уже нет в памяти — событие reload.
+        Сверх max_subscribers подключений — TooManySubscribers.
+        """
+        subscription = Subscription()
+        with self._lock:
+            if self.max_subscribers is not None and len(self._subscribers) >= self.max_subscribers:
+                self.rejected += 1
+                raise TooManySubscribers(self.max_subscribers)
+            if last_event_id:
+                epoch, _, seq = last_event_id.partition("-")
+                replay = list(self._replay)
+                if epoch != self.epoch or not seq.isdigit():
+                    subscription.put(RELOAD)
+                elif replay and int(replay[0]["id"].partition("-")[2]) > int(seq) + 1:
+                    subscription.put(RELOAD)
+                else:
+                    for event in replay:
+                        if int(event["id"].partition("-")[2]) > int(seq):
+                            subscription.put(event)
+            self._subscribers.add(subscription)
+        self.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except sqlite3.Error:
+                logger.exception("Ошибка чтения изменений заявок")
+            self._stop.wait(self.poll_interval)
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="live-feed", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stats(self):
+        with self._lock:
+            subscribers = len(self._subscribers)
+        return {
+            "running": self.running,
+            "subscribers": subscribers,
+            "rejected": self.rejected,
+            "events": self._seq,
+            "polls": self.polls,
+            "reads": self.reads,
+        }
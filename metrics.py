@@ -0,0 +1,227 @@
+"""
+Метрики веб-приложения: время ответа маршрутов и работа SQLite на запрос.
+
+Каждый запрос получает счётчики RequestStats в локальной памяти потока.
+Соединения пула (db.py, on_connect) считают в них:
+  * запросы SQL — trace-callback на начало каждого оператора
+    (операторы триггеров не считаются);
+  * строки результата — фабрика строк поверх sqlite3.Row;
+  * шаги виртуальной машины SQLite — progress handler раз
+    в PROGRESS_STEPS инструкций одного оператора (мера объёма работы;
+    короткие операторы в неё не попадают).
+Цена: вызов Python на оператор, на строку результата и на
+PROGRESS_STEPS инструкций — около 0,5 мкс на строку, на страницах
+приложения в пределах шума (benchmarks/bench_http.py --no-metrics).
+Вне запроса (фоновые потоки) счётчиков нет, и хуки ничего не делают.
+Операции очереди записи (writer.py) считаются в запрос, который их
+поставил (bound).
+
+По завершении запроса время и счётчики попадают в гистограммы
+по шаблону маршрута (/requests/<int:request_id>, а не конкретный адрес),
+которые отдаёт /metrics в текстовом формате Prometheus. С настройкой
+METRICS_DEBUG_HEADER счётчики запроса дописываются в заголовок ответа
+X-Debug-SQL. Для потоковых ответов (выгрузка, SSE) учитывается время
+до отдачи заголовков.
+"""
+import threading
+import time
+
+from flask import current_app, g, request
+
+PROGRESS_STEPS = 1000
+DEBUG_HEADER = "X-Debug-SQL"
+
+# Границы корзин гистограмм (le); +Inf добавляется при выводе
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+_local = threading.local()
+
+
+class RequestStats:
+    """Счётчики работы с БД одного запроса."""
+
+    __slots__ = ("queries", "rows", "vm_steps")
+
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+        self.vm_steps = 0
+
+
+def current():
+    """Счётчики запроса, который обрабатывает текущий поток (или None)."""
+    return getattr(_local, "stats", None)
+
+
+def bound(operation, stats):
+    """operation(conn, *args), которая в любом потоке считает работу в stats."""
+    def run(conn, *args):
+        previous = current()
+        _local.stats = stats
+        try:
+            return operation(conn, *args)
+        finally:
+            _local.stats = previous
+    return run
+
+
+def instrument_connection(conn):
+    """Хук для ConnectionPool.on_connect: счётчики запросов, строк и шагов VM."""
+    row_factory = conn.row_factory
+
+    def trace(statement):
+        stats = getattr(_local, "stats", None)
+        if stats is not None and not statement.startswith("--"):
+            stats.queries += 1
+
+    def count_row(cursor, row):
+        stats = getattr(_local, "stats", None)
+        if stats is not None:
+            stats.rows += 1
+        return row_factory(cursor, row) if row_factory is not None else row
+
+    def progress():
+        stats = getattr(_local, "stats", None)
+        if stats is not None:
+            stats.vm_steps += PROGRESS_STEPS
+        return 0
+
+    conn.set_trace_callback(trace)
+    conn.row_factory = count_row
+    conn.set_progress_handler(progress, PROGRESS_STEPS)
+
+
+class Histogram:
+    """Гистограмма Prometheus: накопительные корзины, сумма и число наблюдений."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        for i, edge in enumerate(self.buckets):
+            if value <= edge:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for edge, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{edge}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f"{name}_sum{{{labels}}} {self.sum}"
+        yield f"{name}_count{{{labels}}} {self.count}"
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Registry:
+    """Метрики всех маршрутов; обновляется один раз в конце каждого запроса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (маршрут, метод) -> гистограммы и счётчики
+        self._routes = {}
+        # (маршрут, метод, код ответа) -> число ответов
+        self._responses = {}
+
+    def record(self, route, method, status, seconds, stats):
+        key = (route, method)
+        with self._lock:
+            entry = self._routes.get(key)
+            if entry is None:
+                entry = self._routes[key] = {
+                    "duration": Histogram(DURATION_BUCKETS),
+                    "queries": Histogram(QUERY_BUCKETS),
+                    "rows": 0,
+                    "vm_steps": 0,
+                }
+            entry["duration"].observe(seconds)
+            entry["queries"].observe(stats.queries)
+            entry["rows"] += stats.rows
+            entry["vm_steps"] += stats.vm_steps
+            response_key = (route, method, status)
+            self._responses[response_key] = self._responses.get(response_key, 0) + 1
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus."""
+        with self._lock:
+            routes = sorted(self._routes.items())
+            responses = sorted(self._responses.items())
+        out = [
+            "# HELP http_requests_total Ответы по маршруту, методу и коду.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (route, method, status), count in responses:
+            out.append(f'http_requests_total{{route="{_label(route)}",method="{method}",status="{status}"}} {count}')
+        sections = (
+            ("http_request_duration_seconds", "histogram", "Время ответа маршрута, с.", "duration"),
+            ("sqlite_queries_per_request", "histogram", "Запросов SQL на один ответ.", "queries"),
+            ("sqlite_rows_total", "counter", "Строк результата SQL.", "rows"),
+            ("sqlite_vm_steps_total", "counter",
+             f"Шагов виртуальной машины SQLite (с точностью до {PROGRESS_STEPS}).", "vm_steps"),
+        )
+        for name, kind, help_text, field in sections:
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            for (route, method), entry in routes:
+                labels = f'route="{_label(route)}",method="{method}"'
+                if kind == "histogram":
+                    out.extend(entry[field].lines(name, labels))
+                else:
+                    out.append(f"{name}{{{labels}}} {entry[field]}")
+        return "\n".join(out) + "\n"
+
+
+def _start():
+    _local.stats = RequestStats()
+    g.metrics_started = time.perf_counter()
+
+
+def _finish(status):
+    started = g.pop("metrics_started", None)
+    stats = current()
+    _local.stats = None
+    if started is None or stats is None:
+        return None, None
+    seconds = time.perf_counter() - started
+    route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+    current_app.extensions["metrics"].record(route, request.method, status, seconds, stats)
+    return seconds, stats
+
+
+def init_app(app):
+    """Подключает учёт к приложению: хук соединений пула и обработчики запросов."""
+    app.config.setdefault("METRICS_DEBUG_HEADER", False)
+    app.extensions["metrics"] = Registry()
+    app.extensions.setdefault("db_on_connect", []).append(instrument_connection)
+
+    @app.before_request
+    def start_metrics():
+        _start()
+
+    @app.after_request
+    def record_metrics(response):
+        seconds, stats = _finish(response.status_code)
+        if stats is not None and app.config.get("METRICS_DEBUG_HEADER"):
+            response.headers[DEBUG_HEADER] = (
+                f"queries={stats.queries}; rows={stats.rows}; vm_steps={stats.vm_steps}; "
+                f"time_ms={seconds * 1000:.1f}"
+            )
+        return response
+
+    @app.teardown_request
+    def record_failed_request(exc=None):
+        # after_request не вызывается, если обработчик упал
+        if "metrics_started" in g:
+            _finish(500)
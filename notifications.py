@@ -0,0 +1,417 @@
+"""
+Доставка уведомлений из таблицы notifications.
+
+Уведомления пишут триггеры БД: check_min_quantity (низкий запас
+комплектующих) и notify_status_change (смена статуса заявки, см.
+schema.py). Фоновый поток Dispatcher пачками читает ещё не доставленные
+строки (delivered_at IS NULL), раздаёт их получателям (sinks) и одним
+UPDATE отмечает пачку доставленной. Поток запросов при этом не ждёт
+доставки: маршрут только будит диспетчер методом wake().
+
+Если получатель не принял уведомления, пара «уведомление — получатель»
+попадает в таблицу notification_retries, и диспетчер повторяет доставку
+только этому получателю с растущей паузой (RETRY_DELAY, 2×RETRY_DELAY, ...),
+а после MAX_ATTEMPTS попыток сдаётся с записью в журнал.
+
+Получатель — любой объект с методом deliver(user_id, items), где items —
+список словарей уведомлений одного пользователя; повторы находят его по
+атрибуту name (по умолчанию — имя класса). Есть три получателя:
+  InAppFeed    — лента последних уведомлений каждого пользователя в памяти
+                 (только при одном процессе сервера, см. NOTIFICATION_FEED_IN_MEMORY);
+  EmailSink    — письма через SMTP (для разработки — локальный отладочный сервер);
+  WebhookSink  — POST с JSON на заданный адрес.
+Опрос новых уведомлений со страницы (/api/notifications) читает таблицу
+notifications — unread_after, — поэтому не зависит от процесса диспетчера.
+"""
+import json
+import logging
+import smtplib
+import sqlite3
+import threading
+import urllib.request
+from collections import deque
+from email.message import EmailMessage
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+POLL_INTERVAL = 5.0
+FEED_SIZE = 50
+RETRY_DELAY = 60        # пауза перед первой повторной доставкой, с
+MAX_ATTEMPTS = 8        # после стольких неудачных попыток получатель пропускается
+
+NOTIFICATION_COLUMNS = (
+    "notification_id", "user_id", "title", "message",
+    "notification_type", "related_request_id", "created_at",
+)
+
+
+def fetch_pending(conn, limit=BATCH_SIZE):
+    """
+    Первые limit недоставленных уведомлений по возрастанию id: словари
+    с полями NOTIFICATION_COLUMNS и email получателя.
+    """
+    columns = NOTIFICATION_COLUMNS + ("email",)
+    rows = conn.execute(
+        f"""
+        SELECT {", ".join("n." + c for c in NOTIFICATION_COLUMNS)}, u.email
+        FROM notifications n
+        LEFT JOIN users u ON u.user_id = n.user_id
+        WHERE n.delivered_at IS NULL
+        ORDER BY n.notification_id
+        LIMIT ?
+        """,
+        (limit,),
+    ).fetchall()
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def mark_delivered(conn, up_to_id, failures=()):
+    """
+    Отмечает доставленными все уведомления с id <= up_to_id.
+    Пачка читается по возрастанию id, а новые строки получают id больше
+    прочитанных, поэтому условие по диапазону задевает ровно эту пачку.
+    failures — пары (notification_id, имя получателя), которым доставить
+    не удалось: в той же транзакции они ставятся в очередь повторов.
+    """
+    with conn:
+        conn.executemany(
+            """
+            INSERT OR IGNORE INTO notification_retries (notification_id, sink, next_attempt_at)
+            VALUES (?, ?, DATETIME('now', '+' || ? || ' seconds'))
+            """,
+            [(notification_id, sink, RETRY_DELAY) for notification_id, sink in failures],
+        )
+        conn.execute(
+            """
+            UPDATE notifications SET delivered_at = DATETIME('now')
+            WHERE delivered_at IS NULL AND notification_id <= ?
+            """,
+            (up_to_id,),
+        )
+
+
+def fetch_retries(conn, limit=BATCH_SIZE):
+    """
+    Повторы, время которых подошло: словари уведомлений (как fetch_pending)
+    с именем получателя sink и числом уже сделанных попыток attempts.
+    """
+    columns = ("sink", "attempts") + NOTIFICATION_COLUMNS + ("email",)
+    rows = conn.execute(
+        f"""
+        SELECT r.sink, r.attempts, {", ".join("n." + c for c in NOTIFICATION_COLUMNS)}, u.email
+        FROM notification_retries r
+        JOIN notifications n ON n.notification_id = r.notification_id
+        LEFT JOIN users u ON u.user_id = n.user_id
+        WHERE r.next_attempt_at <= DATETIME('now')
+        ORDER BY r.next_attempt_at
+        LIMIT ?
+        """,
+        (limit,),
+    ).fetchall()
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def finish_retries(conn, done, failed):
+    """
+    done — пары (notification_id, получатель), которые больше не повторять;
+    failed — тройки (notification_id, получатель, attempts) для следующей
+    попытки: пауза удваивается с каждой неудачей.
+    """
+    with conn:
+        conn.executemany(
+            "DELETE FROM notification_retries WHERE notification_id = ? AND sink = ?",
+            done,
+        )
+        conn.executemany(
+            """
+            UPDATE notification_retries
+            SET attempts = attempts + 1,
+                next_attempt_at = DATETIME('now', '+' || ? || ' seconds')
+            WHERE notification_id = ? AND sink = ?
+            """,
+            [
+                (RETRY_DELAY * 2 ** attempts, notification_id, sink)
+                for notification_id, sink, attempts in failed
+            ],
+        )
+
+
+def unread_count(conn, user_id):
+    return conn.execute(
+        "SELECT COUNT(*) FROM notifications WHERE user_id = ? AND is_read = 0",
+        (user_id,),
+    ).fetchone()[0]
+
+
+def unread_after(conn, user_id, after_id=0, limit=FEED_SIZE):
+    """
+    Непрочитанные уведомления пользователя с id больше after_id, от новых
+    к старым (опрос со страницы). Идёт по idx_notifications_user.
+    """
+    rows = conn.execute(
+        f"""
+        SELECT {", ".join(NOTIFICATION_COLUMNS)}
+        FROM notifications
+        WHERE user_id = ? AND is_read = 0 AND notification_id > ?
+        ORDER BY notification_id DESC
+        LIMIT ?
+        """,
+        (user_id, after_id, limit),
+    ).fetchall()
+    return [dict(zip(NOTIFICATION_COLUMNS, row)) for row in rows]
+
+
+def user_notifications(conn, user_id, limit=FEED_SIZE):
+    """Последние уведомления пользователя из БД (для страницы уведомлений)."""
+    return conn.execute(
+        f"""
+        SELECT {", ".join(NOTIFICATION_COLUMNS)}, is_read
+        FROM notifications
+        WHERE user_id = ?
+        ORDER BY notification_id DESC
+        LIMIT ?
+        """,
+        (user_id, limit),
+    ).fetchall()
+
+
+def mark_read(conn, user_id, up_to_id=None):
+    """Отмечает прочитанными уведомления пользователя (все или с id <= up_to_id)."""
+    sql = "UPDATE notifications SET is_read = 1 WHERE user_id = ? AND is_read = 0"
+    params = [user_id]
+    if up_to_id is not None:
+        sql += " AND notification_id <= ?"
+        params.append(up_to_id)
+    with conn:
+        return conn.execute(sql, params).rowcount
+
+
+class InAppFeed:
+    """Последние уведомления каждого пользователя в памяти процесса."""
+
+    def __init__(self, size=FEED_SIZE):
+        self.size = size
+        self._feeds = {}
+        self._lock = threading.Lock()
+
+    def deliver(self, user_id, items):
+        with self._lock:
+            feed = self._feeds.setdefault(user_id, deque(maxlen=self.size))
+            feed.extend(items)
+
+    def recent(self, user_id, after_id=0):
+        """Уведомления пользователя с id больше after_id, от новых к старым."""
+        with self._lock:
+            feed = list(self._feeds.get(user_id, ()))
+        return [item for item in reversed(feed) if item["notification_id"] > after_id]
+
+    def discard(self, user_id, up_to_id=None):
+        """Убирает из ленты прочитанные уведомления."""
+        with self._lock:
+            feed = self._feeds.get(user_id)
+            if feed is None:
+                return
+            if up_to_id is None:
+                feed.clear()
+            else:
+                kept = [item for item in feed if item["notification_id"] > up_to_id]
+                feed.clear()
+                feed.extend(kept)
+
+
+class EmailSink:
+    """
+    Письмо каждому пользователю, у которого заполнен users.email.
+    Для разработки подойдёт локальный сервер: python -m aiosmtpd -n -l localhost:1025
+    """
+
+    def __init__(self, host="localhost", port=1025, sender="noreply@climate-repair.local"):
+        self.host = host
+        self.port = port
+        self.sender = sender
+
+    def deliver(self, user_id, items):
+        address = items[0].get("email")
+        if not address:
+            return
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = address
+        message["Subject"] = items[0]["title"] if len(items) == 1 else f"Уведомлений: {len(items)}"
+        message.set_content("\n\n".join(f"{i['title']}\n{i['message']}" for i in items))
+        with smtplib.SMTP(self.host, self.port, timeout=10) as smtp:
+            smtp.send_message(message)
+
+
+class WebhookSink:
+    """POST {"user_id": ..., "notifications": [...]} на url."""
+
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+
+    def deliver(self, user_id, items):
+        body = json.dumps({"user_id": user_id, "notifications": items}, ensure_ascii=False)
+        req = urllib.request.Request(
+            self.url,
+            data=body.encode("utf-8"),
+            headers={"Content-Type": "application/json; charset=utf-8"},
+            method="POST",
+        )
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            resp.read()
+
+
+def sink_name(sink):
+    """Имя получателя в notification_retries."""
+    return getattr(sink, "name", None) or type(sink).__name__
+
+
+class Dispatcher:
+    """Фоновый поток, который доставляет уведомления получателям."""
+
+    def __init__(self, db_path, sinks, batch_size=BATCH_SIZE, poll_interval=POLL_INTERVAL):
+        self.db_path = db_path
+        self.sinks = list(sinks)
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._conn = None
+        self.delivered = 0
+        self.errors = 0
+        self.abandoned = 0
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA busy_timeout = 5000")
+        return self._conn
+
+    def _deliver(self, sink, user_id, items):
+        """True, если получатель принял уведомления."""
+        try:
+            sink.deliver(user_id, items)
+        except Exception:
+            # Сбой внешнего получателя не должен останавливать остальных
+            self.errors += 1
+            logger.exception("Не удалось доставить уведомления через %s", sink_name(sink))
+            return False
+        return True
+
+    def run_once(self):
+        """Доставляет одну пачку. Возвращает число доставленных уведомлений."""
+        conn = self._connection()
+        items = fetch_pending(conn, self.batch_size)
+        if not items:
+            return 0
+
+        by_user = {}
+        for item in items:
+            by_user.setdefault(item["user_id"], []).append(item)
+        failures = []
+        for sink in self.sinks:
+            for user_id, user_items in by_user.items():
+                if not self._deliver(sink, user_id, user_items):
+                    failures.extend((item["notification_id"], sink_name(sink)) for item in user_items)
+
+        mark_delivered(conn, items[-1]["notification_id"], failures)
+        self.delivered += len(items)
+        return len(items)
+
+    def retry_once(self):
+        """
+        Повторяет одну пачку неудавшихся доставок, время которых подошло.
+        Возвращает число обработанных пар «уведомление — получатель».
+        """
+        conn = self._connection()
+        rows = fetch_retries(conn, self.batch_size)
+        if not rows:
+            return 0
+
+        sinks = {sink_name(sink): sink for sink in self.sinks}
+        groups = {}
+        for row in rows:
+            groups.setdefault((row["sink"], row["user_id"]), []).append(row)
+        done, failed = [], []
+        for (name, user_id), group in groups.items():
+            keys = [(row["notification_id"], name) for row in group]
+            sink = sinks.get(name)
+            if sink is None:
+                # Получателя убрали из настроек — повторять некому
+                done.extend(keys)
+            elif self._deliver(sink, user_id, group):
+                done.extend(keys)
+            else:
+                for row in group:
+                    if row["attempts"] + 1 < MAX_ATTEMPTS:
+                        failed.append((row["notification_id"], name, row["attempts"]))
+                        continue
+                    self.abandoned += 1
+                    logger.error(
+                        "Уведомление %d не доставлено через %s после %d попыток",
+                        row["notification_id"], name, MAX_ATTEMPTS,
+                    )
+                    done.append((row["notification_id"], name))
+
+        finish_retries(conn, done, failed)
+        return len(rows)
+
+    def drain(self):
+        """
+        Доставляет всё, что накопилось, и повторяет подошедшие по времени
+        неудачные доставки. Возвращает число новых уведомлений.
+        """
+        total = 0
+        while True:
+            count = self.run_once()
+            total += count
+            if count < self.batch_size:
+                break
+        while self.retry_once() == self.batch_size:
+            pass
+        return total
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.drain()
+            except sqlite3.Error:
+                logger.exception("Ошибка чтения уведомлений")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="notifications", daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        """Попросить поток проверить таблицу, не дожидаясь интервала опроса."""
+        self._wake.set()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stats(self):
+        return {
+            "running": self.running,
+            "delivered": self.delivered,
+            "errors": self.errors,
+            "abandoned": self.abandoned,
+            "sinks": [sink_name(sink) for sink in self.sinks],
+        }
@@ -0,0 +1,143 @@
+"""
+Постраничный вывод списка заявок (keyset-пагинация) и фильтры.
+
+Страница определяется курсором — парой (start_date, request_id) последней
+показанной заявки. Следующая страница читается условием
+(start_date, request_id) < курсор, поэтому её стоимость не зависит от
+того, насколько далеко пользователь пролистал список. Каждому фильтру
+соответствует составной индекс idx_requests_* (см. schema.py).
+"""
+import base64
+import binascii
+from datetime import datetime
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Параметр URL -> столбец заявки, сравниваемый на равенство
+EQUALITY_FILTERS = {
+    "status": "r.request_status",
+    "tech_type": "r.climate_tech_type",
+    "master_id": "r.master_id",
+    "client_id": "r.client_id",
+}
+INTEGER_FILTERS = ("master_id", "client_id")
+DATE_FILTERS = ("date_from", "date_to")
+# Флажок «включая архив»: к странице добавляются заявки из архива (archive.py)
+HISTORY_FILTER = "history"
+
+
+def encode_cursor(start_date, request_id):
+    raw = f"{start_date}|{request_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(value):
+    """Возвращает (start_date, request_id) или None для пустого/битого курсора."""
+    if not value:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(value.encode("ascii")).decode("utf-8")
+        start_date, request_id = raw.rsplit("|", 1)
+        return start_date, int(request_id)
+    except (ValueError, binascii.Error, UnicodeError):
+        return None
+
+
+def parse_filters(args):
+    """
+    Фильтры из параметров запроса.
+    Возвращает (filters, errors): некорректные значения пропускаются
+    и попадают в список ошибок для показа пользователю.
+    """
+    filters = {}
+    errors = []
+    for name in EQUALITY_FILTERS:
+        value = args.get(name, "").strip()
+        if not value:
+            continue
+        if name in INTEGER_FILTERS:
+            try:
+                value = int(value)
+            except ValueError:
+                errors.append(f"Некорректное значение фильтра: {value}")
+                continue
+        filters[name] = value
+    for name in DATE_FILTERS:
+        value = args.get(name, "").strip()
+        if not value:
+            continue
+        try:
+            datetime.strptime(value, "%Y-%m-%d")
+        except ValueError:
+            errors.append("Дата должна быть в формате ГГГГ-ММ-ДД.")
+            continue
+        filters[name] = value
+    if args.get(HISTORY_FILTER, "").strip() in ("1", "on"):
+        filters[HISTORY_FILTER] = True
+    return filters, errors
+
+
+def page_size(value):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def build_where(filters, cursor=None):
+    """Условия WHERE и параметры для фильтров и курсора."""
+    clauses = []
+    params = []
+    for name, column in EQUALITY_FILTERS.items():
+        if name in filters:
+            clauses.append(f"{column} = ?")
+            params.append(filters[name])
+    if "date_from" in filters:
+        clauses.append("r.start_date >= ?")
+        params.append(filters["date_from"])
+    if "date_to" in filters:
+        clauses.append("r.start_date <= ?")
+        params.append(filters["date_to"])
+    if cursor is not None:
+        clauses.append("(r.start_date, r.request_id) < (?, ?)")
+        params.extend(cursor)
+    return clauses, params
+
+
+def page_sql(select_sql, filters, cursor=None, limit=PAGE_SIZE, archive_sql=None):
+    """
+    SQL и параметры одной страницы заявок (на одну строку больше limit,
+    чтобы узнать, есть ли следующая страница).
+    select_sql — SELECT ... FROM requests r ... без WHERE и ORDER BY;
+    archive_sql — такой же SELECT по archive.requests: с фильтром history
+    ветки объединяются, и SQLite сливает их, читая обе по индексам в порядке
+    страницы.
+    """
+    clauses, params = build_where(filters, cursor)
+    where = " WHERE " + " AND ".join(clauses) if clauses else ""
+    if archive_sql is not None and filters.get(HISTORY_FILTER):
+        sql = f"{select_sql}{where} UNION ALL {archive_sql}{where} ORDER BY start_date DESC, request_id DESC LIMIT ?"
+        params = params * 2
+    else:
+        sql = f"{select_sql}{where} ORDER BY r.start_date DESC, r.request_id DESC LIMIT ?"
+    params.append(limit + 1)
+    return sql, params
+
+
+def fetch_page(conn, select_sql, filters, cursor=None, limit=PAGE_SIZE, archive_sql=None):
+    """
+    Одна страница заявок, отсортированных по (start_date, request_id) по убыванию.
+    select_sql — SELECT ... FROM requests r ... без WHERE и ORDER BY,
+    в выборке должны быть r.start_date и r.request_id.
+    Возвращает (rows, next_cursor); next_cursor = None на последней странице.
+    """
+    sql, params = page_sql(select_sql, filters, cursor, limit, archive_sql)
+    rows = conn.execute(sql, params).fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last["start_date"], last["request_id"])
+    return rows, next_cursor
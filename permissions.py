@@ -0,0 +1,54 @@
+"""
+Права доступа к заявкам.
+
+Права вычисляются по уже загруженным полям заявки (client_id, master_id),
+поэтому для списка заявок не нужны дополнительные запросы к БД:
+достаточно тех строк, которые вернул основной SELECT.
+"""
+
+# Роли, которым доступно всё без проверки конкретной заявки
+FULL_ACCESS_ROLES = ("Администратор", "Менеджер", "Менеджер по качеству")
+
+NO_RIGHTS = (False, False, False)
+
+
+def request_rights(user, client_id, master_id):
+    """
+    Права пользователя на заявку с указанными client_id и master_id.
+    Возвращает (может_редактировать, может_менять_статус, может_менять_всё)
+    """
+    user_type = user.get("user_type")
+    user_id = user.get("user_id")
+
+    if user_type in FULL_ACCESS_ROLES:
+        return (True, True, True)
+
+    if user_type == "Заказчик":
+        # Заказчик может редактировать только свои заявки (дату и проблему)
+        if client_id == user_id:
+            return (True, False, False)
+        return NO_RIGHTS
+
+    if user_type == "Специалист":
+        # Специалист может менять статус и добавлять комментарии к назначенным заявкам
+        if master_id == user_id:
+            return (True, True, False)
+        return NO_RIGHTS
+
+    if user_type == "Оператор":
+        # Оператор может редактировать базовые данные и менять статус
+        return (True, True, False)
+
+    return NO_RIGHTS
+
+
+def rights_for_rows(rows, user):
+    """
+    Права сразу для набора заявок.
+    Каждая строка должна содержать request_id, client_id и master_id.
+    Возвращает словарь {request_id: (редактирование, статус, всё)}.
+    """
+    return {
+        row["request_id"]: request_rights(user, row["client_id"], row["master_id"])
+        for row in rows
+    }
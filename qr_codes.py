@@ -0,0 +1,163 @@
+"""
+QR-коды со ссылкой на форму отзыва.
+
+У каждой заявки есть постоянный токен (requests.qr_code_token), который
+подставляется в поле формы (FEEDBACK_FORM_ENTRY в настройках приложения),
+чтобы отзыв можно было связать с заявкой.
+Токен выдаётся при создании заявки (schema.QR_TOKEN), поэтому выдача
+QR-кода только читает БД.
+Готовые PNG кэшируются по хэшу содержимого: в памяти (LRU ограниченного
+размера) и на диске. Хэш используется и как ETag, поэтому повторное
+сканирование того же кода получает 304 без повторной отрисовки.
+"""
+import hashlib
+import io
+import os
+import re
+import threading
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+import qrcode
+
+
+# Ссылка на Google‑форму из ТЗ
+FEEDBACK_FORM_URL = (
+    "https://docs.google.com/forms/d/e/"
+    "1FAIpQLSdhZcExx6LSIXxk0ub55mSu-WIh23WYdGG9HY5EZhLDo7P8eA/viewform?usp=sf_link"
+)
+
+# Параметры отрисовки входят в ключ кэша: при их изменении старые файлы не используются
+QR_BOX_SIZE = 10
+QR_BORDER = 4
+RENDER_VERSION = 1
+
+_ENTRY_RE = re.compile(r"entry\.\d+")
+
+
+def feedback_url(token, entry=None):
+    """
+    Ссылка на форму отзыва. Google Forms принимает только параметры
+    предзаполнения полей (entry.NNN — номер поля берётся из ссылки
+    «Получить ссылку для предварительного заполнения»): с entry токен
+    заявки подставляется в это поле, без него ссылка ведёт на пустую форму.
+    """
+    if not entry:
+        return FEEDBACK_FORM_URL
+    if not _ENTRY_RE.fullmatch(entry):
+        raise ValueError(f"Поле формы должно иметь вид entry.NNN, получено {entry!r}")
+    base = FEEDBACK_FORM_URL.split("?", 1)[0]
+    return f"{base}?{urlencode({'usp': 'pp_url', entry: token})}"
+
+
+def get_token(conn, request_id):
+    """Токен QR-кода заявки или None, если заявки нет."""
+    row = conn.execute(
+        "SELECT qr_code_token FROM requests WHERE request_id = ?",
+        (request_id,),
+    ).fetchone()
+    return row[0] if row else None
+
+
+def get_tokens(conn, request_ids):
+    """Токены набора заявок: словарь {request_id: token} только для существующих заявок."""
+    tokens = {}
+    ids = list(request_ids)
+    # Ограничение SQLite на число параметров в одном запросе
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        placeholders = ", ".join("?" * len(chunk))
+        for row in conn.execute(
+            f"SELECT request_id, qr_code_token FROM requests WHERE request_id IN ({placeholders})",
+            chunk,
+        ):
+            tokens[row[0]] = row[1]
+    return tokens
+
+
+def content_key(data):
+    raw = f"{RENDER_VERSION}|{QR_BOX_SIZE}|{QR_BORDER}|{data}".encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+
+def make_image(data):
+    qr = qrcode.QRCode(box_size=QR_BOX_SIZE, border=QR_BORDER)
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr.make_image(fill_color="black", back_color="white")
+
+
+def render_png(data):
+    buffer = io.BytesIO()
+    make_image(data).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class QRCache:
+    """Кэш PNG по ключу содержимого: LRU в памяти + файлы на диске."""
+
+    def __init__(self, directory=None, max_items=256):
+        self.directory = directory
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.png")
+
+    def _remember(self, key, png):
+        with self._lock:
+            self._items[key] = png
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def get(self, data):
+        """Возвращает (key, png) для содержимого data, отрисовывая при необходимости."""
+        key = content_key(data)
+        with self._lock:
+            png = self._items.get(key)
+            if png is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return key, png
+
+        if self.directory:
+            try:
+                with open(self._path(key), "rb") as f:
+                    png = f.read()
+            except OSError:
+                png = None
+            if png is not None:
+                self.disk_hits += 1
+                self._remember(key, png)
+                return key, png
+
+        png = render_png(data)
+        self.misses += 1
+        self._remember(key, png)
+        if self.directory:
+            self._write(key, png)
+        return key, png
+
+    def _write(self, key, png):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Запись через временный файл, чтобы параллельный читатель не увидел половину PNG
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(png)
+        os.replace(tmp_path, path)
+
+    def stats(self):
+        with self._lock:
+            size = len(self._items)
+        return {
+            "items": size,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,264 @@
+"""
+Листы наклеек с QR-кодами для печати (PDF или PNG).
+
+Заявки выбираются списком номеров или фильтром (период, статус).
+Отрисовка QR-кодов — самая дорогая часть, поэтому при большом числе
+наклеек она распределяется по пулу процессов (make_pool; веб-приложение
+держит один пул на процесс); небольшие партии рисуются в текущем
+процессе. Наклейки рисуются и раскладываются по листам пачками
+по PAGES_PER_BATCH листов, а PDF кодирует листы по одному, так что
+в памяти не лежит весь документ. PNG — одна картинка со всеми листами,
+поэтому он ограничен MAX_PNG_PAGES листами.
+
+Запуск из командной строки:
+    python qr_labels.py --from 2025-12-01 --to 2025-12-31 --out labels.pdf
+    python qr_labels.py --ids 1 2 3 --format png --out labels.png
+"""
+import argparse
+import functools
+import io
+import multiprocessing
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageDraw, ImageFont
+
+import pagination
+import qr_codes
+
+# Лист A4 при 150 dpi
+PAGE_WIDTH = 1240
+PAGE_HEIGHT = 1754
+PAGE_DPI = 150
+PAGE_MARGIN = 60
+COLUMNS = 3
+ROWS = 4
+LABELS_PER_PAGE = COLUMNS * ROWS
+
+LABEL_WIDTH = (PAGE_WIDTH - 2 * PAGE_MARGIN) // COLUMNS
+LABEL_HEIGHT = (PAGE_HEIGHT - 2 * PAGE_MARGIN) // ROWS
+CAPTION_HEIGHT = 60
+FONT_SIZE = 30
+
+# Не больше стольких наклеек за один запрос
+MAX_LABELS = 2000
+# PNG собирается в одну картинку: ~2 МБ на лист, поэтому листов немного
+MAX_PNG_PAGES = 4
+# С какого числа наклеек имеет смысл отдавать отрисовку пулу процессов
+PARALLEL_THRESHOLD = 24
+# Сколько листов рисуется за раз: в памяти — наклейки только этих листов
+PAGES_PER_BATCH = 8
+
+FORMATS = {"pdf": "application/pdf", "png": "image/png"}
+
+_FONT_CANDIDATES = ("DejaVuSans.ttf", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf")
+
+
+@functools.lru_cache(maxsize=1)
+def _load_font():
+    for name in _FONT_CANDIDATES:
+        try:
+            return ImageFont.truetype(name, FONT_SIZE)
+        except OSError:
+            continue
+    return ImageFont.load_default(size=FONT_SIZE)
+
+
+def render_label(item):
+    """
+    Одна наклейка: QR-код и номер заявки под ним.
+    item = (подпись, ссылка). Функция верхнего уровня, чтобы её можно было
+    передать в пул процессов; возвращает пиксели в градациях серого
+    (LABEL_WIDTH x LABEL_HEIGHT) без сжатия — так дешевле, чем кодировать PNG.
+    """
+    caption, url = item
+    label = Image.new("L", (LABEL_WIDTH, LABEL_HEIGHT), 255)
+
+    qr = qr_codes.make_image(url).get_image().convert("L")
+    side = min(LABEL_WIDTH, LABEL_HEIGHT - CAPTION_HEIGHT) - 20
+    qr = qr.resize((side, side), Image.NEAREST)
+    label.paste(qr, ((LABEL_WIDTH - side) // 2, 10))
+
+    draw = ImageDraw.Draw(label)
+    font = _load_font()
+    text_width = draw.textlength(caption, font=font)
+    draw.text(
+        ((LABEL_WIDTH - text_width) / 2, LABEL_HEIGHT - CAPTION_HEIGHT),
+        caption,
+        fill=0,
+        font=font,
+    )
+    draw.rectangle((0, 0, LABEL_WIDTH - 1, LABEL_HEIGHT - 1), outline=180)
+    return label.tobytes()
+
+
+def make_pool(workers=None):
+    """
+    Пул процессов для render_label. Процессы запускаются через spawn:
+    fork многопоточного процесса (веб-приложение с фоновыми потоками)
+    копирует и захваченные другими потоками блокировки.
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count() or 1,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+def render_labels(items, pool=None):
+    """Пиксели наклеек в исходном порядке (см. render_label); с pool — в пуле процессов."""
+    if pool is None:
+        return [render_label(item) for item in items]
+    return list(pool.map(render_label, items, chunksize=4))
+
+
+def page_count(labels):
+    """Сколько листов займут labels наклеек."""
+    return -(-labels // LABELS_PER_PAGE)
+
+
+def compose_page(labels):
+    """Лист A4 с наклейками (не больше LABELS_PER_PAGE)."""
+    page = Image.new("L", (PAGE_WIDTH, PAGE_HEIGHT), 255)
+    for index, pixels in enumerate(labels):
+        row, col = divmod(index, COLUMNS)
+        label = Image.frombytes("L", (LABEL_WIDTH, LABEL_HEIGHT), pixels)
+        page.paste(label, (PAGE_MARGIN + col * LABEL_WIDTH, PAGE_MARGIN + row * LABEL_HEIGHT))
+    return page
+
+
+def iter_pages(items, pool=None):
+    """Листы с наклейками items по одному; отрисовка — пачками по PAGES_PER_BATCH листов."""
+    if len(items) < PARALLEL_THRESHOLD:
+        pool = None
+    batch = PAGES_PER_BATCH * LABELS_PER_PAGE
+    for start in range(0, len(items), batch):
+        labels = render_labels(items[start:start + batch], pool)
+        for first in range(0, len(labels), LABELS_PER_PAGE):
+            yield compose_page(labels[first:first + LABELS_PER_PAGE])
+
+
+class _PageFrames(Image.Image):
+    """
+    Листы документа как кадры одного изображения. PDF-кодировщик Pillow
+    (save_all) перебирает кадры через seek, поэтому листы строятся по мере
+    записи и в памяти держится только текущий; append_images потребовал бы
+    все листы сразу.
+    """
+
+    def __init__(self, pages, count):
+        super().__init__()
+        self._pages = iter(pages)
+        self.n_frames = count
+        self._frame = -1
+        self.seek(0)
+
+    def seek(self, frame):
+        if frame == self._frame:
+            return
+        if frame != self._frame + 1 or frame >= self.n_frames:
+            raise EOFError(f"лист {frame} недоступен: листы читаются по порядку")
+        page = next(self._pages)
+        self.im, self._mode, self._size = page.im, page.mode, page.size
+        self._frame = frame
+
+    def tell(self):
+        return self._frame
+
+
+def build_document(pages, count, fmt="pdf"):
+    """Многостраничный PDF или один PNG, в котором листы идут друг под другом."""
+    buffer = io.BytesIO()
+    if fmt == "pdf":
+        _PageFrames(pages, count).save(buffer, format="PDF", save_all=True, resolution=PAGE_DPI)
+    else:
+        if count > MAX_PNG_PAGES:
+            raise ValueError(f"PNG — не больше {MAX_PNG_PAGES} листов, для {count} выберите PDF")
+        sheet = Image.new("L", (PAGE_WIDTH, PAGE_HEIGHT * count), 255)
+        for index, page in enumerate(pages):
+            sheet.paste(page, (0, index * PAGE_HEIGHT))
+        sheet.save(buffer, format="PNG", optimize=False)
+    return buffer.getvalue()
+
+
+def select_requests(conn, request_ids=None, filters=None, limit=MAX_LABELS):
+    """
+    Заявки для печати: по списку номеров или по фильтрам
+    (status, date_from, date_to — как в списке заявок).
+    Возвращает список (request_id, request_number) по возрастанию request_id.
+    """
+    if request_ids:
+        ids = sorted(set(int(i) for i in request_ids))[:limit]
+        placeholders = ", ".join("?" * len(ids))
+        return conn.execute(
+            f"SELECT request_id, request_number FROM requests "
+            f"WHERE request_id IN ({placeholders}) ORDER BY request_id",
+            ids,
+        ).fetchall()
+
+    clauses, params = pagination.build_where(filters or {})
+    sql = "SELECT r.request_id, r.request_number FROM requests r"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY r.request_id LIMIT ?"
+    return conn.execute(sql, params + [limit]).fetchall()
+
+
+def build_label_sheet(conn, rows, fmt="pdf", pool=None, entry=None):
+    """
+    Документ с наклейками для выбранных заявок (байты файла) или None, если заявок нет.
+    pool — пул процессов отрисовки (make_pool), entry — поле формы отзыва
+    для токена заявки (см. qr_codes.feedback_url).
+    """
+    if not rows:
+        return None
+    tokens = qr_codes.get_tokens(conn, [r[0] for r in rows])
+    items = [
+        (r[1] or f"№ {r[0]}", qr_codes.feedback_url(tokens[r[0]], entry))
+        for r in rows
+    ]
+    return build_document(iter_pages(items, pool), page_count(len(items)), fmt)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Печать наклеек с QR-кодами заявок")
+    parser.add_argument("--db", default="climate_repair.db", help="путь к файлу БД")
+    parser.add_argument("--ids", type=int, nargs="+", help="номера заявок (request_id)")
+    parser.add_argument("--status", help="статус заявки")
+    parser.add_argument("--from", dest="date_from", help="дата начала, ГГГГ-ММ-ДД")
+    parser.add_argument("--to", dest="date_to", help="дата окончания, ГГГГ-ММ-ДД")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="pdf")
+    parser.add_argument("--workers", type=int, default=None, help="число процессов отрисовки")
+    parser.add_argument("--entry", help="поле формы отзыва для токена заявки (entry.NNN)")
+    parser.add_argument("--out", required=True, help="файл для сохранения")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        raise SystemExit(f"Файл базы данных '{args.db}' не найден.")
+
+    filters = {
+        name: value
+        for name, value in (("status", args.status), ("date_from", args.date_from), ("date_to", args.date_to))
+        if value
+    }
+    conn = sqlite3.connect(args.db)
+    rows = select_requests(conn, args.ids, filters)
+    if args.format == "png" and page_count(len(rows)) > MAX_PNG_PAGES:
+        raise SystemExit(f"PNG — не больше {MAX_PNG_PAGES * LABELS_PER_PAGE} наклеек, выберите PDF.")
+    pool = make_pool(args.workers) if args.workers != 1 else None
+    try:
+        document = build_label_sheet(conn, rows, args.format, pool, args.entry)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        conn.close()
+    if document is None:
+        raise SystemExit("Заявки не найдены.")
+
+    with open(args.out, "wb") as f:
+        f.write(document)
+    print(f"Наклеек: {len(rows)}, файл: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
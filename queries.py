@@ -0,0 +1,228 @@
+"""
+Именованные запросы SQL веб-приложения.
+
+Маршруты web_app.py не держат SQL в теле функций: каждый оператор —
+константа этого модуля, зарегистрированная под именем в REGISTRY вместе
+с примером параметров. Туда же попадают запросы других модулей, которые
+выполняются на страницах (справочники, /stats), и варианты списка
+заявок для каждого фильтра (pagination.page_sql).
+
+По реестру tests/test_queries.py строит EXPLAIN QUERY PLAN на большой
+сгенерированной БД и падает на полном проходе таблицы (SCAN без индекса,
+а по индексу — без LIMIT) и на сортировке во временном B-дереве
+(USE TEMP B-TREE). Если такой план ожидаем (маленькая таблица, список
+целиком), он перечисляется в allow запроса с причиной в комментарии.
+"""
+from collections import namedtuple
+
+import pagination
+import reference_data
+import schema
+import stats_summary
+
+# sql — текст запроса, params — пример параметров для EXPLAIN QUERY PLAN,
+# allow — строки плана, которые для этого запроса допустимы
+Query = namedtuple("Query", "sql params allow")
+
+REGISTRY = {}
+
+
+def register(name, sql, params=(), allow=()):
+    """Добавляет запрос в реестр; возвращает sql для константы модуля."""
+    if name in REGISTRY:
+        raise ValueError(f"Запрос {name} уже зарегистрирован")
+    REGISTRY[name] = Query(sql, params, tuple(allow))
+    return sql
+
+
+# --- Пользователи ---
+
+LOGIN_SQL = register("login", """
+    SELECT user_id, fio, user_type, is_active
+    FROM users
+    WHERE login = ? AND password = ?
+""", ("login1", "pass1"))
+
+INSERT_CLIENT_SQL = register("insert_client", """
+    INSERT INTO users (fio, phone, login, password, user_type)
+    VALUES (?, ?, ?, ?, 'Заказчик')
+""", ("Заказчик", None, "client_login", "password"))
+
+USER_FIO_SQL = register("user_fio", """
+    SELECT fio FROM users WHERE user_id = ?
+""", (2,))
+
+UPDATE_USER_ROLE_SQL = register("update_user_role", """
+    UPDATE users
+    SET user_type = ?, is_active = ?
+    WHERE user_id = ?
+    RETURNING fio
+""", ("Специалист", 1, 2))
+
+# Страница управления выводит всех пользователей — проход idx_users_type
+# в нужном порядке, без сортировки
+USERS_LIST_SQL = register("users_list", """
+    SELECT user_id, fio, phone, login, user_type, registration_date, is_active
+    FROM users
+    ORDER BY user_type, fio
+""", allow=("SCAN users USING INDEX idx_users_type",))
+
+register("specialists", reference_data.SPECIALISTS_SQL)
+
+# --- Заявки ---
+
+# Поля формы новой заявки (INSERT строится schema.insert_request_sql)
+NEW_REQUEST_COLUMNS = ("start_date", "climate_tech_type", "climate_tech_model",
+                       "problem_description", "request_status", "client_id", "master_id")
+
+INSERT_REQUEST_SQL = register(
+    "insert_request",
+    schema.insert_request_sql(NEW_REQUEST_COLUMNS),
+    {
+        "start_date": "2025-01-15", "climate_tech_type": "Кондиционер",
+        "climate_tech_model": "TCL", "problem_description": "Не охлаждает",
+        "request_status": "Новая заявка", "client_id": 6, "master_id": None,
+    },
+)
+
+REQUEST_OWNERS_SQL = register("request_owners", """
+    SELECT client_id, master_id FROM requests WHERE request_id = ?
+""", (1,))
+
+REQUEST_HEADER_SQL = register("request_header", """
+    SELECT request_id, request_number, climate_tech_type, climate_tech_model, request_status
+    FROM requests WHERE request_id = ?
+""", (1,))
+
+REQUEST_EDIT_SQL = register("request_edit", """
+    SELECT
+        r.request_id, r.request_number, r.start_date,
+        r.climate_tech_type, r.climate_tech_model,
+        r.problem_description, r.request_status,
+        r.completion_date, r.master_id, r.client_id,
+        r.priority, r.estimated_time, r.deadline_extension,
+        r.extension_reason, r.due_at,
+        u.fio AS client_fio,
+        m.fio AS master_fio,
+        m.phone AS master_phone
+    FROM requests r
+    LEFT JOIN users u ON r.client_id = u.user_id
+    LEFT JOIN users m ON r.master_id = m.user_id
+    WHERE r.request_id = ?
+""", (1,))
+
+# Мастер и статус заявки перед правкой — читаются в той же операции записи,
+# что и UPDATE, чтобы пересчитать нагрузку мастеров (assignment.py)
+REQUEST_MASTER_STATUS_SQL = register("request_master_status", """
+    SELECT master_id, request_status FROM requests WHERE request_id = ?
+""", (1,))
+
+# Правка заявки: менеджер меняет всё, специалист — кроме заказчика и продления,
+# заказчик — только дату и описание. updated_at задан в самом UPDATE —
+# триггер строку не переписывает
+UPDATE_REQUEST_ALL_SQL = register("update_request_all", """
+    UPDATE requests SET
+        start_date = ?,
+        climate_tech_type = ?,
+        climate_tech_model = ?,
+        problem_description = ?,
+        request_status = ?,
+        completion_date = ?,
+        master_id = ?,
+        client_id = ?,
+        priority = ?,
+        estimated_time = ?,
+        deadline_extension = ?,
+        extension_reason = ?,
+        updated_at = DATETIME('now')
+    WHERE request_id = ?
+""", ("2025-01-15", "Кондиционер", "TCL", "Не охлаждает", "В процессе ремонта",
+      None, 2, 6, "Обычный", None, None, None, 1))
+
+UPDATE_REQUEST_STATUS_SQL = register("update_request_status", """
+    UPDATE requests SET
+        start_date = ?,
+        climate_tech_type = ?,
+        climate_tech_model = ?,
+        problem_description = ?,
+        request_status = ?,
+        completion_date = ?,
+        master_id = ?,
+        priority = ?,
+        estimated_time = ?,
+        updated_at = DATETIME('now')
+    WHERE request_id = ?
+""", ("2025-01-15", "Кондиционер", "TCL", "Не охлаждает", "В процессе ремонта",
+      None, 2, "Обычный", None, 1))
+
+UPDATE_REQUEST_CLIENT_SQL = register("update_request_client", """
+    UPDATE requests SET
+        start_date = ?,
+        problem_description = ?,
+        updated_at = DATETIME('now')
+    WHERE request_id = ?
+""", ("2025-01-15", "Не охлаждает", 1))
+
+# Список заявок: SELECT без WHERE и ORDER BY, страницу строит pagination.page_sql.
+# С фильтром «включая архив» к нему добавляется тот же SELECT по архиву (archive.py)
+_REQUESTS_LIST_TEMPLATE = """
+    SELECT
+        {archived} AS archived,
+        r.request_id,
+        r.request_number,
+        r.start_date,
+        r.climate_tech_type,
+        r.climate_tech_model,
+        r.problem_description,
+        r.request_status,
+        r.master_id,
+        r.client_id,
+        u.fio AS client_fio,
+        m.fio AS master_fio,
+        m.phone AS master_phone,
+        r.comment_count,
+        r.last_comment_at,
+        r.public_comment_count,
+        r.last_public_comment_at
+    FROM {table} r
+    LEFT JOIN users u ON r.client_id = u.user_id
+    LEFT JOIN users m ON r.master_id = m.user_id
+"""
+REQUESTS_LIST_SQL = _REQUESTS_LIST_TEMPLATE.format(archived=0, table="requests")
+ARCHIVE_REQUESTS_LIST_SQL = _REQUESTS_LIST_TEMPLATE.format(archived=1, table="archive.requests")
+
+# Фильтр списка -> пример значений; у каждого своя страница из индекса
+LIST_FILTERS = {
+    "": {},
+    "status": {"status": "Новая заявка"},
+    "tech_type": {"tech_type": "Кондиционер"},
+    "master": {"master_id": 2},
+    "client": {"client_id": 6},
+    "dates": {"date_from": "2024-01-01", "date_to": "2024-12-31"},
+}
+
+
+def _register_list_pages():
+    """Первая и следующая страница списка заявок для каждого фильтра, без архива и с ним."""
+    for suffix, filters in LIST_FILTERS.items():
+        for history in (False, True):
+            for cursor in (None, ("2024-06-01", 1000)):
+                sql, params = pagination.page_sql(
+                    REQUESTS_LIST_SQL, dict(filters, history=history), cursor,
+                    archive_sql=ARCHIVE_REQUESTS_LIST_SQL,
+                )
+                name = "requests_list" + "".join(
+                    part for part, used in ((f".{suffix}", suffix), (".history", history), (".next", cursor))
+                    if used
+                )
+                register(name, sql, params)
+
+
+_register_list_pages()
+
+# --- Статистика ---
+
+register("stats_finished", stats_summary.FINISHED_SQL, (stats_summary.FINISHED_STATUS,))
+# stats_summary — строка на пару (статус, тип оборудования), несколько десятков строк
+register("stats_types", stats_summary.TYPES_SQL,
+         allow=("SCAN stats_summary", "USE TEMP B-TREE FOR GROUP BY", "USE TEMP B-TREE FOR ORDER BY"))
@@ -0,0 +1,91 @@
+"""
+Справочники для выпадающих списков: активные специалисты (мастер заявки).
+
+Списки нужны почти каждой форме заявки, а меняются редко, поэтому они
+хранятся в памяти процесса. У кэша есть номер версии: маршруты, которые
+меняют роли и активность пользователей (управление пользователями),
+вызывают invalidate(), и следующее чтение загружает списки заново.
+Заказчиков форма целиком не загружает — их ищет client_lookup.py.
+
+Изменения из других процессов (несколько воркеров, запись из консоли)
+можно отслеживать через PRAGMA data_version (check_data_version=True):
+значение меняется, когда БД изменило другое соединение. Проверка
+сбрасывает кэш при любой чужой записи, не только в users, поэтому
+включать её стоит только при нескольких процессах.
+"""
+import threading
+
+# По ветке на роль: каждая читается из idx_users_type_active_fio уже
+# по ФИО, и SQLite сливает их без сортировки (с IN (...) сортировал бы)
+SPECIALISTS_SQL = """
+    SELECT user_id, fio, phone FROM users WHERE user_type = 'Специалист' AND is_active = 1
+    UNION ALL
+    SELECT user_id, fio, phone FROM users WHERE user_type = 'Менеджер' AND is_active = 1
+    ORDER BY fio
+"""
+
+LISTS = {
+    "specialists": SPECIALISTS_SQL,
+}
+
+
+class ReferenceCache:
+    """Версионированный кэш справочников одной БД."""
+
+    def __init__(self, path=None, check_data_version=False):
+        self.path = path
+        self.check_data_version = check_data_version
+        self.version = 0
+        self._lists = {}
+        # id(conn) -> последнее увиденное этим соединением PRAGMA data_version
+        self._data_versions = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self):
+        """Сбрасывает все списки; вызывается после изменения пользователей."""
+        with self._lock:
+            self.version += 1
+            self._lists.clear()
+
+    def _check_external_changes(self, conn):
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        key = id(conn)
+        with self._lock:
+            seen = self._data_versions.get(key)
+            self._data_versions[key] = data_version
+        if seen is not None and seen != data_version:
+            self.invalidate()
+
+    def get(self, conn, name):
+        """Список name (ключ LISTS) как кортеж строк."""
+        if self.check_data_version:
+            self._check_external_changes(conn)
+
+        with self._lock:
+            rows = self._lists.get(name)
+            if rows is not None:
+                self.hits += 1
+                return rows
+            version = self.version
+
+        rows = tuple(conn.execute(LISTS[name]).fetchall())
+        with self._lock:
+            self.misses += 1
+            # Пока список читался, его могли сбросить — тогда не сохраняем
+            if self.version == version:
+                self._lists[name] = rows
+        return rows
+
+    def specialists(self, conn):
+        return self.get(conn, "specialists")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "version": self.version,
+                "lists": sorted(self._lists),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
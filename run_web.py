@@ -40,7 +40,7 @@ def check_database():
         print("=" * 60)
         print(f"Файл '{db_name}' отсутствует.")
         print("\nСначала создайте базу данных:")
-        print("  python test.py")
+        print(f"  python import_data.py seed --db {db_name}")
         print("=" * 60)
         return False
     
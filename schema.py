@@ -0,0 +1,694 @@
+"""
+Миграции схемы БД.
+
+database_schema.sql описывает исходную схему учебной БД. Всё, что
+добавлялось позже (индексы, служебные таблицы, триггеры), описано здесь
+списком миграций. Номер последней применённой миграции хранится
+в PRAGMA user_version, поэтому каждая миграция выполняется один раз.
+Миграции пишутся идемпотентно (IF NOT EXISTS и т.п.).
+"""
+import os
+import sqlite3
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "database_schema.sql")
+
+
+def _add_column(conn, table, column, definition):
+    """ALTER TABLE ... ADD COLUMN, если столбца ещё нет (у SQLite нет IF NOT EXISTS)."""
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def _update_requests_quietly(conn, sql):
+    """
+    Служебное заполнение столбцов заявок в миграции: updated_at при этом
+    меняться не должен, поэтому триггер update_requests_timestamp
+    временно снимается и создаётся заново.
+    """
+    timestamp_sql = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'update_requests_timestamp'"
+    ).fetchone()
+    if timestamp_sql:
+        conn.execute("DROP TRIGGER update_requests_timestamp")
+    conn.execute(sql)
+    if timestamp_sql:
+        conn.execute(timestamp_sql[0])
+
+
+def _notifications_delivery(conn):
+    # Когда уведомление передано получателям (notifications.py); NULL — ещё не доставлено
+    _add_column(conn, "notifications", "delivered_at", "TEXT")
+    for statement in (
+        """
+        CREATE INDEX IF NOT EXISTS idx_notifications_pending
+        ON notifications(notification_id) WHERE delivered_at IS NULL
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_notifications_user
+        ON notifications(user_id, is_read, notification_id)
+        """,
+        # Смена статуса заявки (запись в request_history от track_status_changes)
+        # порождает уведомления заказчику и назначенному мастеру.
+        # Сохранение формы без смены статуса тоже пишет историю — такие строки пропускаются.
+        """
+        CREATE TRIGGER IF NOT EXISTS notify_status_change
+        AFTER INSERT ON request_history
+        WHEN NEW.old_status IS NOT NEW.new_status
+        BEGIN
+            INSERT INTO notifications (user_id, title, message, notification_type, related_request_id)
+            SELECT u.user_id,
+                   'Статус заявки изменён',
+                   'Заявка ' || COALESCE(r.request_number, r.request_id) || ': '
+                       || COALESCE(NEW.old_status, '—') || ' → ' || NEW.new_status,
+                   CASE
+                       WHEN NEW.new_status IN ('Готова к выдаче', 'Завершена') THEN 'success'
+                       WHEN NEW.new_status = 'Отменена' THEN 'warning'
+                       ELSE 'info'
+                   END,
+                   r.request_id
+            FROM requests r
+            JOIN users u ON u.user_id IN (r.client_id, r.master_id)
+            WHERE r.request_id = NEW.request_id;
+        END
+        """,
+    ):
+        conn.execute(statement)
+
+
+def _timeline_indexes(conn):
+    # Время последнего изменения строки детали — для ленты событий заявки
+    # (timeline.py). DEFAULT DATETIME('now') у ALTER TABLE ADD COLUMN
+    # запрещён, поэтому время ставят триггеры, а старые строки получают
+    # самую позднюю из дат заказа/поступления.
+    _add_column(conn, "request_parts", "changed_at", "TEXT")
+    for statement in (
+        """
+        UPDATE request_parts
+        SET changed_at = COALESCE(actual_date, order_date, expected_date, DATETIME('now'))
+        WHERE changed_at IS NULL
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS request_parts_changed_insert
+        AFTER INSERT ON request_parts
+        WHEN NEW.changed_at IS NULL
+        BEGIN
+            UPDATE request_parts SET changed_at = DATETIME('now')
+            WHERE request_part_id = NEW.request_part_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS request_parts_changed_update
+        AFTER UPDATE OF status, quantity_needed, quantity_used ON request_parts
+        BEGIN
+            UPDATE request_parts SET changed_at = DATETIME('now')
+            WHERE request_part_id = NEW.request_part_id;
+        END
+        """,
+        # Ветки ленты читают диапазон (request_id, время, id) от конца; id
+        # сразу после времени, чтобы порядок ленты совпадал с порядком индекса.
+        # История и детали — покрывающие индексы.
+        """
+        CREATE INDEX IF NOT EXISTS idx_history_request_timeline
+        ON request_history(request_id, changed_at, history_id,
+                           old_status, new_status, changed_by, change_reason)
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_requestparts_timeline
+        ON request_parts(request_id, changed_at, request_part_id,
+                         part_id, status, quantity_needed, quantity_used)
+        """,
+        # Текст комментария в индекс не копируется: индекс отбирает строки
+        # страницы (с учётом is_internal), текст читается только для них
+        """
+        CREATE INDEX IF NOT EXISTS idx_comments_request_timeline
+        ON comments(request_id, created_at, comment_id, is_internal)
+        """,
+    ):
+        conn.execute(statement)
+
+
+# Пересчёт счётчиков комментариев заявки по таблице comments
+_RECOUNT_COMMENTS = """
+    comment_count = (SELECT COUNT(*) FROM comments c WHERE c.request_id = requests.request_id),
+    last_comment_at = (SELECT MAX(c.created_at) FROM comments c
+                       WHERE c.request_id = requests.request_id),
+    public_comment_count = (SELECT COUNT(*) FROM comments c
+                            WHERE c.request_id = requests.request_id AND c.is_internal = 0),
+    last_public_comment_at = (SELECT MAX(c.created_at) FROM comments c
+                              WHERE c.request_id = requests.request_id AND c.is_internal = 0)
+"""
+
+
+def _comment_counters(conn):
+    # Счётчики комментариев на заявке (comments.py): все и видимые заказчику
+    _add_column(conn, "requests", "comment_count", "INTEGER NOT NULL DEFAULT 0")
+    _add_column(conn, "requests", "last_comment_at", "TEXT")
+    _add_column(conn, "requests", "public_comment_count", "INTEGER NOT NULL DEFAULT 0")
+    _add_column(conn, "requests", "last_public_comment_at", "TEXT")
+
+    # Заполнение по уже существующим комментариям
+    _update_requests_quietly(
+        conn,
+        f"""
+        UPDATE requests SET {_RECOUNT_COMMENTS}
+        WHERE request_id IN (SELECT DISTINCT request_id FROM comments)
+        """,
+    )
+
+    for statement in (
+        """
+        CREATE TRIGGER IF NOT EXISTS comments_counters_insert
+        AFTER INSERT ON comments
+        BEGIN
+            UPDATE requests SET
+                comment_count = comment_count + 1,
+                last_comment_at = MAX(COALESCE(last_comment_at, ''), NEW.created_at),
+                public_comment_count = public_comment_count + (COALESCE(NEW.is_internal, 0) = 0),
+                last_public_comment_at = CASE
+                    WHEN COALESCE(NEW.is_internal, 0) = 0
+                    THEN MAX(COALESCE(last_public_comment_at, ''), NEW.created_at)
+                    ELSE last_public_comment_at
+                END
+            WHERE request_id = NEW.request_id;
+        END
+        """,
+        # Удаление и правка комментариев редки — счётчики пересчитываются
+        # по индексу comments(request_id, ...) только для затронутых заявок
+        f"""
+        CREATE TRIGGER IF NOT EXISTS comments_counters_delete
+        AFTER DELETE ON comments
+        BEGIN
+            UPDATE requests SET {_RECOUNT_COMMENTS}
+            WHERE request_id = OLD.request_id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS comments_counters_update
+        AFTER UPDATE OF request_id, is_internal, created_at ON comments
+        BEGIN
+            UPDATE requests SET {_RECOUNT_COMMENTS}
+            WHERE request_id IN (OLD.request_id, NEW.request_id);
+        END
+        """,
+    ):
+        conn.execute(statement)
+
+
+# Срок выполнения заявки (deadlines.py) по столбцам строки с префиксом {r}
+# ("NEW." в триггере, "" при заполнении). Отсчёт — от даты заявки
+# (от времени регистрации, если она зарегистрирована в тот же день).
+# Норматив по приоритету, ч: Критичный 24, Высокий 72, Средний 168,
+# Низкий 336; если оценка мастера estimated_time (ч) больше — по оценке.
+# Продление deadline_extension (дата или дата и время) может только
+# отодвинуть срок; дата без времени — до конца этого дня.
+_DUE_AT = """
+    MAX(
+        DATETIME(
+            CASE WHEN DATE({r}created_at) = {r}start_date
+                 THEN {r}created_at ELSE DATETIME({r}start_date)
+            END,
+            '+' || MAX(
+                CASE {r}priority
+                    WHEN 'Критичный' THEN 24 WHEN 'Высокий' THEN 72 WHEN 'Низкий' THEN 336
+                    ELSE 168
+                END,
+                COALESCE({r}estimated_time, 0)
+            ) || ' hours'
+        ),
+        COALESCE(
+            CASE WHEN LENGTH({r}deadline_extension) = 10
+                 THEN DATETIME({r}deadline_extension, '+1 day', '-1 second')
+                 ELSE DATETIME({r}deadline_extension)
+            END,
+            ''
+        )
+    )
+"""
+
+
+def _request_deadlines(conn):
+    # Рассчитанный срок и отметка об эскалации просрочки (deadlines.py)
+    _add_column(conn, "requests", "due_at", "TEXT")
+    _add_column(conn, "requests", "escalated_at", "TEXT")
+    _update_requests_quietly(conn, f"UPDATE requests SET due_at = {_DUE_AT.format(r='')}")
+
+    for statement in (
+        # Списки «просрочено» и «срок сегодня»: диапазон по сроку внутри статуса
+        "CREATE INDEX IF NOT EXISTS idx_requests_status_due ON requests(request_status, due_at)",
+        # Эскалация читает только ещё не эскалированные заявки
+        """
+        CREATE INDEX IF NOT EXISTS idx_requests_escalation
+        ON requests(request_status, due_at) WHERE escalated_at IS NULL
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS requests_due_at_insert
+        AFTER INSERT ON requests
+        BEGIN
+            UPDATE requests SET due_at = {_DUE_AT.format(r='NEW.')}
+            WHERE request_id = NEW.request_id;
+        END
+        """,
+        # Новый срок — новая эскалация, если и он будет пропущен
+        f"""
+        CREATE TRIGGER IF NOT EXISTS requests_due_at_update
+        AFTER UPDATE OF start_date, priority, estimated_time, deadline_extension ON requests
+        WHEN NEW.start_date IS NOT OLD.start_date
+          OR NEW.priority IS NOT OLD.priority
+          OR NEW.estimated_time IS NOT OLD.estimated_time
+          OR NEW.deadline_extension IS NOT OLD.deadline_extension
+        BEGIN
+            UPDATE requests SET due_at = {_DUE_AT.format(r='NEW.')}, escalated_at = NULL
+            WHERE request_id = NEW.request_id;
+        END
+        """,
+    ):
+        conn.execute(statement)
+
+
+# Номер заявки по её id: триггер generate_request_number, import_data.py
+# и insert_request_sql считают его одним и тем же выражением
+REQUEST_NUMBER = "'REQ-' || strftime('%Y%m', 'now') || '-' || printf('%04d', {id})"
+
+# Токен QR-кода заявки (qr_codes.py): выдаётся при создании, ссылка на форму отзыва с ним
+QR_TOKEN = "lower(hex(randomblob(16)))"
+
+# Значения по умолчанию (как в database_schema.sql) для столбцов, от которых
+# зависит срок, если INSERT их не задаёт
+_DUE_AT_DEFAULTS = {"priority": "'Средний'", "estimated_time": "NULL", "deadline_extension": "NULL"}
+
+
+def insert_request_sql(columns):
+    """
+    INSERT новой заявки одним оператором. Номер, created_at и срок due_at
+    вычисляются прямо в VALUES (id — следующий после sqlite_sequence, как
+    у AUTOINCREMENT), поэтому триггеры generate_request_number,
+    requests_due_at_insert и requests_qr_token_insert строку второй раз
+    не пишут. Значения передаются именованными параметрами по именам
+    columns; RETURNING отдаёт request_id, request_number и due_at.
+    """
+    # Срок — из параметров; created_at и незаданные столбцы — их значения по умолчанию
+    due_at = _DUE_AT.format(r=":").replace(":created_at", "DATETIME('now')")
+    for column, default in _DUE_AT_DEFAULTS.items():
+        if column not in columns:
+            due_at = due_at.replace(f":{column}", default)
+    request_id = "(SELECT COALESCE(MAX(seq), 0) + 1 FROM sqlite_sequence WHERE name = 'requests')"
+    return f"""
+        INSERT INTO requests (request_id, request_number, created_at, due_at,
+                              qr_code_token, qr_code_generated, {", ".join(columns)})
+        VALUES ({request_id}, {REQUEST_NUMBER.format(id=request_id)}, DATETIME('now'), {due_at},
+                {QR_TOKEN}, 1, {", ".join(":" + column for column in columns)})
+        RETURNING request_id, request_number, due_at
+    """
+
+
+def _requests_single_writes(conn):
+    # Триггеры дописывают строку заявки, только если запись сама не задала
+    # значение: INSERT/UPDATE из приложения выставляют request_number,
+    # due_at и updated_at в том же операторе, остальные писатели получают
+    # прежнее поведение.
+    for statement in (
+        "DROP TRIGGER IF EXISTS generate_request_number",
+        f"""
+        CREATE TRIGGER generate_request_number
+        AFTER INSERT ON requests
+        WHEN NEW.request_number IS NULL
+        BEGIN
+            UPDATE requests SET request_number = {REQUEST_NUMBER.format(id="NEW.request_id")}
+            WHERE request_id = NEW.request_id;
+        END
+        """,
+        "DROP TRIGGER IF EXISTS requests_due_at_insert",
+        f"""
+        CREATE TRIGGER requests_due_at_insert
+        AFTER INSERT ON requests
+        WHEN NEW.due_at IS NOT {_DUE_AT.format(r="NEW.")}
+        BEGIN
+            UPDATE requests SET due_at = {_DUE_AT.format(r="NEW.")}
+            WHERE request_id = NEW.request_id;
+        END
+        """,
+        # Если updated_at уже равен текущей секунде, второй UPDATE ничего не изменит
+        "DROP TRIGGER IF EXISTS update_requests_timestamp",
+        """
+        CREATE TRIGGER update_requests_timestamp
+        AFTER UPDATE ON requests
+        WHEN NEW.updated_at IS OLD.updated_at AND NEW.updated_at IS NOT DATETIME('now')
+        BEGIN
+            UPDATE requests SET updated_at = DATETIME('now')
+            WHERE request_id = NEW.request_id;
+        END
+        """,
+    ):
+        conn.execute(statement)
+
+
+def _requests_qr_tokens(conn):
+    # Токен QR-кода выдаётся при создании заявки, чтобы GET /qr/<id> только
+    # читал: INSERT приложения задаёт его сам (insert_request_sql), для
+    # остальных писателей — триггер; старые заявки получают токен здесь же
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS requests_qr_token_insert
+        AFTER INSERT ON requests
+        WHEN NEW.qr_code_token IS NULL
+        BEGIN
+            UPDATE requests SET qr_code_token = {QR_TOKEN}, qr_code_generated = 1
+            WHERE request_id = NEW.request_id;
+        END
+        """
+    )
+    _update_requests_quietly(
+        conn,
+        f"UPDATE requests SET qr_code_token = {QR_TOKEN}, qr_code_generated = 1 WHERE qr_code_token IS NULL",
+    )
+
+
+# (имя, SQL-скрипт или функция conn -> None). Порядок менять нельзя,
+# новые миграции — только в конец.
+MIGRATIONS = [
+    (
+        "requests_keyset_indexes",
+        """
+        -- Индексы под сортировку списка заявок (start_date DESC, request_id DESC):
+        -- каждый фильтр списка получает составной индекс с датой в хвосте,
+        -- чтобы страница читалась диапазоном без сортировки во временном B-дереве.
+        DROP INDEX IF EXISTS idx_requests_date;
+        CREATE INDEX idx_requests_date ON requests(start_date, request_id);
+        DROP INDEX IF EXISTS idx_requests_status;
+        CREATE INDEX idx_requests_status ON requests(request_status, start_date, request_id);
+        DROP INDEX IF EXISTS idx_requests_client;
+        CREATE INDEX idx_requests_client ON requests(client_id, start_date, request_id);
+        DROP INDEX IF EXISTS idx_requests_master;
+        CREATE INDEX idx_requests_master ON requests(master_id, start_date, request_id);
+        DROP INDEX IF EXISTS idx_requests_tech_type;
+        CREATE INDEX idx_requests_tech_type ON requests(climate_tech_type, start_date, request_id);
+        """,
+    ),
+    (
+        "full_text_search",
+        """
+        -- Полнотекстовый поиск (FTS5) по заявкам и комментариям.
+        -- Таблицы внешнего содержимого: текст хранится только в requests/comments,
+        -- FTS-индекс синхронизируется триггерами.
+        CREATE VIRTUAL TABLE IF NOT EXISTS requests_fts USING fts5(
+            problem_description, climate_tech_model, climate_tech_type,
+            content='requests', content_rowid='request_id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        );
+        CREATE VIRTUAL TABLE IF NOT EXISTS comments_fts USING fts5(
+            message,
+            content='comments', content_rowid='comment_id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        );
+        -- Вес столбцов в bm25: описание проблемы и модель важнее типа
+        INSERT INTO requests_fts(requests_fts, rank) VALUES ('rank', 'bm25(3.0, 2.0, 1.0)');
+        INSERT INTO requests_fts(requests_fts) VALUES ('rebuild');
+        INSERT INTO comments_fts(comments_fts) VALUES ('rebuild');
+
+        CREATE TRIGGER IF NOT EXISTS requests_fts_insert
+        AFTER INSERT ON requests
+        BEGIN
+            INSERT INTO requests_fts (rowid, problem_description, climate_tech_model, climate_tech_type)
+            VALUES (NEW.request_id, NEW.problem_description, NEW.climate_tech_model, NEW.climate_tech_type);
+        END;
+        CREATE TRIGGER IF NOT EXISTS requests_fts_delete
+        AFTER DELETE ON requests
+        BEGIN
+            INSERT INTO requests_fts (requests_fts, rowid, problem_description, climate_tech_model, climate_tech_type)
+            VALUES ('delete', OLD.request_id, OLD.problem_description, OLD.climate_tech_model, OLD.climate_tech_type);
+        END;
+        CREATE TRIGGER IF NOT EXISTS requests_fts_update
+        AFTER UPDATE OF problem_description, climate_tech_model, climate_tech_type ON requests
+        BEGIN
+            INSERT INTO requests_fts (requests_fts, rowid, problem_description, climate_tech_model, climate_tech_type)
+            VALUES ('delete', OLD.request_id, OLD.problem_description, OLD.climate_tech_model, OLD.climate_tech_type);
+            INSERT INTO requests_fts (rowid, problem_description, climate_tech_model, climate_tech_type)
+            VALUES (NEW.request_id, NEW.problem_description, NEW.climate_tech_model, NEW.climate_tech_type);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS comments_fts_insert
+        AFTER INSERT ON comments
+        BEGIN
+            INSERT INTO comments_fts (rowid, message) VALUES (NEW.comment_id, NEW.message);
+        END;
+        CREATE TRIGGER IF NOT EXISTS comments_fts_delete
+        AFTER DELETE ON comments
+        BEGIN
+            INSERT INTO comments_fts (comments_fts, rowid, message) VALUES ('delete', OLD.comment_id, OLD.message);
+        END;
+        CREATE TRIGGER IF NOT EXISTS comments_fts_update
+        AFTER UPDATE OF message ON comments
+        BEGIN
+            INSERT INTO comments_fts (comments_fts, rowid, message) VALUES ('delete', OLD.comment_id, OLD.message);
+            INSERT INTO comments_fts (rowid, message) VALUES (NEW.comment_id, NEW.message);
+        END;
+        """,
+    ),
+    (
+        "stats_summary",
+        """
+        -- Счётчики для /stats: число заявок и сумма длительностей ремонта
+        -- по паре (статус, тип оборудования). Поддерживаются триггерами,
+        -- сверяются с полным пересчётом командой stats_summary.py check/rebuild.
+        CREATE TABLE IF NOT EXISTS stats_summary (
+            request_status TEXT NOT NULL,
+            climate_tech_type TEXT NOT NULL,
+            request_count INTEGER NOT NULL DEFAULT 0,
+            duration_count INTEGER NOT NULL DEFAULT 0,
+            duration_sum REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (request_status, climate_tech_type)
+        ) WITHOUT ROWID;
+
+        DELETE FROM stats_summary;
+        INSERT INTO stats_summary (request_status, climate_tech_type, request_count, duration_count, duration_sum)
+        SELECT request_status, climate_tech_type, COUNT(*),
+               COUNT(JULIANDAY(completion_date) - JULIANDAY(start_date)),
+               COALESCE(SUM(JULIANDAY(completion_date) - JULIANDAY(start_date)), 0)
+        FROM requests
+        GROUP BY request_status, climate_tech_type;
+
+        CREATE TRIGGER IF NOT EXISTS stats_summary_insert
+        AFTER INSERT ON requests
+        BEGIN
+            INSERT INTO stats_summary (request_status, climate_tech_type, request_count, duration_count, duration_sum)
+            VALUES (
+                NEW.request_status, NEW.climate_tech_type, 1,
+                JULIANDAY(NEW.completion_date) - JULIANDAY(NEW.start_date) IS NOT NULL,
+                COALESCE(JULIANDAY(NEW.completion_date) - JULIANDAY(NEW.start_date), 0)
+            )
+            ON CONFLICT (request_status, climate_tech_type) DO UPDATE SET
+                request_count = request_count + excluded.request_count,
+                duration_count = duration_count + excluded.duration_count,
+                duration_sum = duration_sum + excluded.duration_sum;
+        END;
+        CREATE TRIGGER IF NOT EXISTS stats_summary_delete
+        AFTER DELETE ON requests
+        BEGIN
+            UPDATE stats_summary SET
+                request_count = request_count - 1,
+                duration_count = duration_count
+                    - (JULIANDAY(OLD.completion_date) - JULIANDAY(OLD.start_date) IS NOT NULL),
+                duration_sum = duration_sum
+                    - COALESCE(JULIANDAY(OLD.completion_date) - JULIANDAY(OLD.start_date), 0)
+            WHERE request_status = OLD.request_status AND climate_tech_type = OLD.climate_tech_type;
+        END;
+        CREATE TRIGGER IF NOT EXISTS stats_summary_update
+        AFTER UPDATE OF request_status, climate_tech_type, start_date, completion_date ON requests
+        BEGIN
+            UPDATE stats_summary SET
+                request_count = request_count - 1,
+                duration_count = duration_count
+                    - (JULIANDAY(OLD.completion_date) - JULIANDAY(OLD.start_date) IS NOT NULL),
+                duration_sum = duration_sum
+                    - COALESCE(JULIANDAY(OLD.completion_date) - JULIANDAY(OLD.start_date), 0)
+            WHERE request_status = OLD.request_status AND climate_tech_type = OLD.climate_tech_type;
+            INSERT INTO stats_summary (request_status, climate_tech_type, request_count, duration_count, duration_sum)
+            VALUES (
+                NEW.request_status, NEW.climate_tech_type, 1,
+                JULIANDAY(NEW.completion_date) - JULIANDAY(NEW.start_date) IS NOT NULL,
+                COALESCE(JULIANDAY(NEW.completion_date) - JULIANDAY(NEW.start_date), 0)
+            )
+            ON CONFLICT (request_status, climate_tech_type) DO UPDATE SET
+                request_count = request_count + excluded.request_count,
+                duration_count = duration_count + excluded.duration_count,
+                duration_sum = duration_sum + excluded.duration_sum;
+        END;
+        """,
+    ),
+    (
+        "users_lookup_indexes",
+        """
+        -- Автодополнение заказчиков (client_lookup.py): поиск по префиксу
+        -- ФИО и телефона среди активных пользователей одной роли.
+        CREATE INDEX IF NOT EXISTS idx_users_type_active_fio ON users(user_type, is_active, fio);
+        CREATE INDEX IF NOT EXISTS idx_users_type_active_phone ON users(user_type, is_active, phone);
+        """,
+    ),
+    ("notifications_delivery", _notifications_delivery),
+    (
+        "requests_updated_at_index",
+        """
+        -- Живая лента списка заявок (live_feed.py) читает заявки,
+        -- изменённые после последней отметки времени.
+        CREATE INDEX IF NOT EXISTS idx_requests_updated_at ON requests(updated_at);
+        """,
+    ),
+    (
+        "inventory_low_stock_trigger",
+        """
+        -- Уведомление о низком запасе — только когда остаток уменьшился
+        -- (резерв, списание). Пополнение склада (inventory.restock) меняет
+        -- тысячи строк и не должно порождать уведомление на каждую.
+        DROP TRIGGER IF EXISTS check_min_quantity;
+        CREATE TRIGGER check_min_quantity
+        AFTER UPDATE OF quantity_in_stock ON spare_parts
+        WHEN NEW.quantity_in_stock < OLD.quantity_in_stock
+         AND NEW.quantity_in_stock <= NEW.min_quantity
+        BEGIN
+            INSERT INTO notifications (user_id, title, message, notification_type)
+            VALUES (
+                1,
+                'Низкий запас комплектующих',
+                'Комплектующее ' || NEW.part_name || ' (' || NEW.part_code || ') почти закончилось. Осталось: ' || NEW.quantity_in_stock || ' шт.',
+                'warning'
+            );
+        END;
+        """,
+    ),
+    ("timeline_indexes", _timeline_indexes),
+    ("comment_counters", _comment_counters),
+    ("request_deadlines", _request_deadlines),
+    (
+        "analytics_rollups",
+        """
+        -- Сводки для аналитики /stats (analytics.py): по дню и приоритету —
+        -- число созданных и завершённых заявок и сумма длительностей ремонта
+        -- в днях, по месяцу и мастеру (0 — без мастера) — то же самое;
+        -- к обеим — гистограммы длительностей по корзинам для медианы и p90.
+        -- Заполняются дозагрузкой новых строк requests и request_history
+        -- после отметок в analytics_state.
+        CREATE TABLE IF NOT EXISTS analytics_daily (
+            day TEXT NOT NULL,
+            priority TEXT NOT NULL,
+            created_count INTEGER NOT NULL DEFAULT 0,
+            finished_count INTEGER NOT NULL DEFAULT 0,
+            duration_sum REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, priority)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS analytics_daily_buckets (
+            day TEXT NOT NULL,
+            priority TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            finished_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, priority, bucket)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS analytics_masters (
+            month TEXT NOT NULL,
+            master_key INTEGER NOT NULL,
+            created_count INTEGER NOT NULL DEFAULT 0,
+            finished_count INTEGER NOT NULL DEFAULT 0,
+            duration_sum REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (month, master_key)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS analytics_master_buckets (
+            month TEXT NOT NULL,
+            master_key INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            finished_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (month, master_key, bucket)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS analytics_state (
+            name TEXT PRIMARY KEY,
+            last_id INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID;
+        """,
+    ),
+    ("requests_single_writes", _requests_single_writes),
+    (
+        "users_type_fio_index",
+        """
+        -- Список пользователей (/users/manage) упорядочен по роли и ФИО:
+        -- индекс отдаёт строки в этом порядке без сортировки.
+        DROP INDEX IF EXISTS idx_users_type;
+        CREATE INDEX idx_users_type ON users(user_type, fio);
+        """,
+    ),
+    (
+        "notifications_request_index",
+        """
+        -- Удаление заявки (перенос в архив, archive.py) проверяет внешний
+        -- ключ notifications.related_request_id и снимает ссылки на неё:
+        -- без индекса — проход всех уведомлений на каждую заявку.
+        CREATE INDEX IF NOT EXISTS idx_notifications_request ON notifications(related_request_id);
+        """,
+    ),
+    ("requests_qr_tokens", _requests_qr_tokens),
+    (
+        "notification_retries",
+        """
+        -- Повторная доставка уведомлений (notifications.py): пара
+        -- «уведомление — получатель», которому доставить не удалось,
+        -- с числом попыток и временем следующей.
+        CREATE TABLE IF NOT EXISTS notification_retries (
+            notification_id INTEGER NOT NULL
+                REFERENCES notifications(notification_id) ON DELETE CASCADE,
+            sink TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 1,
+            next_attempt_at TEXT NOT NULL,
+            PRIMARY KEY (notification_id, sink)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_notification_retries_due
+        ON notification_retries(next_attempt_at);
+        """,
+    ),
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def apply_migrations(conn):
+    """Применяет к БД все ещё не применённые миграции. Возвращает их число."""
+    version = get_version(conn)
+    applied = 0
+    for number, (name, script) in enumerate(MIGRATIONS, start=1):
+        if number <= version:
+            continue
+        if conn.in_transaction:
+            conn.commit()
+        try:
+            if callable(script):
+                conn.execute("BEGIN IMMEDIATE")
+                script(conn)
+                conn.execute(f"PRAGMA user_version = {number}")
+                conn.commit()
+            else:
+                conn.executescript(
+                    f"BEGIN IMMEDIATE;\n{script}\nPRAGMA user_version = {number};\nCOMMIT;"
+                )
+        except sqlite3.Error as exc:
+            if conn.in_transaction:
+                conn.rollback()
+            exc.add_note(f"Миграция {number} ({name})")
+            raise
+        applied += 1
+    return applied
+
+
+def create_database(path, migrate=True):
+    """
+    Создаёт новую БД по database_schema.sql и применяет все миграции.
+    migrate=False оставляет исходную схему — например, чтобы сначала
+    загрузить данные, а производные таблицы миграции построили уже по ним.
+    """
+    conn = sqlite3.connect(path)
+    with open(SCHEMA_PATH, encoding="utf-8") as f:
+        # sqlite_sequence SQLite создаёт сам, явное создание запрещено
+        conn.executescript(f.read().replace("CREATE TABLE sqlite_sequence(name,seq);", ""))
+    if migrate:
+        apply_migrations(conn)
+    return conn
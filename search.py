@@ -0,0 +1,143 @@
+"""
+Полнотекстовый поиск по заявкам и комментариям (SQLite FTS5).
+
+Индексы requests_fts и comments_fts создаются миграцией в schema.py
+и поддерживаются триггерами. Каждая ветка поиска берёт из FTS
+ограниченное число лучших совпадений (ORDER BY rank LIMIT), поэтому
+время запроса не растёт вместе с таблицей заявок. Ранжируются
+только CANDIDATE_WINDOW самых свежих совпадений, доступных пользователю.
+"""
+import html
+import re
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+# Сколько самых свежих совпадений ранжируется по bm25. Частые слова
+# («не работает») встречаются в огромном числе заявок, и полный подсчёт
+# релевантности по всем ним растёт вместе с таблицей. Окно по rowid
+# FTS5 выбирает без подсчёта rank, поэтому стоимость поиска ограничена.
+CANDIDATE_WINDOW = 500
+
+# Маркеры подсветки в snippet(): заменяются на <mark> после экранирования
+_MARK_START = "\x02"
+_MARK_END = "\x03"
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+SEARCH_SQL = """
+    WITH hits AS (
+        SELECT * FROM (
+            SELECT rowid AS request_id,
+                   rank,
+                   snippet(requests_fts, -1, char(2), char(3), '…', 12) AS snippet,
+                   'request' AS source
+            FROM requests_fts
+            WHERE requests_fts MATCH :query {request_scope}
+              AND rowid >= (
+                  SELECT COALESCE(MIN(rowid), 0) FROM (
+                      SELECT rowid FROM requests_fts
+                      WHERE requests_fts MATCH :query {request_scope}
+                      ORDER BY rowid DESC
+                      LIMIT :window
+                  )
+              )
+            ORDER BY rank
+            LIMIT :limit
+        )
+        UNION ALL
+        SELECT * FROM (
+            SELECT c.request_id,
+                   comments_fts.rank,
+                   snippet(comments_fts, 0, char(2), char(3), '…', 12) AS snippet,
+                   'comment' AS source
+            FROM comments_fts
+            JOIN comments c ON c.comment_id = comments_fts.rowid
+            WHERE comments_fts MATCH :query {comment_scope}
+              AND comments_fts.rowid >= (
+                  SELECT COALESCE(MIN(comment_id), 0) FROM (
+                      SELECT c.comment_id FROM comments_fts
+                      JOIN comments c ON c.comment_id = comments_fts.rowid
+                      WHERE comments_fts MATCH :query {comment_scope}
+                      ORDER BY comments_fts.rowid DESC
+                      LIMIT :window
+                  )
+              )
+            ORDER BY comments_fts.rank
+            LIMIT :limit
+        )
+    )
+    SELECT h.request_id,
+           MIN(h.rank) AS rank,
+           h.snippet,
+           h.source,
+           r.request_number,
+           r.request_status,
+           r.climate_tech_type,
+           r.climate_tech_model
+    FROM hits h
+    JOIN requests r ON r.request_id = h.request_id
+    GROUP BY h.request_id
+    ORDER BY rank
+    LIMIT :limit
+"""
+
+
+def build_match_query(text):
+    """
+    Превращает пользовательский ввод в выражение MATCH:
+    каждое слово ищется по префиксу, все слова обязательны.
+    Возвращает None, если слов нет.
+    """
+    words = _WORD_RE.findall(text or "")
+    if not words:
+        return None
+    return " ".join(f'"{w}"*' for w in words)
+
+
+def _highlight(snippet):
+    escaped = html.escape(snippet or "")
+    return escaped.replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+
+
+def search_requests(conn, text, user, limit=DEFAULT_LIMIT):
+    """
+    Поиск заявок по тексту проблемы, модели, типу оборудования и комментариям.
+    Заказчик находит только свои заявки и не видит внутренние комментарии.
+    Возвращает список словарей, отсортированный по релевантности.
+    """
+    query = build_match_query(text)
+    if query is None:
+        return []
+
+    params = {
+        "query": query,
+        "limit": max(1, min(int(limit), MAX_LIMIT)),
+        "window": CANDIDATE_WINDOW,
+    }
+    request_scope = comment_scope = ""
+    if user.get("user_type") == "Заказчик":
+        request_scope = (
+            "AND rowid IN (SELECT request_id FROM requests WHERE client_id = :client_id)"
+        )
+        comment_scope = (
+            "AND c.is_internal = 0 AND c.request_id IN "
+            "(SELECT request_id FROM requests WHERE client_id = :client_id)"
+        )
+        params["client_id"] = user.get("user_id")
+
+    sql = SEARCH_SQL.format(request_scope=request_scope, comment_scope=comment_scope)
+    rows = conn.execute(sql, params).fetchall()
+    return [
+        {
+            "request_id": r["request_id"],
+            "request_number": r["request_number"],
+            "request_status": r["request_status"],
+            "climate_tech_type": r["climate_tech_type"],
+            "climate_tech_model": r["climate_tech_model"],
+            "source": r["source"],
+            "snippet": _highlight(r["snippet"]),
+            "rank": r["rank"],
+        }
+        for r in rows
+    ]
@@ -0,0 +1,49 @@
+// Автодополнение заказчика в формах заявок.
+// Поле ввода с атрибутом data-client-lookup ищет заказчиков через /api/clients
+// и записывает выбранный user_id в скрытое поле, указанное в data-target.
+document.querySelectorAll('[data-client-lookup]').forEach(function (input) {
+  const hidden = document.getElementById(input.dataset.target);
+  const list = document.getElementById(input.getAttribute('list'));
+  const url = input.dataset.url;
+  let options = {};
+  let timer = null;
+
+  function sync() {
+    if (options[input.value] !== undefined) {
+      hidden.value = options[input.value];
+    } else if (input.value !== input.dataset.initialLabel) {
+      hidden.value = '';
+    }
+    input.setCustomValidity(hidden.value ? '' : 'Выберите заказчика из списка');
+  }
+
+  input.addEventListener('input', function () {
+    sync();
+    clearTimeout(timer);
+    const query = input.value.trim();
+    if (!query || hidden.value) {
+      return;
+    }
+    timer = setTimeout(function () {
+      fetch(url + '?q=' + encodeURIComponent(query), {headers: {'Accept': 'application/json'}})
+        .then(function (resp) { return resp.ok ? resp.json() : {results: []}; })
+        .then(function (data) {
+          options = {};
+          list.innerHTML = '';
+          data.results.forEach(function (client) {
+            let label = client.phone ? client.fio + ' (' + client.phone + ')' : client.fio;
+            if (options[label] !== undefined) {
+              label += ' #' + client.user_id;
+            }
+            options[label] = client.user_id;
+            const option = document.createElement('option');
+            option.value = label;
+            list.appendChild(option);
+          });
+          sync();
+        });
+    }, 200);
+  });
+
+  sync();
+});
@@ -0,0 +1,59 @@
+// Живое обновление списка заявок через /requests/stream (Server-Sent Events).
+// Изменённые заявки заменяются на месте, новые добавляются в начало первой
+// страницы, заявки, переставшие подходить под фильтр, убираются.
+// Если сервер отказал в подключении (503 при превышении числа подписчиков),
+// браузер сам не переподключается — пробуем снова через RETRY_DELAY.
+(function () {
+  const table = document.querySelector('[data-live-url]');
+  if (!table || !window.EventSource) {
+    return;
+  }
+  const tbody = table.querySelector('tbody');
+  const firstPage = table.dataset.firstPage === '1';
+  const notice = document.getElementById('live-reload');
+  const RETRY_DELAY = 30000;
+  let source = null;
+
+  function highlight(row) {
+    row.classList.add('table-info');
+    setTimeout(function () { row.classList.remove('table-info'); }, 3000);
+  }
+
+  function onMessage(message) {
+    const data = JSON.parse(message.data);
+    if (data.action === 'reload') {
+      notice.classList.remove('d-none');
+      source.close();
+      return;
+    }
+    const row = tbody.querySelector('tr[data-request-id="' + data.request_id + '"]');
+    if (data.action === 'remove') {
+      if (row) {
+        row.remove();
+      }
+      return;
+    }
+    const template = document.createElement('template');
+    template.innerHTML = data.html.trim();
+    const fresh = template.content.firstElementChild;
+    if (row) {
+      row.replaceWith(fresh);
+      highlight(fresh);
+    } else if (data.kind === 'created' && firstPage) {
+      tbody.prepend(fresh);
+      highlight(fresh);
+    }
+  }
+
+  function connect() {
+    source = new EventSource(table.dataset.liveUrl);
+    source.onmessage = onMessage;
+    source.onerror = function () {
+      if (source.readyState === EventSource.CLOSED) {
+        setTimeout(connect, RETRY_DELAY * (1 + Math.random()));
+      }
+    };
+  }
+
+  connect();
+})();
@@ -0,0 +1,103 @@
+// Графики страницы /stats по данным /api/stats: столбцы созданных
+// и завершённых заявок по периодам, длительность ремонта и разбивки.
+(function () {
+  const root = document.getElementById('analytics');
+  const form = document.getElementById('analytics-filters');
+  if (!root || !form) {
+    return;
+  }
+  const SVG = 'http://www.w3.org/2000/svg';
+  const COLORS = { created: '#6c757d', finished: '#198754' };
+
+  function days(value) {
+    return value === null || value === undefined ? '—' : value.toFixed(1);
+  }
+
+  function svg(tag, attrs) {
+    const node = document.createElementNS(SVG, tag);
+    Object.keys(attrs).forEach(function (name) { node.setAttribute(name, attrs[name]); });
+    return node;
+  }
+
+  function drawChart(series) {
+    const box = document.getElementById('analytics-chart');
+    box.innerHTML = '';
+    if (!series.length) {
+      box.textContent = 'Нет данных за выбранный период.';
+      return;
+    }
+    const height = 180;
+    const slot = Math.max(12, Math.min(48, Math.floor(900 / series.length)));
+    const width = slot * series.length;
+    const top = Math.max(1, Math.max.apply(null, series.map(function (p) {
+      return Math.max(p.created, p.finished);
+    })));
+    const chart = svg('svg', { width: width, height: height + 20, role: 'img' });
+    series.forEach(function (point, i) {
+      ['created', 'finished'].forEach(function (kind, j) {
+        const h = Math.round(point[kind] / top * height);
+        const bar = svg('rect', {
+          x: i * slot + j * (slot / 2 - 1), y: height - h,
+          width: Math.max(2, slot / 2 - 2), height: h, fill: COLORS[kind],
+        });
+        const title = svg('title', {});
+        title.textContent = point.period + ': ' + (kind === 'created' ? 'создано ' : 'завершено ') + point[kind];
+        bar.appendChild(title);
+        chart.appendChild(bar);
+      });
+    });
+    const labelEvery = Math.ceil(series.length / 12);
+    series.forEach(function (point, i) {
+      if (i % labelEvery === 0) {
+        const label = svg('text', { x: i * slot, y: height + 14, 'font-size': 10 });
+        label.textContent = point.period;
+        chart.appendChild(label);
+      }
+    });
+    box.appendChild(chart);
+  }
+
+  function fillTable(id, rows, label) {
+    const tbody = document.querySelector('#' + id + ' tbody');
+    tbody.innerHTML = '';
+    rows.forEach(function (row) {
+      const tr = document.createElement('tr');
+      [label(row), row.created, row.finished, days(row.p50_days), days(row.p90_days)].forEach(function (value) {
+        const td = document.createElement('td');
+        td.textContent = value;
+        tr.appendChild(td);
+      });
+      tbody.appendChild(tr);
+    });
+  }
+
+  function load() {
+    const params = new URLSearchParams();
+    new FormData(form).forEach(function (value, name) {
+      if (value) {
+        params.append(name, value);
+      }
+    });
+    fetch(root.dataset.url + '?' + params.toString(), { credentials: 'same-origin' })
+      .then(function (response) { return response.json(); })
+      .then(function (data) {
+        if (data.error) {
+          document.getElementById('analytics-duration').textContent = data.error;
+          return;
+        }
+        drawChart(data.series);
+        const d = data.duration;
+        document.getElementById('analytics-duration').textContent =
+          'Завершено: ' + d.finished + '; длительность ремонта, дн.: средняя ' + days(d.avg_days) +
+          ', медиана ' + days(d.p50_days) + ', p90 ' + days(d.p90_days);
+        fillTable('analytics-masters', data.by_master, function (row) { return row.name; });
+        fillTable('analytics-priorities', data.by_priority, function (row) { return row.key; });
+      });
+  }
+
+  form.addEventListener('submit', function (event) {
+    event.preventDefault();
+    load();
+  });
+  load();
+})();
@@ -0,0 +1,152 @@
+"""
+Сводные счётчики для страницы /stats.
+
+Таблица stats_summary (см. schema.py) хранит по каждой паре
+(статус, тип оборудования) число заявок, число заявок с известной
+длительностью ремонта и сумму длительностей в днях. Триггеры на requests
+поддерживают её при вставке, изменении и удалении, поэтому /stats читает
+несколько строк вместо полного прохода по таблице заявок. Заявки,
+перенесённые в архив (archive.py), из сводки не вычитаются, поэтому
+сверка считает и архив, если он подключён к соединению.
+
+Сверка и пересчёт:
+    python stats_summary.py check   [--db climate_repair.db] [--archive climate_repair_archive.db]
+    python stats_summary.py rebuild [--db climate_repair.db] [--archive climate_repair_archive.db]
+"""
+import argparse
+import os
+import sqlite3
+
+FINISHED_STATUS = "Завершена"
+
+RECOMPUTE_SQL = """
+    SELECT request_status, climate_tech_type,
+           COUNT(*) AS request_count,
+           COUNT(JULIANDAY(completion_date) - JULIANDAY(start_date)) AS duration_count,
+           COALESCE(SUM(JULIANDAY(completion_date) - JULIANDAY(start_date)), 0) AS duration_sum
+    FROM {source}
+    GROUP BY request_status, climate_tech_type
+"""
+
+# Заявки, перенесённые в архив (archive.py), остаются в сводке
+_WITH_ARCHIVE = """(
+    SELECT request_status, climate_tech_type, start_date, completion_date FROM main.requests
+    UNION ALL
+    SELECT request_status, climate_tech_type, start_date, completion_date FROM archive.requests
+)"""
+
+# Чтение для /stats
+FINISHED_SQL = """
+    SELECT COALESCE(SUM(request_count), 0) AS finished_count,
+           SUM(duration_count) AS duration_count,
+           SUM(duration_sum) AS duration_sum
+    FROM stats_summary
+    WHERE request_status = ?
+"""
+
+TYPES_SQL = """
+    SELECT climate_tech_type, SUM(request_count) AS cnt
+    FROM stats_summary
+    GROUP BY climate_tech_type
+    HAVING cnt > 0
+    ORDER BY cnt DESC
+"""
+
+# Суммы длительностей сравниваются с допуском на погрешность float
+_EPSILON = 1e-6
+
+
+def read_stats(conn):
+    """
+    Данные для /stats: (finished_count, avg_days, type_rows).
+    avg_days — средняя длительность завершённых заявок или None.
+    """
+    row = conn.execute(FINISHED_SQL, (FINISHED_STATUS,)).fetchone()
+    avg_days = None
+    if row["duration_count"]:
+        avg_days = row["duration_sum"] / row["duration_count"]
+
+    type_rows = conn.execute(TYPES_SQL).fetchall()
+    return row["finished_count"], avg_days, type_rows
+
+
+def recompute_sql(conn):
+    """RECOMPUTE_SQL по requests и, если к соединению подключён архив, по архиву."""
+    attached = any(row[1] == "archive" for row in conn.execute("PRAGMA database_list"))
+    return RECOMPUTE_SQL.format(source=_WITH_ARCHIVE if attached else "requests")
+
+
+def _as_dict(rows):
+    return {
+        (r[0], r[1]): (r[2], r[3], r[4])
+        for r in rows
+        if r[2] or r[3] or r[4]
+    }
+
+
+def find_differences(conn):
+    """
+    Сверяет stats_summary с полным пересчётом по requests (и архиву).
+    Возвращает список (статус, тип, в_таблице, пересчёт) для расхождений.
+    """
+    stored = _as_dict(conn.execute(
+        "SELECT request_status, climate_tech_type, request_count, duration_count, duration_sum "
+        "FROM stats_summary"
+    ))
+    actual = _as_dict(conn.execute(recompute_sql(conn)))
+
+    differences = []
+    for key in sorted(set(stored) | set(actual)):
+        have = stored.get(key, (0, 0, 0.0))
+        want = actual.get(key, (0, 0, 0.0))
+        if have[:2] != want[:2] or abs(have[2] - want[2]) > _EPSILON:
+            differences.append((key[0], key[1], have, want))
+    return differences
+
+
+def rebuild(conn):
+    """Перезаписывает stats_summary полным пересчётом. Возвращает найденные расхождения."""
+    with conn:
+        differences = find_differences(conn)
+        conn.execute("DELETE FROM stats_summary")
+        conn.execute(
+            "INSERT INTO stats_summary "
+            "(request_status, climate_tech_type, request_count, duration_count, duration_sum) "
+            + recompute_sql(conn)
+        )
+    return differences
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сверка и пересчёт сводной статистики заявок")
+    parser.add_argument("command", choices=("check", "rebuild"))
+    parser.add_argument("--db", default="climate_repair.db", help="путь к файлу БД")
+    parser.add_argument("--archive", help="архив заявок (archive.py); по умолчанию — рядом с БД, если есть")
+    args = parser.parse_args()
+
+    import archive
+    from schema import apply_migrations
+
+    conn = sqlite3.connect(args.db)
+    apply_migrations(conn)
+    archive_db = args.archive or archive.archive_path(args.db)
+    if os.path.exists(archive_db):
+        archive.attach(conn, archive_db)
+    if args.command == "check":
+        differences = find_differences(conn)
+    else:
+        differences = rebuild(conn)
+
+    for status, tech_type, have, want in differences:
+        print(f"{status} / {tech_type}: в таблице {have}, по данным {want}")
+    if not differences:
+        print("Расхождений нет.")
+    elif args.command == "rebuild":
+        print(f"Исправлено строк: {len(differences)}")
+    conn.close()
+    if args.command == "check" and differences:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+# Добавляем корень проекта в sys.path, чтобы можно было импортировать web_app
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+
+@pytest.fixture
+def db_copy(tmp_path):
+    """
+    Копия учебной БД climate_repair.db во временной папке.
+    Тесты, которые пишут в БД, работают только с копией.
+    """
+    from web_app import DB_NAME
+
+    path = tmp_path / "climate_repair.db"
+    shutil.copyfile(os.path.join(PROJECT_ROOT, DB_NAME), path)
+    return str(path)
+
+
+@pytest.fixture
+def app_client(db_copy):
+    """Тестовый клиент Flask, подключённый к копии БД."""
+    from web_app import app
+
+    app.config["TESTING"] = True
+    app.config["DATABASE"] = db_copy
+    with app.test_client() as client:
+        yield client
+
+
+def login_as(client, login, password):
+    """Вход под указанным пользователем из демо-данных."""
+    return client.post(
+        "/login",
+        data={"login": login, "password": password},
+        follow_redirects=True,
+    )
@@ -0,0 +1,114 @@
+import random
+import shutil
+import sqlite3
+
+import analytics
+from conftest import login_as
+from schema import apply_migrations
+
+
+def open_migrated(path):
+    conn = sqlite3.connect(path)
+    apply_migrations(conn)
+    return conn
+
+
+def rollups(conn):
+    return (
+        conn.execute("SELECT * FROM analytics_daily").fetchall(),
+        conn.execute("SELECT * FROM analytics_daily_buckets").fetchall(),
+        conn.execute("SELECT * FROM analytics_masters").fetchall(),
+        conn.execute("SELECT * FROM analytics_master_buckets").fetchall(),
+    )
+
+
+def test_incremental_rollups_and_percentiles(db_copy, tmp_path):
+    """
+    Проверка: сводки дозаполняются только новыми заявками и сменами статуса,
+    пачками дают тот же результат, что и одним проходом, а перцентили
+    по гистограмме близки к точным.
+    """
+    print("\n[TEST] Проверка дневных сводок аналитики")
+    other = str(tmp_path / "other.db")
+    shutil.copyfile(db_copy, other)
+    conn = open_migrated(db_copy)
+
+    assert analytics.refresh(conn) == 7 + 6  # 7 заявок, 6 строк истории
+    assert analytics.refresh(conn) == 0
+    assert analytics.series(conn, "month") == [{"period": "2025-12", "created": 7, "finished": 2}]
+    by_master = {row["key"]: row for row in analytics.breakdown(conn, "master")}
+    assert by_master[3]["finished"] == 1 and by_master[3]["avg_days"] == 7.0  # заявка 6
+    assert by_master[2]["finished"] == 1 and by_master[2]["avg_days"] == 1.0  # заявка 3
+
+    with conn:
+        # Завершение через смену статуса и заявка, загруженная сразу завершённой
+        conn.execute(
+            "UPDATE requests SET request_status = 'Завершена', completion_date = '2025-12-23' "
+            "WHERE request_id = 2"
+        )
+        conn.execute(
+            "INSERT INTO requests (start_date, climate_tech_type, climate_tech_model, problem_description, "
+            "request_status, completion_date, client_id, master_id, priority) "
+            "VALUES ('2025-11-03', 'Кондиционер', 'X', 'Старая', 'Завершена', '2025-11-30', 7, 10, 'Высокий')"
+        )
+    assert analytics.refresh(conn) == 2
+    assert analytics.series(conn, "month") == [
+        {"period": "2025-11", "created": 1, "finished": 1},
+        {"period": "2025-12", "created": 7, "finished": 3},
+    ]
+    week = analytics.series(conn, "week", {"date_from": "2025-12-15"})
+    assert [p["period"] for p in week] == ["2025-12-15", "2025-12-22"]
+    assert analytics.durations(conn, {"priority": "Высокий"})["avg_days"] == 27.0
+
+    other_conn = open_migrated(other)
+    with other_conn:
+        other_conn.execute(
+            "UPDATE requests SET request_status = 'Завершена', completion_date = '2025-12-23' "
+            "WHERE request_id = 2"
+        )
+        other_conn.execute(
+            "INSERT INTO requests (start_date, climate_tech_type, climate_tech_model, problem_description, "
+            "request_status, completion_date, client_id, master_id, priority) "
+            "VALUES ('2025-11-03', 'Кондиционер', 'X', 'Старая', 'Завершена', '2025-11-30', 7, 10, 'Высокий')"
+        )
+    analytics.refresh(other_conn, chunk_size=2)
+    assert rollups(other_conn) == rollups(conn)
+
+    rnd = random.Random(7)
+    values = [rnd.expovariate(1 / 6) for _ in range(5000)]
+    counts = {}
+    for value in values:
+        bucket = sum(value >= edge for edge in analytics.DURATION_BUCKETS)
+        counts[bucket] = counts.get(bucket, 0) + 1
+    values.sort()
+    for q in (0.5, 0.9):
+        exact = values[int(q * len(values))]
+        assert abs(analytics.percentile(counts, q) - exact) < 0.15 * exact + 0.5
+
+
+def test_stats_api(app_client, db_copy):
+    """
+    Проверка: /api/stats отдаёт ряд по месяцам, длительности и разбивки
+    и проверяет параметры; страница /stats подключает графики.
+    """
+    print("\n[TEST] Проверка /api/stats")
+    from web_app import get_analytics_refresher
+
+    login_as(app_client, "login1", "pass1")
+    # Маршрут только читает: пока поток не дозаполнил сводки, они пусты
+    assert app_client.get("/api/stats?period=month").get_json()["series"] == []
+    assert get_analytics_refresher().run_once() > 0
+    data = app_client.get("/api/stats?period=month").get_json()
+    assert data["series"] == [{"period": "2025-12", "created": 7, "finished": 2}]
+    assert data["duration"]["finished"] == 2 and data["duration"]["avg_days"] == 4.0
+    assert {row["key"] for row in data["by_priority"]} == {"Средний"}
+    assert app_client.get("/api/stats?period=year").status_code == 400
+    assert app_client.get("/api/stats?date_from=19.12.2025").status_code == 400
+    data = app_client.get("/api/stats?date_from=2025-12-20").get_json()
+    assert data["series"] == [
+        {"period": "2025-12-20", "created": 0, "finished": 1},
+        {"period": "2025-12-26", "created": 0, "finished": 1},
+    ]
+    # Разбивка по мастерам помесячная: фильтр дат округляется до декабря
+    assert sum(row["finished"] for row in data["by_master"]) == 2
+    assert "stats_charts.js" in app_client.get("/stats").data.decode("utf-8")
@@ -0,0 +1,80 @@
+import sqlite3
+from datetime import datetime
+
+import archive
+from conftest import login_as
+from schema import apply_migrations
+from stats_summary import find_differences, read_stats
+
+# «Сейчас» для переноса: все закрытые демо-заявки старше года
+LATER = datetime(2030, 1, 1)
+
+
+def open_migrated(path):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    apply_migrations(conn)
+    return conn
+
+
+def test_archive_moves_closed_requests(db_copy):
+    """
+    Проверка: закрытые заявки старше заданного возраста переносятся в архив
+    вместе с комментариями, историей и отзывами; сводка /stats и сверка
+    stats_summary их учитывают, повторный запуск ничего не переносит.
+    """
+    print("\n[TEST] Проверка переноса закрытых заявок в архив")
+    conn = open_migrated(db_copy)
+    with conn:
+        conn.execute("INSERT INTO comments (request_id, user_id, message) VALUES (3, 2, 'Готово')")
+        conn.execute("INSERT INTO reviews (request_id, rating) VALUES (3, 5)")
+        conn.execute(
+            "INSERT INTO notifications (user_id, title, message, related_request_id) "
+            "VALUES (9, 'Заявка', 'Заявка 3 завершена', 3)"
+        )
+    stats_before = read_stats(conn)
+    conn.close()
+
+    assert archive.archive_closed(db_copy, days=365, now=datetime(2026, 1, 1)) == 0  # ещё не прошёл год
+    assert archive.archive_closed(db_copy, days=365, now=LATER, chunk_size=2) == 3
+    assert archive.archive_closed(db_copy, days=365, now=LATER) == 0
+
+    conn = open_migrated(db_copy)
+    archive.attach(conn, archive.archive_path(db_copy))
+    hot = [row[0] for row in conn.execute("SELECT request_id FROM main.requests ORDER BY 1")]
+    cold = [row[0] for row in conn.execute("SELECT request_id FROM archive.requests ORDER BY 1")]
+    assert (hot, cold) == ([1, 2, 4, 5], [3, 6, 7])
+    assert conn.execute("SELECT COUNT(*) FROM archive.request_history").fetchone()[0] == 4
+    assert conn.execute("SELECT message FROM archive.comments").fetchall()[0][0] == "Готово"
+    assert conn.execute("SELECT rating FROM archive.reviews WHERE request_id = 3").fetchone()[0] == 5
+    assert conn.execute("SELECT COUNT(*) FROM main.comments WHERE request_id = 3").fetchone()[0] == 0
+    assert conn.execute(
+        "SELECT related_request_id FROM notifications WHERE message = 'Заявка 3 завершена'"
+    ).fetchone()[0] is None
+    assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+
+    assert read_stats(conn)[:2] == stats_before[:2]
+    assert find_differences(conn) == []
+
+
+def test_requests_list_history_filter(app_client, db_copy):
+    """
+    Проверка: список заявок показывает архивные заявки только с фильтром
+    «включая архив», по порядку вместе с оперативными и без правки.
+    """
+    print("\n[TEST] Проверка фильтра «включая архив» в списке заявок")
+    open_migrated(db_copy).close()
+    assert archive.archive_closed(db_copy, days=365, now=LATER) == 3
+
+    login_as(app_client, "login1", "pass1")
+    html = app_client.get("/requests").data.decode("utf-8")
+    assert 'data-request-id="3"' not in html and 'data-request-id="5"' in html
+
+    html = app_client.get("/requests?history=1&per_page=5").data.decode("utf-8")
+    rows = [int(part.split('"')[0]) for part in html.split('data-request-id="')[1:]]
+    assert rows == [7, 6, 5, 4, 3]  # одна дата — по убыванию номера, архивные вперемешку
+    assert "только просмотр" in html and "/requests/7/edit" not in html
+    assert "history=1" in html  # ссылка на следующую страницу сохраняет фильтр
+
+    html = app_client.get("/requests?history=1&status=Завершена").data.decode("utf-8")
+    assert html.count('data-request-id="') == 2
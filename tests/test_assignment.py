@@ -0,0 +1,113 @@
+import sqlite3
+
+from assignment import AssignmentEngine
+from conftest import login_as
+
+
+def open_loads(conn):
+    return dict(conn.execute(
+        "SELECT master_id, COUNT(*) FROM requests WHERE master_id IS NOT NULL "
+        "AND request_status IN ('Новая заявка', 'В процессе ремонта', 'Ожидание комплектующих') "
+        "GROUP BY master_id"
+    ).fetchall())
+
+
+def test_backlog_is_balanced_by_skill_and_load(db_copy):
+    """
+    Проверка: пакетный режим за один проход распределяет заявки без мастера
+    между специалистами по оборудованию с учётом квалификации и нагрузки,
+    а счётчики в памяти совпадают с БД.
+    """
+    print("\n[TEST] Проверка пакетного автоназначения")
+    conn = sqlite3.connect(db_copy)
+    with conn:
+        conn.executemany(
+            "INSERT INTO requests (start_date, climate_tech_type, climate_tech_model, "
+            "problem_description, request_status, client_id) VALUES (?, ?, 'M', 'Не работает', 'Новая заявка', 6)",
+            [(f"2025-12-{day:02d}", "Кондиционер") for day in range(1, 7)] + [("2025-12-07", "Телевизор")],
+        )
+    engine = AssignmentEngine(db_copy)
+
+    assert engine.assign_backlog(conn) == {"assigned": 6, "skipped": 1}
+    # Эксперты 2 и 10 начинают с нуля, у мастера 3 (средний) уже две заявки
+    assert open_loads(conn)[2] == 3 and open_loads(conn)[10] == 3 and open_loads(conn)[3] == 2
+    assert engine.stats()["open_by_master"] == open_loads(conn)
+    assert engine.assign_backlog(conn) == {"assigned": 0, "skipped": 1}
+
+    with conn:
+        conn.execute("UPDATE requests SET request_status = 'Завершена' WHERE request_id = 1")
+    engine.apply_change(3, "Ожидание комплектующих", 3, "Завершена")
+    assert engine.stats()["open_by_master"] == open_loads(conn)
+    assert engine.choose(conn, "кондиционер ") == 3  # 1 заявка на уровень «Средний» — 0.5 < 1
+
+
+def test_new_request_and_batch_endpoint(app_client, db_copy):
+    """
+    Проверка: новая заявка без мастера получает мастера автоматически,
+    пакетное назначение доступно только менеджеру.
+    """
+    print("\n[TEST] Проверка автоназначения в веб-приложении")
+    form = {
+        "start_date": "2025-12-01",
+        "climate_tech_type": "Увлажнитель воздуха",
+        "climate_tech_model": "H",
+        "problem_description": "Не увлажняет",
+    }
+    login_as(app_client, "login6", "pass6")
+    resp = app_client.post("/requests/new", data=form, follow_redirects=True)
+    assert "Мастер назначен автоматически" in resp.data.decode("utf-8")
+    conn = sqlite3.connect(db_copy)
+    assert conn.execute("SELECT master_id FROM requests ORDER BY request_id DESC").fetchone()[0] == 10
+
+    with conn:
+        conn.execute(
+            "INSERT INTO requests (start_date, climate_tech_type, climate_tech_model, "
+            "problem_description, request_status, client_id) "
+            "VALUES ('2025-12-02', 'Сушилка для рук', 'D', 'Не сушит', 'Новая заявка', 7)"
+        )
+    assert app_client.post("/requests/assign", headers={"Accept": "application/json"}).status_code == 302
+
+    login_as(app_client, "login1", "pass1")
+    resp = app_client.post("/requests/assign", headers={"Accept": "application/json"})
+    assert resp.get_json() == {"assigned": 1, "skipped": 0}
+    assert conn.execute("SELECT master_id FROM requests ORDER BY request_id DESC").fetchone()[0] == 3
+    assert app_client.get("/api/assignment").get_json()["assigned"] == 2
+
+
+def test_edit_counts_load_from_row_at_write_time(app_client, db_copy, monkeypatch):
+    """
+    Проверка: правка заявки пересчитывает нагрузку от мастера, который
+    записан в БД в момент UPDATE, а не от прочитанного при открытии формы.
+    """
+    print("\n[TEST] Проверка нагрузки мастеров при параллельной правке")
+    import web_app
+
+    conn = sqlite3.connect(db_copy)
+    engine = web_app.get_assignment_engine()
+    engine.rebuild(conn)
+    original = web_app.run_write
+
+    def run_after_concurrent_edit(operation, *args):
+        # Между чтением формы и записью заявку 5 переназначили мастеру 3
+        with conn:
+            conn.execute("UPDATE requests SET master_id = 3 WHERE request_id = 5")
+        engine.apply_change(1, "Новая заявка", 3, "Новая заявка")
+        return original(operation, *args)
+
+    monkeypatch.setattr(web_app, "run_write", run_after_concurrent_edit)
+    login_as(app_client, "login1", "pass1")
+    resp = app_client.post(
+        "/requests/5/edit",
+        data={
+            "start_date": "2023-08-02",
+            "climate_tech_type": "Сушилка для рук",
+            "climate_tech_model": "Ballu BAHD-1250",
+            "problem_description": "Не работает",
+            "request_status": "В процессе ремонта",
+            "master_id": "1",
+            "client_id": "7",
+        },
+    )
+    assert resp.status_code == 302
+    assert conn.execute("SELECT master_id FROM requests WHERE request_id = 5").fetchone()[0] == 1
+    assert engine.stats()["open_by_master"] == open_loads(conn)
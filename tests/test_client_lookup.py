@@ -0,0 +1,86 @@
+import sqlite3
+
+from client_lookup import lookup_clients
+from conftest import login_as
+from schema import apply_migrations
+
+
+def open_migrated(path):
+    conn = sqlite3.connect(path)
+    apply_migrations(conn)
+    return conn
+
+
+def test_lookup_by_fio_phone_and_login(db_copy):
+    """
+    Проверка: заказчик находится по началу ФИО (в любом регистре первой буквы),
+    телефона и логина; сотрудники и заблокированные не попадают в выдачу.
+    """
+    print("\n[TEST] Проверка поиска заказчика по префиксу")
+    conn = open_migrated(db_copy)
+
+    def ids(text, **kwargs):
+        return [c["user_id"] for c in lookup_clients(conn, text, **kwargs)]
+
+    assert ids("Петров") == [14, 7]  # по ФИО: Иван раньше Никиты
+    assert ids("петров ни") == [7]
+    assert ids("8921956784") == [9, 6, 7]
+    assert ids("+7 892") == [14]
+    assert ids("Ivan@") == [13]
+    assert ids("Широков") == []  # менеджер, а не заказчик
+    assert ids("Василин") == []
+    assert ids("   ") == []
+    assert len(ids("89", limit=2)) == 2
+
+    with conn:
+        conn.execute("UPDATE users SET is_active = 0 WHERE user_id = 7")
+    assert ids("Петров") == [14]
+
+
+def test_lookup_uses_indexes(db_copy):
+    """
+    Проверка: каждая ветка поиска читает диапазон индекса, без полного просмотра users.
+    """
+    print("\n[TEST] Проверка плана запроса автодополнения")
+    conn = open_migrated(db_copy)
+    statements = []
+    conn.set_trace_callback(statements.append)
+    lookup_clients(conn, "+7 12")
+    conn.set_trace_callback(None)
+
+    sql = statements[-1]
+    plan = " ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}"))
+    assert "SCAN users" not in plan
+    assert "idx_users_type_active_fio" in plan
+    assert "idx_users_type_active_phone" in plan
+    assert "idx_users_login" in plan
+
+
+def test_api_clients_and_form(app_client):
+    """
+    Проверка: /api/clients доступен сотрудникам, а форма заявки не содержит
+    полного списка заказчиков и принимает только существующего заказчика.
+    """
+    print("\n[TEST] Проверка /api/clients и формы новой заявки")
+    login_as(app_client, "login1", "pass1")
+    data = app_client.get("/api/clients?q=кузн").get_json()
+    assert [c["fio"] for c in data["results"]] == ["Кузнецов Сергей Матвеевич"]
+
+    page = app_client.get("/requests/new").data.decode("utf-8")
+    assert "Кузнецов Сергей Матвеевич" not in page
+    assert "data-client-lookup" in page
+
+    form = {
+        "start_date": "2025-12-01",
+        "climate_tech_type": "Кондиционер",
+        "climate_tech_model": "X",
+        "problem_description": "Шумит",
+    }
+    resp = app_client.post("/requests/new", data=dict(form, client_id="1"))
+    assert resp.status_code == 200
+    assert "Выберите заказчика из списка." in resp.data.decode("utf-8")
+    resp = app_client.post("/requests/new", data=dict(form, client_id="9"))
+    assert resp.status_code == 302
+
+    login_as(app_client, "login6", "pass6")
+    assert app_client.get("/api/clients?q=кузн").status_code == 403
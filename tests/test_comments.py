@@ -0,0 +1,83 @@
+import sqlite3
+
+from conftest import login_as
+from schema import apply_migrations
+
+
+def counters(conn, request_id):
+    return conn.execute(
+        "SELECT comment_count, public_comment_count, last_comment_at, last_public_comment_at "
+        "FROM requests WHERE request_id = ?",
+        (request_id,),
+    ).fetchone()
+
+
+def test_counters_follow_comment_changes(db_copy):
+    """
+    Проверка: миграция заполняет счётчики по существующим комментариям,
+    не трогая updated_at, а триггеры ведут их при добавлении, правке и удалении.
+    """
+    print("\n[TEST] Проверка счётчиков комментариев")
+    conn = sqlite3.connect(db_copy)
+    with conn:
+        conn.execute(
+            "INSERT INTO comments (request_id, user_id, message, is_internal, created_at) "
+            "VALUES (2, 3, 'Старый комментарий', 0, '2025-01-01 10:00:00')"
+        )
+    updated_at = conn.execute("SELECT updated_at FROM requests WHERE request_id = 2").fetchone()[0]
+    apply_migrations(conn)
+    assert counters(conn, 2) == (1, 1, "2025-01-01 10:00:00", "2025-01-01 10:00:00")
+    assert conn.execute("SELECT updated_at FROM requests WHERE request_id = 2").fetchone()[0] == updated_at
+
+    with conn:
+        conn.execute(
+            "INSERT INTO comments (request_id, user_id, message, is_internal, created_at) "
+            "VALUES (2, 3, 'Внутренний', 1, '2025-01-02 10:00:00')"
+        )
+    assert counters(conn, 2) == (2, 1, "2025-01-02 10:00:00", "2025-01-01 10:00:00")
+
+    with conn:
+        conn.execute("UPDATE comments SET is_internal = 0 WHERE message = 'Внутренний'")
+    assert counters(conn, 2) == (2, 2, "2025-01-02 10:00:00", "2025-01-02 10:00:00")
+
+    with conn:
+        conn.execute("DELETE FROM comments WHERE request_id = 2")
+    assert counters(conn, 2) == (0, 0, None, None)
+
+
+def test_comment_endpoints_hide_internal_from_customers(app_client, db_copy):
+    """
+    Проверка: заказчик не может написать и не видит внутренний комментарий,
+    сотрудник добавляет пачку комментариев, список заявок показывает
+    каждому свой счётчик.
+    """
+    print("\n[TEST] Проверка API комментариев")
+    login_as(app_client, "login1", "pass1")
+    resp = app_client.post(
+        "/api/requests/1/comments",
+        json={"comments": [
+            {"message": "Проверили фреон", "is_internal": True},
+            {"message": "Нужна замена компрессора"},
+            {"message": "   "},
+        ]},
+    )
+    assert resp.status_code == 201
+    assert len(resp.get_json()["ids"]) == 2
+    assert "💬 2" in app_client.get("/requests").data.decode("utf-8")
+
+    login_as(app_client, "login6", "pass6")
+    resp = app_client.post("/requests/1/comments", data={"message": "Спасибо!", "is_internal": "1"})
+    assert resp.status_code == 302
+    items = app_client.get("/api/requests/1/comments").get_json()["comments"]
+    assert [c["message"] for c in items] == ["Нужна замена компрессора", "Спасибо!"]
+    assert not any(c["is_internal"] for c in items)
+    assert "💬 2" in app_client.get("/requests").data.decode("utf-8")
+    assert app_client.get("/api/requests/5/comments").status_code == 403
+
+    login_as(app_client, "login2", "pass2")  # специалист, не назначенный на заявку 1
+    assert app_client.post("/api/requests/1/comments", json={"message": "x"}).status_code == 403
+    after = items[0]["comment_id"]
+    items = app_client.get(f"/api/requests/1/comments?after={after}").get_json()["comments"]
+    assert [c["user_fio"] for c in items] == [
+        sqlite3.connect(db_copy).execute("SELECT fio FROM users WHERE user_id = 6").fetchone()[0]
+    ]
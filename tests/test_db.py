@@ -0,0 +1,78 @@
+import threading
+
+import pytest
+
+from db import ConnectionPool, PoolTimeout
+from conftest import login_as
+
+
+def test_pool_reuses_connection(db_copy):
+    """
+    Проверка: возвращённое соединение выдаётся снова, PRAGMA применены.
+    """
+    print("\n[TEST] Проверка переиспользования соединения в пуле")
+    pool = ConnectionPool(db_copy)
+    first = pool.acquire()
+    pool.release(first)
+    second = pool.acquire()
+
+    assert first is second
+    assert second.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert second.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+    stats = pool.stats()
+    assert stats["opened"] == 1 and stats["reused"] == 1
+    pool.close_all()
+
+
+def test_pool_reuses_connections_across_threads_and_is_bounded(db_copy):
+    """
+    Проверка: новый поток на каждый запрос получает уже открытое соединение,
+    а сверх max_size пул ждёт освобождения и по таймауту отказывает.
+    """
+    print("\n[TEST] Проверка пула при потоке на запрос и его предела")
+    hooks = []
+    pool = ConnectionPool(db_copy, max_size=2, timeout=0.1)
+    pool.on_connect.append(hooks.append)
+
+    for _ in range(5):
+        thread = threading.Thread(target=lambda: pool.release(pool.acquire()))
+        thread.start()
+        thread.join()
+    assert pool.stats()["opened"] == 1 and len(hooks) == 1
+
+    first = pool.acquire()
+    pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+
+    threading.Timer(0.02, pool.release, (first,)).start()
+    pool.timeout = 5
+    assert pool.acquire() is first
+    stats = pool.stats()
+    assert stats["open"] == 2 and stats["in_use"] == 2 and stats["waits"] >= 2
+    pool.close_all()
+
+
+def test_pool_missing_database(tmp_path):
+    """
+    Проверка: для отсутствующего файла БД поднимается FileNotFoundError.
+    """
+    print("\n[TEST] Проверка ошибки при отсутствии файла БД")
+    pool = ConnectionPool(str(tmp_path / "missing.db"))
+    with pytest.raises(FileNotFoundError):
+        pool.acquire()
+
+
+def test_requests_reuse_single_connection(app_client):
+    """
+    Проверка: несколько HTTP-запросов обслуживаются одним соединением пула.
+    """
+    print("\n[TEST] Проверка статистики пула через /db/stats")
+    login_as(app_client, "login1", "pass1")
+    app_client.get("/requests")
+    app_client.get("/stats")
+
+    stats = app_client.get("/db/stats").get_json()
+    assert stats["opened"] == 1
+    assert stats["reused"] >= 2
+    assert stats["in_use"] == 0  # все соединения возвращены в пул
@@ -0,0 +1,101 @@
+import sqlite3
+from datetime import datetime
+
+import deadlines
+from conftest import login_as
+from schema import apply_migrations
+
+
+def open_migrated(path):
+    conn = sqlite3.connect(path)
+    apply_migrations(conn)
+    return conn
+
+
+def due(conn, request_id):
+    return conn.execute(
+        "SELECT due_at, escalated_at FROM requests WHERE request_id = ?", (request_id,)
+    ).fetchone()
+
+
+def test_due_at_triggers_views_and_escalation(db_copy):
+    """
+    Проверка: срок считается триггерами по приоритету, оценке времени
+    и продлению, списки читают индекс по (статус, срок), а эскалация
+    уведомляет мастера и менеджеров один раз на каждый пропущенный срок.
+    """
+    print("\n[TEST] Проверка сроков заявок и эскалации")
+    conn = open_migrated(db_copy)
+    with conn:
+        request_id = conn.execute(
+            "INSERT INTO requests (start_date, climate_tech_type, climate_tech_model, "
+            "problem_description, priority, client_id, master_id) "
+            "VALUES ('2025-03-10', 'Кондиционер', 'X', 'Течёт', 'Критичный', 7, 2)"
+        ).lastrowid
+    assert due(conn, request_id) == ("2025-03-11 00:00:00", None)
+    with conn:
+        conn.execute("UPDATE requests SET estimated_time = 100 WHERE request_id = ?", (request_id,))
+    assert due(conn, request_id)[0] == "2025-03-14 04:00:00"
+
+    now = datetime(2025, 3, 15, 12, 0)
+    managers = conn.execute(
+        "SELECT COUNT(*) FROM users WHERE user_type = 'Менеджер' AND is_active = 1"
+    ).fetchone()[0]
+    notified = conn.execute("SELECT COUNT(*) FROM notifications").fetchone()[0]
+    assert deadlines.escalate_all(conn, now) == 1  # демо-заявки от декабря 2025 ещё не просрочены
+    assert conn.execute("SELECT COUNT(*) FROM notifications").fetchone()[0] == notified + managers + 1
+    assert due(conn, request_id)[1] == "2025-03-15 12:00:00"
+    assert deadlines.escalate_all(conn, now) == 0
+
+    with conn:
+        conn.execute("UPDATE requests SET deadline_extension = '2025-03-20' WHERE request_id = ?", (request_id,))
+    assert due(conn, request_id) == ("2025-03-20 23:59:59", None)
+    items, _ = deadlines.fetch(conn, "overdue", now)
+    assert [r["request_id"] for r in items] == []
+    items, _ = deadlines.fetch(conn, "today", datetime(2025, 3, 20, 9, 0))
+    assert [r["request_id"] for r in items] == [request_id]
+    assert deadlines.counts(conn, datetime(2025, 3, 21), master_id=2) == {"overdue": 1, "today": 0}
+
+    plan = " ".join(
+        row[3] for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT request_id FROM requests "
+            "WHERE request_status = 'Новая заявка' AND due_at >= '' AND due_at < '2026-01-01' "
+            "ORDER BY due_at, request_id"
+        )
+    )
+    assert "idx_requests_status_due" in plan and "TEMP B-TREE" not in plan
+
+
+def test_deadline_pages_and_edit_form(app_client, db_copy):
+    """
+    Проверка: менеджер видит все просроченные заявки, специалист — только
+    свои, заказчику список недоступен; смена приоритета в форме меняет срок.
+    """
+    print("\n[TEST] Проверка страницы сроков и формы заявки")
+    login_as(app_client, "login6", "pass6")
+    assert app_client.get("/api/requests/deadlines").status_code == 403
+
+    login_as(app_client, "login1", "pass1")
+    items = app_client.get("/api/requests/deadlines?view=overdue").get_json()["items"]
+    assert sorted(r["request_id"] for r in items) == [1, 2, 4, 5]
+    page = app_client.get("/requests/deadlines?limit=2").data.decode("utf-8")
+    assert "Дальше" in page
+
+    form = {
+        "start_date": "2025-12-19",
+        "climate_tech_type": "Увлажнитель воздуха",
+        "climate_tech_model": "H",
+        "problem_description": "Не работает",
+        "request_status": "Новая заявка",
+        "master_id": "1",
+        "client_id": "6",
+        "priority": "Низкий",
+        "deadline_extension": "2099-01-31",
+    }
+    assert app_client.post("/requests/4/edit", data=form).status_code == 302
+    conn = sqlite3.connect(db_copy)
+    assert due(conn, 4)[0] == "2099-01-31 23:59:59"
+
+    login_as(app_client, "login2", "pass2")
+    items = app_client.get("/api/requests/deadlines").get_json()["items"]
+    assert items == []  # у мастера 2 открытых заявок нет
@@ -0,0 +1,74 @@
+import csv
+import io
+import sqlite3
+import zipfile
+
+from conftest import login_as
+from export import export_stream
+
+
+def test_csv_stream_yields_batches(db_copy):
+    """
+    Проверка: CSV отдаётся по частям, заголовок идёт первым куском.
+    """
+    print("\n[TEST] Проверка потоковой выгрузки CSV")
+    conn = sqlite3.connect(db_copy)
+    chunks = list(export_stream(conn, {}, "csv"))
+    assert chunks[0].startswith("\ufeffID;".encode("utf-8"))
+
+    rows = list(csv.reader(io.StringIO(b"".join(chunks).decode("utf-8-sig")), delimiter=";"))
+    expected = [
+        str(row[0])
+        for row in conn.execute(
+            "SELECT request_id FROM requests ORDER BY start_date DESC, request_id DESC"
+        )
+    ]
+    assert [r[0] for r in rows[1:]] == expected
+
+
+def test_csv_neutralizes_formulas(db_copy):
+    """
+    Проверка: текст заказчика, начинающийся с =, +, - или @, выгружается
+    в CSV с апострофом и не выполняется как формула.
+    """
+    print("\n[TEST] Проверка защиты CSV от формул")
+    conn = sqlite3.connect(db_copy)
+    with conn:
+        conn.execute("UPDATE requests SET problem_description = '=HYPERLINK(\"http://x\")' WHERE request_id = 1")
+        conn.execute("UPDATE users SET fio = '@SUM(1+1)' WHERE user_id = 6")
+        conn.execute("UPDATE requests SET climate_tech_model = '-2+3' WHERE request_id = 1")
+
+    data = b"".join(export_stream(conn, {}, "csv")).decode("utf-8-sig")
+    row = next(r for r in csv.reader(io.StringIO(data), delimiter=";") if r[0] == "1")
+    assert row[5] == "'=HYPERLINK(\"http://x\")"
+    assert row[4] == "'-2+3"
+    assert row[9] == "'@SUM(1+1)"
+    assert row[2] == conn.execute("SELECT start_date FROM requests WHERE request_id = 1").fetchone()[0]
+
+
+def test_xlsx_is_valid_zip_with_all_rows(db_copy):
+    """
+    Проверка: XLSX — корректный zip-архив, на листе все заявки.
+    """
+    print("\n[TEST] Проверка потоковой выгрузки XLSX")
+    conn = sqlite3.connect(db_copy)
+    data = b"".join(export_stream(conn, {"status": "Завершена"}, "xlsx"))
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.testzip() is None
+        sheet = archive.read("xl/worksheets/sheet1.xml").decode("utf-8")
+    assert sheet.count("<row>") == 1 + 2
+    assert "Xiaomi Smart Humidifier 2" in sheet
+
+
+def test_export_endpoint_scopes_client(app_client):
+    """
+    Проверка: заказчик выгружает только свои заявки.
+    """
+    print("\n[TEST] Проверка /requests/export для заказчика")
+    login_as(app_client, "login6", "pass6")
+    resp = app_client.get("/requests/export?format=csv")
+    assert resp.status_code == 200
+    assert resp.is_streamed
+    text = resp.get_data().decode("utf-8-sig")
+    ids = [row[0] for row in csv.reader(io.StringIO(text), delimiter=";")][1:]
+    assert sorted(ids) == ["1", "4"]
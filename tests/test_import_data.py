@@ -0,0 +1,99 @@
+import sqlite3
+
+import pytest
+
+import schema
+from import_data import import_dataset, seed_dataset, synthetic_dataset
+from stats_summary import find_differences
+
+
+def open_db(path):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def schema_objects(conn):
+    return {
+        (r["type"], r["name"])
+        for r in conn.execute(
+            "SELECT type, name FROM sqlite_master WHERE type IN ('index', 'trigger')"
+        )
+    }
+
+
+def test_seed_import_matches_source_tables(tmp_path):
+    """
+    Проверка: таблицы ТЗ загружаются целиком, с номерами заявок и
+    производными данными, а триггеры и индексы восстановлены.
+    """
+    print("\n[TEST] Импорт исходных таблиц ТЗ")
+    path = str(tmp_path / "seed.db")
+    counts = import_dataset(path, seed_dataset())
+    assert counts == {"users": 10, "requests": 5, "comments": 3}
+
+    conn = open_db(path)
+    assert schema.get_version(conn) == schema.SCHEMA_VERSION
+
+    request = conn.execute("SELECT * FROM requests WHERE request_id = 4").fetchone()
+    assert request["master_id"] is None
+    assert request["completion_date"] is None
+    assert request["repair_parts"] is None
+    assert request["request_number"].startswith("REQ-") and request["request_number"].endswith("-0004")
+    assert conn.execute("SELECT COUNT(*) FROM requests WHERE request_number IS NULL").fetchone()[0] == 0
+
+    matches = conn.execute(
+        "SELECT rowid FROM requests_fts WHERE requests_fts MATCH 'охлаждает'"
+    ).fetchall()
+    assert [r[0] for r in matches] == [1]
+    assert find_differences(conn) == []
+
+    # Набор индексов и триггеров тот же, что у БД, созданной обычным способом
+    reference = schema.create_database(str(tmp_path / "reference.db"))
+    reference.row_factory = sqlite3.Row
+    assert schema_objects(conn) == schema_objects(reference)
+
+    # Триггеры снова работают для новых заявок
+    with conn:
+        cursor = conn.execute(
+            "INSERT INTO requests (start_date, climate_tech_type, climate_tech_model, "
+            "problem_description, client_id) VALUES ('2025-12-01', 'Кондиционер', 'X', 'Шумит', 7)"
+        )
+    new_id = cursor.lastrowid
+    assert new_id == 6
+    assert conn.execute(
+        "SELECT request_number FROM requests WHERE request_id = ?", (new_id,)
+    ).fetchone()[0].endswith("-0006")
+    conn.close()
+    reference.close()
+
+
+def test_synthetic_import_and_existing_file(tmp_path):
+    """
+    Проверка: сгенерированные данные детерминированы и согласованы,
+    существующий файл не перезаписывается.
+    """
+    print("\n[TEST] Импорт сгенерированных данных")
+    path = str(tmp_path / "synthetic.db")
+    counts = import_dataset(path, synthetic_dataset(2000, seed=1), batch_size=300)
+    assert counts["requests"] == 2000
+    assert counts == {
+        table: sum(1 for _ in rows) for table, rows in synthetic_dataset(2000, seed=1).items()
+    }
+
+    conn = open_db(path)
+    orphans = conn.execute(
+        """
+        SELECT COUNT(*) FROM requests r
+        LEFT JOIN users c ON c.user_id = r.client_id AND c.user_type = 'Заказчик'
+        LEFT JOIN users m ON m.user_id = r.master_id
+        WHERE c.user_id IS NULL OR (r.master_id IS NOT NULL AND m.user_type != 'Специалист')
+        """
+    ).fetchone()[0]
+    assert orphans == 0
+    assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+    assert find_differences(conn) == []
+    conn.close()
+
+    with pytest.raises(FileExistsError):
+        import_dataset(path, synthetic_dataset(10))
@@ -0,0 +1,132 @@
+import sqlite3
+import threading
+
+import pytest
+
+import inventory
+from conftest import login_as
+from schema import apply_migrations
+
+
+def open_migrated(path):
+    conn = sqlite3.connect(path, timeout=10)
+    apply_migrations(conn)
+    return conn
+
+
+def stock(conn, part_id):
+    return conn.execute(
+        "SELECT quantity_in_stock FROM spare_parts WHERE part_id = ?", (part_id,)
+    ).fetchone()[0]
+
+
+def low_stock_notifications(conn):
+    return conn.execute(
+        "SELECT COUNT(*) FROM notifications WHERE title = 'Низкий запас комплектующих'"
+    ).fetchone()[0]
+
+
+def test_reserve_consume_release_lifecycle(db_copy):
+    """
+    Проверка: резерв списывает детали со склада целиком или не списывает
+    ничего, списание не превышает резерв, возврат кладёт остаток обратно.
+    """
+    print("\n[TEST] Проверка резерва, списания и возврата деталей")
+    conn = open_migrated(db_copy)
+    notified = low_stock_notifications(conn)
+
+    with pytest.raises(inventory.InventoryError) as exc:
+        inventory.reserve(conn, 2, [(1, 2), (2, 6)])  # компрессоров на складе 5
+    assert exc.value.part_ids == [2]
+    assert (stock(conn, 1), stock(conn, 2)) == (25, 5)
+    assert not conn.in_transaction
+
+    parts = inventory.reserve(conn, 2, [(1, 2), (2, 3), {"part_id": 2, "quantity": 1}])
+    assert [(p["part_id"], p["quantity_needed"], p["status"]) for p in parts] == [
+        (1, 2, "Поступил"), (2, 4, "Поступил"),
+    ]
+    assert (stock(conn, 1), stock(conn, 2)) == (23, 1)
+    assert low_stock_notifications(conn) == notified + 1  # компрессор ниже минимума
+
+    with pytest.raises(inventory.InventoryError):
+        inventory.consume(conn, 2, [(1, 3)])
+    parts = inventory.consume(conn, 2, [(1, 2), (2, 1)])
+    assert [(p["quantity_used"], p["status"]) for p in parts] == [
+        (2, "Установлен"), (1, "Поступил"),
+    ]
+
+    assert inventory.release(conn, 2) == 3
+    assert stock(conn, 2) == 4
+    parts = inventory.request_parts(conn, 2)
+    assert [(p["quantity_needed"], p["status"]) for p in parts] == [
+        (2, "Установлен"), (1, "Установлен"),
+    ]
+    with pytest.raises(inventory.InventoryError):
+        inventory.reserve(conn, 3, [(1, 1)])  # заявка 3 завершена
+
+
+def test_concurrent_reservations_do_not_oversell(db_copy):
+    """
+    Проверка: параллельные резервы последних деталей из разных соединений
+    выдают ровно столько, сколько лежит на складе.
+    """
+    print("\n[TEST] Проверка параллельного резерва без перепродажи")
+    open_migrated(db_copy).close()
+    results = []
+
+    def worker():
+        conn = sqlite3.connect(db_copy, timeout=10)
+        try:
+            inventory.reserve(conn, 1, [(2, 1)])
+            results.append(True)
+        except inventory.InventoryError:
+            results.append(False)
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    conn = sqlite3.connect(db_copy)
+    assert results.count(True) == 5
+    assert stock(conn, 2) == 0
+    assert inventory.request_parts(conn, 1)[0]["quantity_needed"] == 5
+
+
+def test_bulk_restock_endpoint(app_client, db_copy):
+    """
+    Проверка: пополнение тысяч позиций одним запросом не создаёт
+    уведомлений на каждую строку и доступно только менеджерам.
+    """
+    print("\n[TEST] Проверка массового пополнения склада")
+    conn = open_migrated(db_copy)
+    with conn:
+        conn.executemany(
+            "INSERT INTO spare_parts (part_code, part_name, quantity_in_stock, min_quantity) "
+            "VALUES (?, 'Деталь', 0, 5)",
+            [(f"BULK-{i:05d}",) for i in range(3000)],
+        )
+    ids = [row[0] for row in conn.execute("SELECT part_id FROM spare_parts WHERE part_code LIKE 'BULK-%'")]
+    notified = low_stock_notifications(conn)
+    items = [{"part_id": part_id, "quantity": 10 if part_id % 2 else 3} for part_id in ids]
+
+    login_as(app_client, "login2", "pass2")
+    assert app_client.post("/api/parts/restock", json={"items": items}).status_code == 403
+
+    login_as(app_client, "login1", "pass1")
+    resp = app_client.post("/api/parts/restock", json={"items": items + [{"part_id": 999999, "quantity": 1}]})
+    assert resp.status_code == 409
+    assert resp.get_json()["part_ids"] == [999999]
+
+    data = app_client.post("/api/parts/restock", json={"items": items}).get_json()
+    assert data["updated"] == 3000
+    assert len(data["below_min"]) == 1500
+    assert low_stock_notifications(conn) == notified
+
+    resp = app_client.post("/api/requests/5/parts/reserve", data={"part_id": ["3"], "quantity": ["2"]})
+    assert resp.get_json()["parts"][0]["quantity_needed"] == 2
+    low = app_client.get("/api/parts?low=1").get_json()["parts"]
+    assert len(low) == 1500
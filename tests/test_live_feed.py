@@ -0,0 +1,128 @@
+import sqlite3
+
+from conftest import login_as
+import live_feed
+from live_feed import RequestWatcher, scope
+from schema import apply_migrations
+
+
+def open_migrated(path):
+    conn = sqlite3.connect(path)
+    apply_migrations(conn)
+    return conn
+
+
+def test_watcher_classifies_changes_and_scopes_them(db_copy):
+    """
+    Проверка: поток видит новую заявку, смену статуса и переназначение,
+    а scope() отдаёт заказчику только его заявки и убирает со страницы
+    мастера заявку, переданную другому мастеру.
+    """
+    print("\n[TEST] Проверка событий живой ленты заявок")
+    conn = open_migrated(db_copy)
+    watcher = RequestWatcher(db_copy)
+    assert watcher.poll() == []
+
+    with conn:
+        conn.execute("UPDATE requests SET request_status = 'Готова к выдаче' WHERE request_id = 1")
+        conn.execute(
+            "INSERT INTO requests (start_date, climate_tech_type, climate_tech_model, "
+            "problem_description, client_id) VALUES ('2024-01-10', 'Кондиционер', 'X-1', 'Шумит', 7)"
+        )
+    events = {event["request_id"]: event for event in watcher.poll()}
+    assert events[1]["kind"] == "status"
+    assert events[1]["previous"] == {"request_status": "Ожидание комплектующих"}
+    assert events[1]["row"]["request_status"] == "Готова к выдаче"
+    assert events[8]["kind"] == "created"
+    assert events[8]["row"]["request_number"].endswith("-0008")
+
+    assert scope(events[1], {"client_id": 6}) == "upsert"
+    assert scope(events[8], {"client_id": 6}) is None
+    assert scope(events[1], {"status": "Завершена"}) is None
+
+    with conn:
+        conn.execute("UPDATE requests SET master_id = 2 WHERE request_id = 1")
+    (event,) = watcher.poll()
+    assert event["kind"] == "reassigned"
+    assert scope(event, {"master_id": 3}) == "remove"
+    assert scope(event, {"master_id": 2}) == "upsert"
+
+    # Без новых записей таблицы не читаются
+    reads = watcher.reads
+    assert watcher.poll() == []
+    assert watcher.reads == reads
+
+
+def test_stream_pushes_rows_and_replays_after_reconnect(app_client, db_copy):
+    """
+    Проверка: /requests/stream присылает готовую строку таблицы
+    изменённой заявки, а при переподключении с Last-Event-ID — пропущенные
+    события; заказчик чужих заявок не получает.
+    """
+    print("\n[TEST] Проверка потока /requests/stream")
+    from web_app import app, get_request_watcher
+
+    app.config["LIVE_FEED_POLL_INTERVAL"] = 0.05
+    login_as(app_client, "login1", "pass1")
+    assert b'data-live-url="/requests/stream"' in app_client.get("/requests").data
+
+    resp = app_client.get("/requests/stream", buffered=False)
+    assert resp.mimetype == "text/event-stream"
+    chunks = iter(resp.response)
+    assert next(chunks).startswith(b"retry:")
+
+    conn = open_migrated(db_copy)
+    with conn:
+        conn.execute("UPDATE requests SET request_status = 'В процессе ремонта' WHERE request_id = 5")
+    message = next(chunks).decode("utf-8")
+    event_id = message.split("\n", 1)[0].removeprefix("id: ")
+    assert '"kind": "status"' in message
+    assert 'data-request-id=\\"5\\"' in message
+    assert "Редактировать" in message
+    resp.close()
+    assert get_request_watcher().stats()["subscribers"] == 0
+
+    with conn:
+        conn.execute("UPDATE requests SET request_status = 'Завершена' WHERE request_id = 4")
+        conn.execute("UPDATE requests SET request_status = 'Завершена' WHERE request_id = 5")
+    watcher = get_request_watcher()
+    watcher.stop()
+    watcher.poll()
+
+    login_as(app_client, "login7", "pass7")
+    resp = app_client.get("/requests/stream", headers={"Last-Event-ID": event_id}, buffered=False)
+    chunks = iter(resp.response)
+    next(chunks)
+    message = next(chunks).decode("utf-8")
+    assert '"request_id": 5' in message  # заявка 4 принадлежит другому заказчику
+    resp.close()
+    watcher.stop()
+    app.config["LIVE_FEED_POLL_INTERVAL"] = live_feed.POLL_INTERVAL
+
+
+def test_stream_rejects_subscribers_over_limit(app_client, monkeypatch):
+    """
+    Проверка: сверх LIVE_FEED_MAX_SUBSCRIBERS подключений /requests/stream
+    отвечает 503 с Retry-After, а после закрытия подключения снова принимает.
+    """
+    print("\n[TEST] Проверка ограничения подписчиков живой ленты")
+    from web_app import app, get_request_watcher
+
+    monkeypatch.setitem(app.config, "LIVE_FEED_MAX_SUBSCRIBERS", 1)
+    login_as(app_client, "login1", "pass1")
+    watcher = get_request_watcher()
+    assert watcher.max_subscribers == 1
+
+    # Место занято другим подключением этого процесса
+    other = watcher.subscribe()
+    rejected = app_client.get("/requests/stream")
+    assert rejected.status_code == 503
+    assert rejected.headers["Retry-After"] == str(live_feed.RETRY_AFTER)
+    assert watcher.stats()["rejected"] == 1
+
+    watcher.unsubscribe(other)
+    resp = app_client.get("/requests/stream", buffered=False)
+    assert resp.status_code == 200
+    resp.close()
+    assert watcher.stats()["subscribers"] == 0
+    watcher.stop()
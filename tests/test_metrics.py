@@ -0,0 +1,61 @@
+import sqlite3
+
+import metrics
+from conftest import login_as
+
+
+def test_request_stats_and_debug_header(app_client, monkeypatch):
+    """
+    Проверка: хуки соединения считают запросы SQL и строки текущего
+    запроса (в том числе операции очереди записи), заголовок X-Debug-SQL
+    появляется только при METRICS_DEBUG_HEADER.
+    """
+    print("\n[TEST] Проверка счётчиков SQL запроса")
+    from web_app import app
+
+    login_as(app_client, "login1", "pass1")
+    assert metrics.DEBUG_HEADER not in app_client.get("/requests").headers
+
+    monkeypatch.setitem(app.config, "METRICS_DEBUG_HEADER", True)
+    header = app_client.get("/requests").headers[metrics.DEBUG_HEADER]
+    stats = dict(part.split("=") for part in header.split("; "))
+    assert 1 <= int(stats["queries"]) <= 5 and int(stats["rows"]) >= 7  # 7 демо-заявок одной страницей
+
+    form = {"fio": "Метрики", "login": "metrics_user", "password": "p", "password_confirm": "p"}
+    header = app_client.post("/register", data=form).headers[metrics.DEBUG_HEADER]
+    assert "queries=1;" in header  # INSERT выполнил поток-писатель
+
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    metrics.instrument_connection(conn)
+    stats = metrics.RequestStats()
+    metrics.bound(lambda c: c.execute("WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n "
+                                      "WHERE x < 5000) SELECT x FROM n").fetchall(), stats)(conn)
+    assert (stats.queries, stats.rows) == (1, 5000) and stats.vm_steps >= 5000
+    conn.execute("SELECT 1").fetchall()  # вне запроса не считается
+    assert (stats.queries, stats.rows) == (1, 5000)
+
+
+def test_metrics_endpoint(app_client, monkeypatch):
+    """
+    Проверка: /metrics отдаёт гистограммы по шаблонам маршрутов в формате
+    Prometheus; доступ — менеджеру или по токену.
+    """
+    print("\n[TEST] Проверка /metrics")
+    from web_app import app
+
+    assert app_client.get("/metrics").status_code == 403
+    monkeypatch.setitem(app.config, "METRICS_TOKEN", "secret")
+    login_as(app_client, "login6", "pass6")
+    app_client.get("/requests/1/edit")
+    assert app_client.get("/metrics").status_code == 403
+
+    text = app_client.get("/metrics", headers={"Authorization": "Bearer secret"}).data.decode("utf-8")
+    route = 'route="/requests/<int:request_id>/edit",method="GET"'
+    assert "# TYPE http_request_duration_seconds histogram" in text
+    assert f'http_request_duration_seconds_bucket{{{route},le="+Inf"}}' in text
+    assert f"sqlite_queries_per_request_count{{{route}}}" in text
+    assert 'route="<unmatched>"' not in text
+
+    login_as(app_client, "login1", "pass1")
+    assert app_client.get("/metrics").status_code == 200
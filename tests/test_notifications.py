@@ -0,0 +1,201 @@
+import sqlite3
+import time
+
+from conftest import login_as
+from notifications import MAX_ATTEMPTS, Dispatcher, InAppFeed, fetch_pending, unread_count
+from schema import apply_migrations
+
+
+def open_migrated(path):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    apply_migrations(conn)
+    return conn
+
+
+class RecordingSink:
+    def __init__(self, name, fail=False):
+        self.name = name
+        self.fail = fail
+        self.calls = []
+
+    def deliver(self, user_id, items):
+        self.calls.append((user_id, [item["notification_id"] for item in items]))
+        if self.fail:
+            raise RuntimeError("получатель недоступен")
+
+
+def test_status_change_creates_notifications(db_copy):
+    """
+    Проверка: смена статуса порождает уведомления заказчику и мастеру,
+    сохранение без смены статуса — нет.
+    """
+    print("\n[TEST] Проверка уведомлений о смене статуса")
+    conn = open_migrated(db_copy)
+    with conn:
+        conn.execute("UPDATE requests SET request_status = 'Готова к выдаче' WHERE request_id = 2")
+        conn.execute("UPDATE requests SET request_status = request_status WHERE request_id = 1")
+
+    pending = fetch_pending(conn)
+    assert sorted(item["user_id"] for item in pending) == [3, 8]  # мастер и заказчик заявки 2
+    assert all(item["related_request_id"] == 2 for item in pending)
+    assert all(item["notification_type"] == "success" for item in pending)
+    assert "В процессе ремонта → Готова к выдаче" in pending[0]["message"]
+
+
+def test_dispatcher_delivers_in_batches_and_survives_sink_errors(db_copy):
+    """
+    Проверка: диспетчер раздаёт уведомления по пользователям, отмечает их
+    доставленными одной пачкой и не останавливается из-за сбоя получателя.
+    """
+    print("\n[TEST] Проверка доставки уведомлений диспетчером")
+    conn = open_migrated(db_copy)
+    with conn:
+        for request_id in (1, 2, 4):
+            conn.execute(
+                "UPDATE requests SET request_status = 'Завершена' WHERE request_id = ?",
+                (request_id,),
+            )
+
+    feed = InAppFeed()
+    broken = RecordingSink("broken", fail=True)
+    recorder = RecordingSink("recorder")
+    dispatcher = Dispatcher(db_copy, [broken, feed, recorder], batch_size=4)
+    assert dispatcher.drain() == 6  # по два получателя на каждую из трёх заявок
+
+    assert fetch_pending(conn) == []
+    assert dispatcher.errors == len(broken.calls)
+    assert sorted(user_id for user_id, _ in recorder.calls) == sorted(
+        user_id for user_id, _ in broken.calls
+    )
+    # Заказчик 6 — в заявках 1 и 4, мастер 1 — в заявке 4
+    assert [item["related_request_id"] for item in feed.recent(6)] == [4, 1]
+    assert [item["related_request_id"] for item in feed.recent(1)] == [4]
+    assert dispatcher.run_once() == 0
+
+
+def test_failed_sink_is_retried_alone(db_copy):
+    """
+    Проверка: уведомления, которые не принял один получатель, повторяются
+    только ему, а после MAX_ATTEMPTS неудач диспетчер сдаётся.
+    """
+    print("\n[TEST] Проверка повторной доставки уведомлений")
+    conn = open_migrated(db_copy)
+    with conn:
+        conn.execute("UPDATE requests SET request_status = 'Завершена' WHERE request_id = 2")
+        conn.execute("UPDATE requests SET request_status = 'Завершена' WHERE request_id = 4")
+
+    broken = RecordingSink("broken", fail=True)
+    recorder = RecordingSink("recorder")
+    dispatcher = Dispatcher(db_copy, [broken, recorder])
+    assert dispatcher.drain() == 4
+    retries = conn.execute(
+        "SELECT notification_id, sink, attempts FROM notification_retries ORDER BY notification_id"
+    ).fetchall()
+    ids = [row["notification_id"] for row in retries]
+    assert len(ids) == 4
+    assert {row["sink"] for row in retries} == {"broken"}
+    assert {row["attempts"] for row in retries} == {1}
+
+    # Время не подошло — повторов нет
+    broken.calls.clear()
+    dispatcher.drain()
+    assert broken.calls == []
+
+    # Получатель ожил: повтор доходит только до него
+    broken.fail = False
+    recorder.calls.clear()
+    with conn:
+        conn.execute("UPDATE notification_retries SET next_attempt_at = DATETIME('now', '-1 second')")
+        conn.execute(
+            "UPDATE notification_retries SET attempts = ? WHERE notification_id = ?",
+            (MAX_ATTEMPTS - 1, ids[0]),
+        )
+    dispatcher.drain()
+    assert sorted(i for _, batch in broken.calls for i in batch) == ids
+    assert recorder.calls == []
+    assert conn.execute("SELECT COUNT(*) FROM notification_retries").fetchone()[0] == 0
+
+    # Последняя попытка тоже неудачна — уведомление снимается с повторов
+    broken.fail = True
+    with conn:
+        conn.execute(
+            "INSERT INTO notification_retries (notification_id, sink, attempts, next_attempt_at) "
+            "VALUES (?, 'broken', ?, DATETIME('now', '-1 second')), "
+            "(?, 'broken', 1, DATETIME('now', '-1 second'))",
+            (ids[0], MAX_ATTEMPTS - 1, ids[1]),
+        )
+    dispatcher.drain()
+    assert dispatcher.abandoned == 1
+    assert [tuple(row) for row in conn.execute(
+        "SELECT notification_id, attempts FROM notification_retries"
+    )] == [(ids[1], 2)]
+
+
+def test_api_notifications_reads_table_without_dispatcher(app_client, db_copy):
+    """
+    Проверка: /api/notifications берёт уведомления из таблицы — они видны
+    и без диспетчера (например, в другом процессе сервера).
+    """
+    print("\n[TEST] Проверка ленты уведомлений из БД")
+    conn = open_migrated(db_copy)
+    with conn:
+        conn.execute("UPDATE requests SET request_status = 'Готова к выдаче' WHERE request_id = 2")
+
+    login_as(app_client, "login3", "pass3")  # мастер заявки 2
+    data = app_client.get("/api/notifications").get_json()
+    assert data["unread"] >= 1
+    assert data["items"][0]["related_request_id"] == 2
+    assert "email" not in data["items"][0]
+    after = data["items"][0]["notification_id"]
+    assert app_client.get(f"/api/notifications?after={after}").get_json()["items"] == []
+
+
+def test_background_thread_and_feed_endpoints(app_client, db_copy):
+    """
+    Проверка: фоновый поток доставляет уведомления после wake(),
+    /api/notifications показывает их, /notifications/read отмечает прочитанными.
+    """
+    print("\n[TEST] Проверка фоновой доставки и ленты уведомлений")
+    from web_app import get_dispatcher
+
+    login_as(app_client, "login1", "pass1")
+    resp = app_client.post(
+        "/requests/5/edit",
+        data={
+            "start_date": "2023-08-02",
+            "climate_tech_type": "Сушилка для рук",
+            "climate_tech_model": "Ballu BAHD-1250",
+            "problem_description": "Не работает",
+            "request_status": "В процессе ремонта",
+            "master_id": "1",
+            "client_id": "7",
+        },
+    )
+    assert resp.status_code == 302
+
+    dispatcher = get_dispatcher()
+    dispatcher.poll_interval = 0.05
+    dispatcher.start()
+    try:
+        deadline = time.time() + 5
+        while dispatcher.delivered < 2 and time.time() < deadline:
+            time.sleep(0.02)
+    finally:
+        dispatcher.stop()
+    assert dispatcher.delivered == 2
+
+    data = app_client.get("/api/notifications").get_json()
+    assert data["unread"] == 1
+    assert [item["related_request_id"] for item in data["items"]] == [5]
+    after = data["items"][0]["notification_id"]
+    assert app_client.get(f"/api/notifications?after={after}").get_json()["items"] == []
+
+    resp = app_client.post("/notifications/read", headers={"Accept": "application/json"})
+    assert resp.get_json() == {"marked": 1}
+    data = app_client.get("/api/notifications").get_json()
+    assert data == {"unread": 0, "items": []}
+    assert "Статус заявки изменён" in app_client.get("/notifications").data.decode("utf-8")
+
+    conn = sqlite3.connect(db_copy)
+    assert unread_count(conn, 7) == 1  # у заказчика уведомление осталось непрочитанным
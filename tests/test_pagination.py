@@ -0,0 +1,97 @@
+import sqlite3
+
+from conftest import login_as
+from pagination import decode_cursor, encode_cursor, fetch_page, parse_filters
+from schema import SCHEMA_VERSION, apply_migrations
+
+
+SELECT_SQL = "SELECT r.request_id, r.start_date, r.request_status FROM requests r"
+
+
+def open_migrated(path):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    apply_migrations(conn)
+    return conn
+
+
+def test_cursor_roundtrip():
+    """
+    Проверка: курсор кодируется и декодируется без потерь, мусор игнорируется.
+    """
+    print("\n[TEST] Проверка кодирования курсора")
+    assert decode_cursor(encode_cursor("2025-12-19", 42)) == ("2025-12-19", 42)
+    assert decode_cursor("не-курсор") is None
+    assert decode_cursor("") is None
+
+
+def test_parse_filters_skips_invalid_values():
+    """
+    Проверка: некорректные значения фильтров пропускаются с сообщением.
+    """
+    print("\n[TEST] Проверка разбора фильтров")
+    filters, errors = parse_filters({"status": "Завершена", "master_id": "abc", "date_from": "19.12.2025"})
+    assert filters == {"status": "Завершена"}
+    assert len(errors) == 2
+
+
+def test_pages_cover_all_requests_without_overlap(db_copy):
+    """
+    Проверка: постраничный обход возвращает все заявки ровно один раз
+    в порядке (start_date, request_id) по убыванию.
+    """
+    print("\n[TEST] Проверка keyset-пагинации")
+    conn = open_migrated(db_copy)
+    expected = [
+        row[0]
+        for row in conn.execute(
+            "SELECT request_id FROM requests ORDER BY start_date DESC, request_id DESC"
+        )
+    ]
+
+    seen = []
+    cursor = None
+    while True:
+        rows, next_cursor = fetch_page(conn, SELECT_SQL, {}, decode_cursor(cursor), limit=2)
+        seen.extend(r["request_id"] for r in rows)
+        if next_cursor is None:
+            break
+        cursor = next_cursor
+
+    assert seen == expected
+
+
+def test_filtered_page_uses_composite_index(db_copy):
+    """
+    Проверка: миграции применены, а страница с фильтром по статусу
+    читается по составному индексу без сортировки во временном B-дереве.
+    """
+    print("\n[TEST] Проверка плана запроса страницы с фильтром")
+    conn = open_migrated(db_copy)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+
+    plan = " ".join(
+        row[3]
+        for row in conn.execute(
+            "EXPLAIN QUERY PLAN " + SELECT_SQL
+            + " WHERE r.request_status = ? AND (r.start_date, r.request_id) < (?, ?)"
+            " ORDER BY r.start_date DESC, r.request_id DESC LIMIT 51",
+            ("Завершена", "2030-01-01", 1),
+        )
+    )
+    assert "idx_requests_status" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_requests_list_filter_and_next_page(app_client):
+    """
+    Проверка: страница /requests учитывает фильтр и выдаёт ссылку на следующую страницу.
+    """
+    print("\n[TEST] Проверка фильтра и пагинации на /requests")
+    login_as(app_client, "login1", "pass1")
+
+    text = app_client.get("/requests?per_page=2").get_data(as_text=True)
+    assert "cursor=" in text
+
+    text = app_client.get("/requests?status=Завершена").get_data(as_text=True)
+    assert "Выключается сам по себе" not in text  # заявка 2 в процессе ремонта
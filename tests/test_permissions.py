@@ -0,0 +1,48 @@
+import os
+import sys
+
+# Добавляем корень проекта в sys.path, чтобы можно было импортировать модули
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from permissions import NO_RIGHTS, request_rights, rights_for_rows
+
+
+def test_full_access_roles():
+    """
+    Проверка: менеджер получает полные права на любую заявку.
+    """
+    print("\n[TEST] Проверка полных прав менеджера")
+    user = {"user_id": 1, "user_type": "Менеджер"}
+    assert request_rights(user, client_id=6, master_id=3) == (True, True, True)
+
+
+def test_client_and_specialist_rights():
+    """
+    Проверка: заказчик редактирует только свои заявки,
+    специалист — только назначенные ему.
+    """
+    print("\n[TEST] Проверка прав заказчика и специалиста")
+    client = {"user_id": 6, "user_type": "Заказчик"}
+    master = {"user_id": 3, "user_type": "Специалист"}
+
+    assert request_rights(client, client_id=6, master_id=3) == (True, False, False)
+    assert request_rights(client, client_id=7, master_id=3) == NO_RIGHTS
+    assert request_rights(master, client_id=6, master_id=3) == (True, True, False)
+    assert request_rights(master, client_id=6, master_id=None) == NO_RIGHTS
+
+
+def test_rights_for_rows_uses_loaded_rows():
+    """
+    Проверка: права для набора строк считаются без обращения к БД.
+    """
+    print("\n[TEST] Проверка пакетного расчёта прав")
+    master = {"user_id": 3, "user_type": "Специалист"}
+    rows = [
+        {"request_id": 1, "client_id": 6, "master_id": 3},
+        {"request_id": 2, "client_id": 7, "master_id": 2},
+    ]
+    rights = rights_for_rows(rows, master)
+    assert rights == {1: (True, True, False), 2: NO_RIGHTS}
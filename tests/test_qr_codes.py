@@ -0,0 +1,118 @@
+import sqlite3
+
+import pytest
+
+import qr_codes
+import schema
+from conftest import login_as
+from qr_codes import FEEDBACK_FORM_URL, QRCache, feedback_url, get_token, get_tokens
+from schema import apply_migrations
+
+REQUEST_VALUES = {
+    "start_date": "2025-03-10",
+    "climate_tech_type": "Кондиционер",
+    "climate_tech_model": "X",
+    "problem_description": "Течёт",
+    "request_status": "Новая заявка",
+    "client_id": 7,
+}
+
+
+def test_tokens_are_issued_on_insert_and_backfilled(db_copy):
+    """
+    Проверка: миграция выдаёт токены старым заявкам, не трогая updated_at;
+    новые заявки получают токен при INSERT (и из приложения, и обычным INSERT).
+    """
+    print("\n[TEST] Проверка токенов QR-кодов заявок")
+    conn = sqlite3.connect(db_copy)
+    updated_before = conn.execute("SELECT updated_at FROM requests ORDER BY request_id").fetchall()
+    apply_migrations(conn)
+    assert conn.execute("SELECT updated_at FROM requests ORDER BY request_id").fetchall() == updated_before
+    tokens = get_tokens(conn, [1, 2, 9999])
+    assert set(tokens) == {1, 2} and all(tokens.values()) and tokens[1] != tokens[2]
+    assert get_token(conn, 1) == tokens[1]
+    assert get_token(conn, 9999) is None
+
+    with conn:
+        app_id = conn.execute(
+            schema.insert_request_sql(tuple(REQUEST_VALUES)), REQUEST_VALUES
+        ).fetchall()[0][0]
+        columns = ", ".join(REQUEST_VALUES)
+        raw_id = conn.execute(
+            f"INSERT INTO requests ({columns}) VALUES ({', '.join(':' + c for c in REQUEST_VALUES)})",
+            REQUEST_VALUES,
+        ).lastrowid
+    assert get_token(conn, app_id) and get_token(conn, raw_id)
+    assert conn.execute(
+        "SELECT COUNT(*) FROM requests WHERE qr_code_token IS NULL OR qr_code_generated = 0"
+    ).fetchone()[0] == 0
+
+
+def test_feedback_url_prefills_form_entry():
+    """
+    Проверка: токен заявки попадает в ссылку только как предзаполненное
+    поле формы entry.NNN.
+    """
+    print("\n[TEST] Проверка ссылки на форму отзыва")
+    url = feedback_url("abc123", "entry.1234567")
+    assert url.endswith("/viewform?usp=pp_url&entry.1234567=abc123")
+    assert feedback_url("abc123") == FEEDBACK_FORM_URL
+    with pytest.raises(ValueError):
+        feedback_url("abc123", "request")
+
+
+def test_cache_memory_disk_and_eviction(tmp_path):
+    """
+    Проверка: PNG берётся из памяти, после вытеснения — с диска.
+    """
+    print("\n[TEST] Проверка кэша PNG")
+    cache = QRCache(str(tmp_path), max_items=1)
+    key_a, png_a = cache.get("https://example.org/a")
+    assert png_a.startswith(b"\x89PNG")
+    assert cache.get("https://example.org/a") == (key_a, png_a)
+    cache.get("https://example.org/b")  # вытесняет a из памяти
+    assert cache.get("https://example.org/a") == (key_a, png_a)
+    assert cache.stats() == {"items": 1, "hits": 1, "disk_hits": 1, "misses": 2}
+
+
+def test_qr_endpoint_returns_304_for_known_etag(app_client, tmp_path, monkeypatch):
+    """
+    Проверка: /qr/<id> отдаёт ETag, повторный запрос с If-None-Match получает 304.
+    """
+    print("\n[TEST] Проверка ETag и условного GET для /qr/<id>")
+    from web_app import app
+
+    app.config["QR_CACHE_DIR"] = str(tmp_path / "qr")
+    monkeypatch.setitem(app.config, "FEEDBACK_FORM_ENTRY", "entry.1234567")
+    login_as(app_client, "login1", "pass1")
+
+    first = app_client.get("/qr/1")
+    assert first.status_code == 200
+    assert first.mimetype == "image/png"
+    etag = first.headers["ETag"]
+    assert "max-age" in first.headers["Cache-Control"]
+
+    # Повторный запрос не трогает кэш, даже сброшенный, и ничего не отрисовывает
+    app.config["QR_CACHE_DIR"] = str(tmp_path / "qr-empty")
+    with monkeypatch.context() as patch:
+        patch.setattr(qr_codes, "render_png", None)
+        again = app_client.get("/qr/1", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["ETag"] == etag
+    assert app_client.get("/qr/2").headers["ETag"] != etag  # у заявок разные токены
+    assert app_client.get("/qr/9999").status_code == 404
+
+
+def test_qr_endpoint_hides_other_clients_tokens(app_client, db_copy):
+    """
+    Проверка: заказчик получает QR-код только своей заявки; выдача
+    QR-кода в БД не пишет.
+    """
+    print("\n[TEST] Проверка доступа к /qr/<id>")
+    login_as(app_client, "login6", "pass6")
+    conn = sqlite3.connect(db_copy)
+    changes = conn.execute("SELECT COUNT(*), MAX(updated_at) FROM requests").fetchone()
+    assert app_client.get("/qr/1").status_code == 200
+    assert app_client.get("/qr/5").status_code == 403
+    # Выдача QR-кода только читает БД
+    assert conn.execute("SELECT COUNT(*), MAX(updated_at) FROM requests").fetchone() == changes
@@ -0,0 +1,61 @@
+import sqlite3
+
+from PIL import PdfParser
+
+import qr_labels
+from conftest import login_as
+from qr_labels import COLUMNS, ROWS, build_label_sheet, make_pool, render_labels, select_requests
+
+
+def test_select_by_ids_and_filters(db_copy):
+    """
+    Проверка: заявки для печати выбираются по списку номеров и по фильтру.
+    """
+    print("\n[TEST] Проверка выбора заявок для наклеек")
+    conn = sqlite3.connect(db_copy)
+    assert [r[0] for r in select_requests(conn, [3, 1, 3, 999])] == [1, 3]
+    finished = select_requests(conn, filters={"status": "Завершена"})
+    assert [r[0] for r in finished] == [3, 6]
+
+
+def test_parallel_rendering_matches_inline():
+    """
+    Проверка: наклейки из пула процессов (spawn) совпадают с отрисованными в процессе.
+    """
+    print("\n[TEST] Проверка отрисовки наклеек в пуле процессов")
+    items = [(f"REQ-{i:04d}", f"https://example.org/?request={i}") for i in range(30)]
+    with make_pool(2) as pool:
+        assert render_labels(items, pool) == render_labels(items)
+
+
+def test_sheet_is_multipage_pdf(db_copy):
+    """
+    Проверка: при числе наклеек больше одного листа получается многостраничный PDF.
+    """
+    print("\n[TEST] Проверка многостраничного PDF")
+    conn = sqlite3.connect(db_copy)
+    rows = select_requests(conn, list(range(1, 8))) * 2  # 14 наклеек
+    assert len(rows) > COLUMNS * ROWS
+    document = build_label_sheet(conn, rows, "pdf")
+    assert document.startswith(b"%PDF")
+    assert b"/Count 2" in document
+    assert len(PdfParser.PdfParser(buf=document).pages) == 2
+
+
+def test_labels_endpoint(app_client, monkeypatch):
+    """
+    Проверка: /qr/labels отдаёт PNG сотруднику и недоступен заказчику.
+    """
+    print("\n[TEST] Проверка /qr/labels")
+    login_as(app_client, "login1", "pass1")
+    resp = app_client.get("/qr/labels?ids=1,2&format=png")
+    assert resp.status_code == 200
+    assert resp.mimetype == "image/png"
+    assert app_client.get("/qr/labels?ids=999").status_code == 404
+    # PNG — одна картинка, поэтому число листов ограничено; PDF — нет
+    monkeypatch.setattr(qr_labels, "MAX_PNG_PAGES", 0)
+    assert app_client.get("/qr/labels?ids=1,2&format=png").status_code == 400
+    assert app_client.get("/qr/labels?ids=1,2&format=pdf").status_code == 200
+
+    login_as(app_client, "login6", "pass6")
+    assert app_client.get("/qr/labels?ids=1").status_code == 302
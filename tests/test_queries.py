@@ -0,0 +1,75 @@
+import ast
+import os
+import sqlite3
+
+import pytest
+
+import archive
+import queries
+from conftest import PROJECT_ROOT
+from import_data import import_dataset, synthetic_dataset
+
+# Размер сгенерированной БД: планы уже как на больших данных, а БД строится за секунду
+REQUESTS = 20000
+
+SQL_KEYWORDS = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE")
+
+
+@pytest.fixture(scope="module")
+def large_db(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("queries") / "synthetic.db")
+    import_dataset(path, synthetic_dataset(REQUESTS))
+    return path
+
+
+def plan_problems(conn, query):
+    """Строки плана с полным проходом или временной сортировкой, не разрешённые в allow."""
+    problems = []
+    for row in conn.execute("EXPLAIN QUERY PLAN " + query.sql, query.params):
+        # SQLite до 3.36 писал «SCAN TABLE users»
+        detail = row[3].replace("SCAN TABLE ", "SCAN ").replace("SEARCH TABLE ", "SEARCH ")
+        full_scan = detail.startswith("SCAN ") and not detail.startswith(("SCAN CONSTANT", "SCAN (")) and (
+            " USING " not in detail or " LIMIT " not in query.sql.upper()
+        )
+        if (full_scan or detail.startswith("USE TEMP B-TREE")) and detail not in query.allow:
+            problems.append(detail)
+    return problems
+
+
+def test_registered_queries_use_indexes(large_db):
+    """
+    Проверка: ни один запрос реестра не проходит таблицу целиком и не
+    сортирует во временном B-дереве на большой БД (кроме разрешённого в allow).
+    """
+    print("\n[TEST] Проверка планов запросов реестра")
+    conn = sqlite3.connect(large_db)
+    archive.attach(conn, archive.archive_path(large_db))  # ветки списка «включая архив»
+    problems = {name: plan_problems(conn, query) for name, query in queries.REGISTRY.items()}
+    assert {name: found for name, found in problems.items() if found} == {}
+
+    # Разрешение не должно пережить исправленный план
+    for name, query in queries.REGISTRY.items():
+        details = {row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + query.sql, query.params)}
+        assert set(query.allow) <= details, name
+
+
+def test_web_app_sql_in_registry():
+    """
+    Проверка: в web_app.py не осталось SQL в строках — все операторы
+    маршрутов берутся из queries.py и попадают под проверку планов.
+    """
+    print("\n[TEST] Проверка отсутствия SQL в маршрутах")
+    with open(os.path.join(PROJECT_ROOT, "web_app.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    inline = [
+        node.lineno for node in ast.walk(tree)
+        if isinstance(node, ast.Constant) and isinstance(node.value, str)
+        and node.value.lstrip().upper().startswith(SQL_KEYWORDS)
+    ]
+    assert inline == []
+
+    registered = {query.sql for query in queries.REGISTRY.values()}
+    for name in dir(queries):
+        if name.endswith("_SQL") and not name.endswith("REQUESTS_LIST_SQL"):
+            assert getattr(queries, name) in registered, name
+    assert sum(name.startswith("requests_list") for name in queries.REGISTRY) == 4 * len(queries.LIST_FILTERS)
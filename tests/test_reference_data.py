@@ -0,0 +1,74 @@
+import sqlite3
+
+from conftest import login_as
+from reference_data import ReferenceCache
+
+
+def trace_statements(conn):
+    """Список выполненных соединением запросов (через trace callback)."""
+    statements = []
+    conn.set_trace_callback(statements.append)
+    return statements
+
+
+def test_lists_are_cached_until_invalidated(db_copy):
+    """
+    Проверка: списки читаются из БД один раз, после invalidate() — заново.
+    """
+    print("\n[TEST] Проверка кэша справочников")
+    conn = sqlite3.connect(db_copy)
+    cache = ReferenceCache(db_copy)
+    statements = trace_statements(conn)
+
+    specialists = cache.specialists(conn)
+    assert specialists == tuple(conn.execute(
+        "SELECT user_id, fio, phone FROM users "
+        "WHERE user_type IN ('Специалист', 'Менеджер') AND is_active = 1 ORDER BY fio"
+    ).fetchall())
+    statements.clear()
+    assert cache.specialists(conn) is specialists
+    assert statements == []
+
+    with conn:
+        conn.execute(
+            "INSERT INTO users (fio, login, password, user_type) "
+            "VALUES ('Новый Специалист', 'new_master', 'x', 'Специалист')"
+        )
+    assert cache.specialists(conn) is specialists  # без сброса видна старая версия
+    cache.invalidate()
+    assert "Новый Специалист" in [row[1] for row in cache.specialists(conn)]
+    assert cache.stats()["version"] == 1
+
+
+def test_data_version_detects_other_connections(db_copy):
+    """
+    Проверка: с check_data_version кэш сбрасывается после записи другим соединением.
+    """
+    print("\n[TEST] Проверка сброса кэша по PRAGMA data_version")
+    reader = sqlite3.connect(db_copy)
+    writer = sqlite3.connect(db_copy)
+    cache = ReferenceCache(db_copy, check_data_version=True)
+    before = cache.specialists(reader)
+
+    with writer:
+        writer.execute("UPDATE users SET is_active = 0 WHERE user_id = ?", (before[0][0],))
+    after = cache.specialists(reader)
+    assert len(after) == len(before) - 1
+    assert cache.specialists(reader) is after
+
+
+def test_role_change_updates_specialist_list(app_client):
+    """
+    Проверка: пользователь, ставший специалистом, сразу виден в форме новой заявки.
+    """
+    print("\n[TEST] Проверка сброса кэша справочников после смены роли")
+    login_as(app_client, "login1", "pass1")
+    fio = "Овчинников Фёдор Никитич".encode("utf-8")
+    assert fio not in app_client.get("/requests/new").data
+
+    resp = app_client.post(
+        "/users/manage",
+        data={"user_id": "6", "user_type": "Специалист", "is_active": "1"},
+    )
+    assert resp.status_code == 200
+    assert fio in app_client.get("/requests/new").data
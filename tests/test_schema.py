@@ -0,0 +1,79 @@
+import sqlite3
+
+import schema
+from conftest import login_as
+from schema import apply_migrations
+
+REQUEST_VALUES = {
+    "start_date": "2025-03-10",
+    "climate_tech_type": "Кондиционер",
+    "climate_tech_model": "X",
+    "problem_description": "Течёт",
+    "request_status": "Новая заявка",
+    "client_id": 7,
+    "master_id": None,
+}
+
+
+def open_migrated(path):
+    conn = sqlite3.connect(path)
+    apply_migrations(conn)
+    return conn
+
+
+def stored(conn, request_id):
+    return conn.execute(
+        "SELECT request_number, due_at, created_at, updated_at FROM requests WHERE request_id = ?",
+        (request_id,),
+    ).fetchone()
+
+
+def test_single_statement_insert_matches_triggers(db_copy):
+    """
+    Проверка: INSERT из insert_request_sql сразу пишет тот же номер и срок,
+    что триггеры для обычного INSERT, и меняет на две строки заявок меньше;
+    UPDATE с updated_at не вызывает триггер, без него — вызывает.
+    """
+    print("\n[TEST] Проверка записи заявки одним оператором")
+    conn = open_migrated(db_copy)
+    columns = ", ".join(REQUEST_VALUES)
+    with conn:
+        before = conn.total_changes
+        legacy_id = conn.execute(
+            f"INSERT INTO requests ({columns}) VALUES ({', '.join(':' + c for c in REQUEST_VALUES)})",
+            REQUEST_VALUES,
+        ).lastrowid
+        legacy_changes = conn.total_changes - before
+
+        before = conn.total_changes
+        row = conn.execute(schema.insert_request_sql(tuple(REQUEST_VALUES)), REQUEST_VALUES).fetchall()[0]
+        single_changes = conn.total_changes - before
+
+    assert row[0] == legacy_id + 1
+    assert row[1:] == stored(conn, row[0])[:2]
+    legacy = stored(conn, legacy_id)
+    assert row[1] == legacy[0].replace(f"{legacy_id:04d}", f"{row[0]:04d}")
+    assert row[2] == legacy[1] and row[2].startswith("2025-03-17")  # Средний: 168 часов
+    assert single_changes == legacy_changes - 3  # номер, срок и токен QR-кода — в самом INSERT
+
+    with conn:
+        conn.execute("UPDATE requests SET updated_at = '2000-01-01 00:00:00' WHERE request_id = ?", (row[0],))
+    assert stored(conn, row[0])[3] == "2000-01-01 00:00:00"
+    with conn:
+        conn.execute("UPDATE requests SET problem_description = 'Шумит' WHERE request_id = ?", (row[0],))
+    assert stored(conn, row[0])[3] > "2000-01-01 00:00:00"  # обычный UPDATE — триггер проставил время
+
+
+def test_new_request_form_reads_number_back(app_client, db_copy):
+    """Проверка: форма новой заявки показывает номер, записанный самим INSERT."""
+    print("\n[TEST] Проверка номера новой заявки из RETURNING")
+    login_as(app_client, "login1", "pass1")
+    form = dict(REQUEST_VALUES, client_id="7")
+    del form["request_status"], form["master_id"]
+    page = app_client.post("/requests/new", data=form, follow_redirects=True).data.decode("utf-8")
+    conn = sqlite3.connect(db_copy)
+    request_id, number = conn.execute(
+        "SELECT request_id, request_number FROM requests ORDER BY request_id DESC LIMIT 1"
+    ).fetchone()
+    assert number.endswith(f"-{request_id:04d}")
+    assert f"ID: {request_id}, номер: {number}" in page
@@ -0,0 +1,94 @@
+import sqlite3
+
+from conftest import login_as
+from schema import apply_migrations
+from search import CANDIDATE_WINDOW, build_match_query, search_requests
+
+
+MANAGER = {"user_id": 1, "user_type": "Менеджер"}
+
+
+def open_migrated(path):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    apply_migrations(conn)
+    return conn
+
+
+def test_build_match_query_quotes_words():
+    """
+    Проверка: слова запроса экранируются и ищутся по префиксу.
+    """
+    print("\n[TEST] Проверка построения выражения MATCH")
+    assert build_match_query('пульт "R123') == '"пульт"* "R123"*'
+    assert build_match_query("  -- ") is None
+
+
+def test_search_finds_existing_and_updated_requests(db_copy):
+    """
+    Проверка: индекс построен по существующим заявкам и обновляется триггерами.
+    """
+    print("\n[TEST] Проверка поиска и синхронизации FTS-индекса")
+    conn = open_migrated(db_copy)
+
+    results = search_requests(conn, "пульт", MANAGER)
+    assert [r["request_id"] for r in results] == [1]
+    assert "<mark>пульт</mark>" in results[0]["snippet"]
+
+    with conn:
+        conn.execute(
+            "UPDATE requests SET problem_description = 'Течёт конденсат' WHERE request_id = 1"
+        )
+    assert search_requests(conn, "пульт", MANAGER) == []
+    assert [r["request_id"] for r in search_requests(conn, "конденс", MANAGER)] == [1]
+
+
+def test_search_scopes_client_and_hides_internal_comments(db_copy):
+    """
+    Проверка: заказчик находит только свои заявки и не видит внутренние комментарии.
+    """
+    print("\n[TEST] Проверка ограничений поиска для заказчика")
+    conn = open_migrated(db_copy)
+    with conn:
+        conn.executemany(
+            "INSERT INTO comments (request_id, user_id, message, is_internal) VALUES (?, ?, ?, ?)",
+            [(1, 3, "Заменить плату управления", 1), (1, 3, "Ждём плату от поставщика", 0)],
+        )
+
+    owner = {"user_id": 6, "user_type": "Заказчик"}
+    stranger = {"user_id": 7, "user_type": "Заказчик"}
+
+    assert [r["request_id"] for r in search_requests(conn, "пульт", owner)] == [1]
+    assert search_requests(conn, "пульт", stranger) == []
+    assert search_requests(conn, "управления", owner) == []
+    assert [r["source"] for r in search_requests(conn, "поставщика", owner)] == ["comment"]
+    assert [r["request_id"] for r in search_requests(conn, "управления", MANAGER)] == [1]
+
+
+def test_client_window_skips_other_clients_comments(db_copy):
+    """
+    Проверка: окно свежих совпадений заказчика считается только по его
+    комментариям — более новые совпадения в чужих заявках его не вытесняют.
+    """
+    print("\n[TEST] Проверка окна кандидатов поиска для заказчика")
+    conn = open_migrated(db_copy)
+    with conn:
+        conn.execute("INSERT INTO comments (request_id, user_id, message) VALUES (1, 6, 'фреон утечка')")
+        conn.executemany(
+            "INSERT INTO comments (request_id, user_id, message) VALUES (5, 2, 'Дозаправка фреон')",
+            [()] * (CANDIDATE_WINDOW + 100),
+        )
+
+    owner = {"user_id": 6, "user_type": "Заказчик"}
+    assert [r["request_id"] for r in search_requests(conn, "фреон", owner)] == [1]
+
+
+def test_api_search_endpoint(app_client):
+    """
+    Проверка: /api/search возвращает JSON с результатами поиска.
+    """
+    print("\n[TEST] Проверка /api/search")
+    login_as(app_client, "login1", "pass1")
+    data = app_client.get("/api/search?q=Xiaomi").get_json()
+    assert [r["request_id"] for r in data["results"]] == [3]
+    assert app_client.get("/search?q=Xiaomi").status_code == 200
@@ -0,0 +1,73 @@
+import sqlite3
+
+from schema import apply_migrations
+from stats_summary import find_differences, read_stats, rebuild
+
+
+def open_migrated(path):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    apply_migrations(conn)
+    return conn
+
+
+def direct_stats(conn):
+    """Статистика прежними запросами по всей таблице requests."""
+    finished = conn.execute(
+        "SELECT COUNT(*) FROM requests WHERE request_status = 'Завершена'"
+    ).fetchone()[0]
+    avg_days = conn.execute(
+        "SELECT AVG(JULIANDAY(completion_date) - JULIANDAY(start_date)) FROM requests "
+        "WHERE request_status = 'Завершена' AND completion_date IS NOT NULL"
+    ).fetchone()[0]
+    types = dict(conn.execute(
+        "SELECT climate_tech_type, COUNT(*) FROM requests GROUP BY climate_tech_type"
+    ).fetchall())
+    return finished, avg_days, types
+
+
+def assert_matches_full_scan(conn):
+    finished, avg_days, type_rows = read_stats(conn)
+    expected_finished, expected_avg, expected_types = direct_stats(conn)
+    assert finished == expected_finished
+    assert (avg_days is None) == (expected_avg is None)
+    if avg_days is not None:
+        assert abs(avg_days - expected_avg) < 1e-9
+    assert {r["climate_tech_type"]: r["cnt"] for r in type_rows} == expected_types
+    assert find_differences(conn) == []
+
+
+def test_summary_follows_inserts_updates_and_deletes(db_copy):
+    """
+    Проверка: сводная таблица совпадает с полным пересчётом после любых изменений заявок.
+    """
+    print("\n[TEST] Проверка поддержки stats_summary триггерами")
+    conn = open_migrated(db_copy)
+    assert_matches_full_scan(conn)
+
+    with conn:
+        conn.execute(
+            "INSERT INTO requests (start_date, climate_tech_type, climate_tech_model, "
+            "problem_description, client_id) VALUES ('2025-12-01', 'Вентиляция', 'VX-1', 'Шумит', 6)"
+        )
+        conn.execute(
+            "UPDATE requests SET request_status = 'Завершена', completion_date = '2025-12-25' "
+            "WHERE request_id = 1"
+        )
+        conn.execute("UPDATE requests SET climate_tech_type = 'Вентиляция' WHERE request_id = 3")
+        conn.execute("DELETE FROM requests WHERE request_id = 6")
+    assert_matches_full_scan(conn)
+
+
+def test_rebuild_repairs_drifted_summary(db_copy):
+    """
+    Проверка: rebuild находит и исправляет расхождения.
+    """
+    print("\n[TEST] Проверка пересчёта stats_summary")
+    conn = open_migrated(db_copy)
+    with conn:
+        conn.execute("UPDATE stats_summary SET request_count = request_count + 5")
+
+    assert find_differences(conn)
+    assert rebuild(conn)
+    assert_matches_full_scan(conn)
@@ -0,0 +1,82 @@
+import sqlite3
+
+import inventory
+import timeline
+from conftest import login_as
+from schema import apply_migrations
+
+
+def open_migrated(path):
+    conn = sqlite3.connect(path)
+    apply_migrations(conn)
+    return conn
+
+
+def add_events(conn):
+    """Комментарии (один внутренний), смена статуса и резерв детали по заявке 1."""
+    with conn:
+        conn.executemany(
+            "INSERT INTO comments (request_id, user_id, message, is_internal, created_at) "
+            "VALUES (1, ?, ?, ?, ?)",
+            [
+                (6, "Когда будет готово?", 0, "2025-12-20 10:00:00"),
+                (3, "Ждём компрессор от поставщика", 1, "2025-12-20 10:00:00"),
+                (3, "Компрессор заказан", 0, "2025-12-21 09:00:00"),
+            ],
+        )
+        conn.execute("UPDATE requests SET request_status = 'В процессе ремонта' WHERE request_id = 1")
+    inventory.reserve(conn, 1, [(2, 1)])
+
+
+def test_pages_merge_sources_in_order(db_copy):
+    """
+    Проверка: лента по страницам отдаёт все события заявки из всех
+    источников без повторов, от новых к старым; заказчик не видит
+    внутренние комментарии.
+    """
+    print("\n[TEST] Проверка ленты событий заявки")
+    conn = open_migrated(db_copy)
+    add_events(conn)
+
+    everything, _ = timeline.fetch_events(conn, 1, limit=100)
+    assert sorted(e["kind"] for e in everything) == [
+        "comment", "comment", "comment", "created", "part", "status", "status",
+    ]
+    keys = [(e["at"], e["rank"], e["item_id"]) for e in everything]
+    assert keys == sorted(keys, reverse=True)
+    assert everything[-1]["kind"] == "created"
+
+    paged, cursor = [], None
+    while True:
+        page, cursor = timeline.fetch_events(conn, 1, cursor=timeline.decode_cursor(cursor), limit=2)
+        paged += page
+        if cursor is None:
+            break
+    assert paged == everything
+
+    public, _ = timeline.fetch_events(conn, 1, include_internal=False, limit=100)
+    assert len(public) == len(everything) - 1
+    assert all(not e["is_internal"] for e in public)
+
+
+def test_timeline_routes_respect_access(app_client, db_copy):
+    """
+    Проверка: заказчик видит историю только своих заявок и без
+    внутренних комментариев; JSON-API листается курсором.
+    """
+    print("\n[TEST] Проверка страницы и API истории заявки")
+    add_events(open_migrated(db_copy))
+
+    login_as(app_client, "login6", "pass6")
+    page = app_client.get("/requests/1/timeline").data.decode("utf-8")
+    assert "Компрессор заказан" in page
+    assert "Ждём компрессор" not in page
+    assert app_client.get("/requests/5/timeline").status_code == 302
+    assert app_client.get("/api/requests/5/timeline").status_code == 403
+
+    login_as(app_client, "login1", "pass1")
+    data = app_client.get("/api/requests/1/timeline?limit=4").get_json()
+    assert len(data["events"]) == 4
+    rest = app_client.get(f"/api/requests/1/timeline?cursor={data['next_cursor']}").get_json()
+    assert rest["next_cursor"] is None
+    assert len(data["events"]) + len(rest["events"]) == 7
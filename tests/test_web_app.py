@@ -1,4 +1,5 @@
 import os
+import shutil
 import sys
 
 import pytest
@@ -13,16 +14,21 @@ from web_app import app, DB_NAME
 
 
 @pytest.fixture(scope="module")
-def test_client():
+def test_client(tmp_path_factory):
     """
     Тестовый клиент Flask.
     Предполагается, что файл БД climate_repair.db уже существует
     и заполнен начальными данными с помощью test.py.
+    Тесты работают с копией БД, чтобы не менять исходный файл.
     """
     # убедимся, что БД существует перед запуском тестов
     assert os.path.exists(DB_NAME), f"База данных {DB_NAME} не найдена, сначала запустите test.py"
 
+    db_copy = tmp_path_factory.mktemp("db") / "climate_repair.db"
+    shutil.copyfile(DB_NAME, db_copy)
+
     app.config["TESTING"] = True
+    app.config["DATABASE"] = str(db_copy)
     with app.test_client() as client:
         yield client
 
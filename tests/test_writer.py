@@ -0,0 +1,109 @@
+import sqlite3
+import threading
+
+import pytest
+
+from conftest import login_as
+from writer import WriteQueue
+
+
+def insert_user(conn, login):
+    return conn.execute(
+        "INSERT INTO users (fio, login, password, user_type) VALUES (?, ?, 'p', 'Заказчик')",
+        (f"Пользователь {login}", login),
+    ).lastrowid
+
+
+def test_group_commit_isolates_failed_operations(db_copy):
+    """
+    Проверка: операции из многих потоков фиксируются пачками, ошибка одной
+    операции откатывает только её и возвращается вызывающему.
+    """
+    print("\n[TEST] Проверка очереди записи с групповой фиксацией")
+    queue = WriteQueue(db_copy, max_delay=0.01)
+    results, errors = {}, []
+    barrier = threading.Barrier(16)
+
+    def worker(number):
+        barrier.wait()
+        try:
+            # Нечётные потоки пишут уже занятый логин
+            login = "login1" if number % 2 else f"writer_{number}"
+            results[number] = queue.execute(insert_user, login)
+        except sqlite3.IntegrityError:
+            errors.append(number)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = queue.stats()
+    queue.stop()
+
+    assert sorted(errors) == list(range(1, 16, 2))
+    conn = sqlite3.connect(db_copy)
+    stored = dict(conn.execute("SELECT user_id, login FROM users WHERE login LIKE 'writer_%'").fetchall())
+    assert stored == {user_id: f"writer_{n}" for n, user_id in results.items()}
+    assert stats["operations"] == 16 and stats["failed"] == 8
+    assert stats["batches"] < 16  # операции действительно объединялись
+
+    with pytest.raises(ZeroDivisionError):
+        queue.execute(lambda conn: 1 / 0)
+    # После остановки очередь снова запускается первой операцией
+    assert queue.execute(lambda conn: conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]) == (
+        conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+    )
+    queue.stop()
+
+
+def test_forms_write_through_queue(app_client, db_copy):
+    """Проверка: регистрация и формы заявок пишут через очередь записи."""
+    print("\n[TEST] Проверка записи форм через очередь")
+    form = {"fio": "Новый Заказчик", "login": "queue_user", "password": "p", "password_confirm": "p"}
+    assert app_client.post("/register", data=form).status_code == 302
+    page = app_client.post("/register", data=form).data.decode("utf-8")
+    assert "Логин уже используется" in page
+
+    login_as(app_client, "login1", "pass1")
+    response = app_client.post("/users/manage", data={"user_id": "6", "user_type": "Заказчик", "is_active": "1"},
+                               follow_redirects=True)
+    assert "изменена на" in response.data.decode("utf-8")
+    stats = app_client.get("/db/stats").get_json()["write_queue"]
+    assert stats["operations"] == 3 and stats["failed"] == 1
+
+
+def test_new_request_and_client_write_only_through_queue(app_client, db_copy, monkeypatch):
+    """
+    Проверка: новая заявка с автоназначением и новый заказчик записываются
+    операциями очереди — соединение запроса в БД не пишет.
+    """
+    print("\n[TEST] Проверка записи новой заявки и заказчика только через очередь")
+    import web_app
+
+    login_as(app_client, "login1", "pass1")
+    request_connection = web_app.get_connection
+
+    def read_only_connection():
+        conn = request_connection()
+        conn.execute("PRAGMA query_only = 1")
+        return conn
+
+    monkeypatch.setattr(web_app, "get_connection", read_only_connection)
+
+    form = {"fio": "Новый Заказчик", "phone": "89990000000", "login": "queue_client", "password": "p"}
+    assert app_client.post("/clients/new", data=form).status_code == 302
+    assert "Логин уже используется" in app_client.post("/clients/new", data=form).data.decode("utf-8")
+
+    request_form = {
+        "client_id": "6", "start_date": "2025-12-01", "climate_tech_type": "Увлажнитель воздуха",
+        "climate_tech_model": "H", "problem_description": "Не увлажняет",
+    }
+    page = app_client.post("/requests/new", data=request_form, follow_redirects=True).data.decode("utf-8")
+    assert "Мастер назначен автоматически" in page
+    monkeypatch.undo()
+
+    conn = sqlite3.connect(db_copy)
+    assert conn.execute("SELECT master_id FROM requests ORDER BY request_id DESC").fetchone()[0] == 10
+    stats = app_client.get("/db/stats").get_json()["write_queue"]
+    assert stats["operations"] == 3 and stats["failed"] == 1
@@ -0,0 +1,150 @@
+"""
+Лента событий заявки: смены статуса, комментарии и детали одним запросом.
+
+События собираются запросом UNION ALL из четырёх веток: создание заявки
+(requests), request_history, comments и request_parts. Лента идёт от
+новых событий к старым и листается курсором — тройкой (время, вид, id)
+последнего показанного события, как список заявок в pagination.py.
+
+Каждая ветка читает свой индекс по (request_id, время) с условием курсора
+и LIMIT, поэтому страница стоит одинаково и для заявки с пятью событиями,
+и для заявки с десятками тысяч. Индексы создаёт миграция timeline_indexes
+(schema.py): для истории и деталей они покрывающие, для комментариев
+индекс отбирает строки (с учётом is_internal), а текст читается из
+таблицы только для строк страницы.
+"""
+import base64
+import binascii
+
+PAGE_SIZE = 30
+MAX_PAGE_SIZE = 200
+
+# Вид события -> ранг: при равном времени события упорядочиваются по рангу
+RANKS = {"created": 0, "status": 1, "part": 2, "comment": 3}
+
+EVENT_COLUMNS = (
+    "kind", "rank", "item_id", "at", "user_id", "user_fio", "title", "detail", "is_internal",
+)
+
+# Ветки запроса; {cond} — условие курсора для ветки, время всегда в столбце at
+_BRANCH_SQL = {
+    "created": """
+        SELECT 'created' AS kind, 0 AS rank, r.request_id AS item_id, r.created_at AS at,
+               r.client_id AS user_id, 'Заявка создана' AS title,
+               r.climate_tech_type || ' / ' || r.climate_tech_model AS detail,
+               0 AS is_internal
+        FROM requests r
+        WHERE r.request_id = :request_id {cond}
+    """,
+    "status": """
+        SELECT 'status', 1, h.history_id, h.changed_at,
+               h.changed_by, COALESCE(h.old_status, '—') || ' → ' || h.new_status,
+               h.change_reason, 0
+        FROM request_history h
+        WHERE h.request_id = :request_id {cond}
+        ORDER BY h.changed_at DESC, h.history_id DESC
+        LIMIT :limit
+    """,
+    "part": """
+        SELECT 'part', 2, rp.request_part_id, rp.changed_at,
+               NULL, p.part_name || ' (' || p.part_code || ')',
+               rp.status || ': ' || rp.quantity_used || ' из ' || rp.quantity_needed, 0
+        FROM request_parts rp
+        JOIN spare_parts p ON p.part_id = rp.part_id
+        WHERE rp.request_id = :request_id {cond}
+        ORDER BY rp.changed_at DESC, rp.request_part_id DESC
+        LIMIT :limit
+    """,
+    "comment": """
+        SELECT 'comment', 3, c.comment_id, c.created_at,
+               c.user_id, 'Комментарий', c.message, c.is_internal
+        FROM comments c
+        WHERE c.request_id = :request_id {internal} {cond}
+        ORDER BY c.created_at DESC, c.comment_id DESC
+        LIMIT :limit
+    """,
+}
+
+# Столбцы времени и id каждой ветки для условия курсора
+_KEYS = {
+    "created": ("r.created_at", "r.request_id"),
+    "status": ("h.changed_at", "h.history_id"),
+    "part": ("rp.changed_at", "rp.request_part_id"),
+    "comment": ("c.created_at", "c.comment_id"),
+}
+
+
+def encode_cursor(at, rank, item_id):
+    raw = f"{at}|{rank}|{item_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(value):
+    """Возвращает (время, ранг, id) или None для пустого/битого курсора."""
+    if not value:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(value.encode("ascii")).decode("utf-8")
+        at, rank, item_id = raw.rsplit("|", 2)
+        return at, int(rank), int(item_id)
+    except (ValueError, binascii.Error, UnicodeError):
+        return None
+
+
+def page_size(value):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def _cursor_condition(kind, cursor):
+    """
+    Условие «после курсора» для одной ветки. Порядок ленты —
+    (время, ранг, id) по убыванию; ранг у ветки постоянный, поэтому
+    условие сводится к сравнению по её индексу (время, id).
+    """
+    if cursor is None:
+        return ""
+    at_column, id_column = _KEYS[kind]
+    rank = RANKS[kind]
+    if rank < cursor[1]:
+        return f"AND {at_column} <= :at"
+    if rank > cursor[1]:
+        return f"AND {at_column} < :at"
+    return f"AND ({at_column}, {id_column}) < (:at, :item_id)"
+
+
+def fetch_events(conn, request_id, include_internal=True, cursor=None, limit=PAGE_SIZE):
+    """
+    Одна страница событий заявки от новых к старым.
+    include_internal=False скрывает внутренние комментарии (для заказчика).
+    Возвращает (events, next_cursor); next_cursor = None на последней странице.
+    """
+    branches = []
+    for kind, sql in _BRANCH_SQL.items():
+        internal = "" if include_internal else "AND c.is_internal = 0"
+        branch = sql.format(cond=_cursor_condition(kind, cursor), internal=internal)
+        branches.append(f"SELECT * FROM ({branch})")
+    params = {"request_id": request_id, "limit": limit + 1}
+    if cursor is not None:
+        params["at"], _, params["item_id"] = cursor
+
+    rows = conn.execute(
+        f"""
+        SELECT e.kind, e.rank, e.item_id, e.at, e.user_id, u.fio, e.title, e.detail, e.is_internal
+        FROM ({" UNION ALL ".join(branches)}) AS e
+        LEFT JOIN users u ON u.user_id = e.user_id
+        ORDER BY e.at DESC, e.rank DESC, e.item_id DESC
+        LIMIT :limit
+        """,
+        params,
+    ).fetchall()
+
+    events = [dict(zip(EVENT_COLUMNS, row)) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = events[-1]
+        next_cursor = encode_cursor(last["at"], last["rank"], last["item_id"])
+    return events, next_cursor
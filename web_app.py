@@ -1,5 +1,7 @@
-import os
+import atexit
 import io
+import json
+import os
 import sqlite3
 from datetime import datetime
 
@@ -10,35 +12,110 @@ from flask import (
     redirect,
     url_for,
     session,
-    send_file,
     abort,
     flash,
+    jsonify,
+    Response,
+    send_file,
+    stream_with_context,
 )
-import qrcode
-
 
-DB_NAME = "climate_repair.db"
+import analytics
+import archive
+import assignment
+import client_lookup
+import comments
+import db
+import deadlines
+import export
+import inventory
+import live_feed
+import metrics
+import notifications
+import pagination
+import qr_codes
+import qr_labels
+import queries
+import reference_data
+import search
+import stats_summary
+import timeline
+import writer
+from permissions import FULL_ACCESS_ROLES, NO_RIGHTS, request_rights, rights_for_rows
+
+DB_NAME = db.DEFAULT_DB_NAME
 
 # Ссылка на Google‑форму из ТЗ
-FEEDBACK_FORM_URL = (
-    "https://docs.google.com/forms/d/e/"
-    "1FAIpQLSdhZcExx6LSIXxk0ub55mSu-WIh23WYdGG9HY5EZhLDo7P8eA/viewform?usp=sf_link"
-)
+FEEDBACK_FORM_URL = qr_codes.FEEDBACK_FORM_URL
+
+# Сколько секунд браузер может не перепроверять QR-код заявки
+QR_CACHE_MAX_AGE = 24 * 60 * 60
 
 
 def get_connection():
-    if not os.path.exists(DB_NAME):
-        raise FileNotFoundError(
-            f"Файл базы данных '{DB_NAME}' не найден. "
-            f"Сначала запустите 'test.py' для создания БД."
-        )
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Соединение из пула, общее для всего запроса (см. db.py)."""
+    return db.get_db()
 
 
 app = Flask(__name__)
 app.secret_key = "very-secret-key-for-demo"  # для сессий; в реальном проекте вынести в переменные окружения
+app.config["DATABASE"] = DB_NAME
+app.config["QR_CACHE_DIR"] = os.path.join(app.root_path, "qr_cache")
+app.config["QR_CACHE_SIZE"] = 256
+# Поле Google-формы отзыва для токена заявки, например "entry.1234567890"
+# (см. qr_codes.feedback_url); None — QR-код ведёт на форму без токена
+app.config["FEEDBACK_FORM_ENTRY"] = None
+# Процессов отрисовки листов наклеек (qr_labels.py); None — по числу ядер
+app.config["QR_LABEL_WORKERS"] = None
+# Сбрасывать кэш справочников при записи в БД из других процессов
+app.config["REFERENCE_CACHE_DATA_VERSION"] = False
+# Фоновая доставка уведомлений (notifications.py); в режиме TESTING не запускается
+app.config["NOTIFICATIONS_DISPATCHER"] = True
+app.config["NOTIFICATION_SMTP"] = None          # например, ("localhost", 1025)
+app.config["NOTIFICATION_WEBHOOK_URL"] = None
+# Отдавать /api/notifications из ленты в памяти, а не из БД — только когда
+# сервер работает одним процессом и диспетчер живёт в нём же
+app.config["NOTIFICATION_FEED_IN_MEMORY"] = False
+# Живая лента списка заявок (live_feed.py): период опроса БД и пинга соединения, с
+app.config["LIVE_FEED_POLL_INTERVAL"] = live_feed.POLL_INTERVAL
+app.config["LIVE_FEED_KEEPALIVE"] = live_feed.KEEPALIVE
+# Подключений к живой ленте на процесс: каждое держит поток сервера
+app.config["LIVE_FEED_MAX_SUBSCRIBERS"] = live_feed.MAX_SUBSCRIBERS
+# Назначать мастера на новую заявку без мастера автоматически (assignment.py)
+app.config["AUTO_ASSIGN"] = True
+# Эскалация просроченных заявок (deadlines.py): период, с; в режиме TESTING не запускается
+app.config["DEADLINE_ESCALATION"] = True
+app.config["DEADLINE_ESCALATION_INTERVAL"] = deadlines.ESCALATION_INTERVAL
+# Фоновое дозаполнение сводок /api/stats (analytics.py); в режиме TESTING не запускается
+app.config["ANALYTICS_REFRESH"] = True
+app.config["ANALYTICS_REFRESH_INTERVAL"] = analytics.REFRESH_INTERVAL
+# Запись из форм через общую очередь с групповой фиксацией (writer.py);
+# False — каждая запись в своей транзакции на соединении запроса
+app.config["WRITE_QUEUE"] = True
+# Счётчики SQL текущего запроса в заголовке ответа X-Debug-SQL (metrics.py)
+app.config["METRICS_DEBUG_HEADER"] = False
+# Токен для /metrics без входа в систему (Authorization: Bearer ...); None — только менеджер
+app.config["METRICS_TOKEN"] = None
+# Архив закрытых заявок (archive.py); None — файл *_archive.db рядом с DATABASE
+app.config["ARCHIVE_DATABASE"] = None
+db.init_app(app)
+# Архив подключается к соединению раньше счётчиков metrics: ATTACH не считается в запрос
+archive.init_app(app)
+metrics.init_app(app)
+
+# Статусы заявок
+REQUEST_STATUSES = ['Новая заявка', 'В процессе ремонта', 'Ожидание комплектующих',
+                    'Готова к выдаче', 'Завершена', 'Отменена']
+
+# Цветные бейджи статусов
+STATUS_CLASSES = {
+    'Новая заявка': 'bg-secondary',
+    'В процессе ремонта': 'bg-warning text-dark',
+    'Ожидание комплектующих': 'bg-warning text-dark',
+    'Готова к выдаче': 'bg-primary',
+    'Завершена': 'bg-success',
+    'Отменена': 'bg-danger',
+}
 
 
 # =====================  ШАБЛОНЫ  =====================
@@ -47,6 +124,157 @@ app.secret_key = "very-secret-key-for-demo"  # для сессий; в реал
 
 # =====================  ВСПОМОГАТЕЛЬНОЕ  =====================
 
+def get_qr_cache():
+    """Кэш PNG с QR-кодами (один на приложение)."""
+    cache = app.extensions.get("qr_cache")
+    if cache is None or cache.directory != app.config.get("QR_CACHE_DIR"):
+        cache = qr_codes.QRCache(app.config.get("QR_CACHE_DIR"), app.config.get("QR_CACHE_SIZE", 256))
+        app.extensions["qr_cache"] = cache
+    return cache
+
+
+def get_label_pool():
+    """
+    Пул процессов отрисовки наклеек (qr_labels.make_pool), один на процесс
+    приложения; создаётся при первой большой партии, закрывается при выходе.
+    """
+    pool = app.extensions.get("label_pool")
+    if pool is None:
+        pool = qr_labels.make_pool(app.config.get("QR_LABEL_WORKERS"))
+        atexit.register(pool.shutdown, cancel_futures=True)
+        app.extensions["label_pool"] = pool
+    return pool
+
+
+def get_reference_cache():
+    """Кэш списка специалистов для текущей БД (см. reference_data.py)."""
+    cache = app.extensions.get("reference_cache")
+    if cache is None or cache.path != app.config["DATABASE"]:
+        cache = reference_data.ReferenceCache(
+            app.config["DATABASE"], app.config.get("REFERENCE_CACHE_DATA_VERSION", False)
+        )
+        app.extensions["reference_cache"] = cache
+    return cache
+
+
+def get_notification_feed():
+    """Лента уведомлений в памяти процесса (наполняется диспетчером)."""
+    return app.extensions.setdefault("notification_feed", notifications.InAppFeed())
+
+
+def get_dispatcher():
+    """Диспетчер уведомлений для текущей БД; поток запускается при первом запросе."""
+    dispatcher = app.extensions.get("notification_dispatcher")
+    if dispatcher is None or dispatcher.db_path != app.config["DATABASE"]:
+        if dispatcher is not None:
+            dispatcher.stop()
+        sinks = []
+        if app.config.get("NOTIFICATION_FEED_IN_MEMORY"):
+            sinks.append(get_notification_feed())
+        if app.config.get("NOTIFICATION_SMTP"):
+            host, port = app.config["NOTIFICATION_SMTP"]
+            sinks.append(notifications.EmailSink(host, port))
+        if app.config.get("NOTIFICATION_WEBHOOK_URL"):
+            sinks.append(notifications.WebhookSink(app.config["NOTIFICATION_WEBHOOK_URL"]))
+        dispatcher = notifications.Dispatcher(app.config["DATABASE"], sinks)
+        app.extensions["notification_dispatcher"] = dispatcher
+    return dispatcher
+
+
+def get_request_watcher():
+    """Общий поток живой ленты заявок для текущей БД; запускается первым подписчиком."""
+    watcher = app.extensions.get("request_watcher")
+    if watcher is None or watcher.db_path != app.config["DATABASE"]:
+        if watcher is not None:
+            watcher.stop()
+        watcher = live_feed.RequestWatcher(
+            app.config["DATABASE"],
+            app.config.get("LIVE_FEED_POLL_INTERVAL", live_feed.POLL_INTERVAL),
+            app.config.get("LIVE_FEED_MAX_SUBSCRIBERS", live_feed.MAX_SUBSCRIBERS),
+        )
+        app.extensions["request_watcher"] = watcher
+    return watcher
+
+
+def get_assignment_engine():
+    """Автоназначение мастеров со счётчиками нагрузки для текущей БД."""
+    engine = app.extensions.get("assignment_engine")
+    if engine is None or engine.db_path != app.config["DATABASE"]:
+        engine = assignment.AssignmentEngine(app.config["DATABASE"])
+        app.extensions["assignment_engine"] = engine
+    return engine
+
+
+def get_escalator():
+    """Поток эскалации просроченных заявок для текущей БД."""
+    escalator = app.extensions.get("deadline_escalator")
+    if escalator is None or escalator.db_path != app.config["DATABASE"]:
+        if escalator is not None:
+            escalator.stop()
+        escalator = deadlines.Escalator(
+            app.config["DATABASE"],
+            app.config.get("DEADLINE_ESCALATION_INTERVAL", deadlines.ESCALATION_INTERVAL),
+            on_escalated=lambda: get_dispatcher().wake(),
+        )
+        app.extensions["deadline_escalator"] = escalator
+    return escalator
+
+
+def get_analytics_refresher():
+    """Поток дозаполнения сводок аналитики для текущей БД."""
+    refresher = app.extensions.get("analytics_refresher")
+    if refresher is None or refresher.db_path != app.config["DATABASE"]:
+        if refresher is not None:
+            refresher.stop()
+        refresher = analytics.Refresher(
+            app.config["DATABASE"],
+            app.config.get("ANALYTICS_REFRESH_INTERVAL", analytics.REFRESH_INTERVAL),
+        )
+        app.extensions["analytics_refresher"] = refresher
+    return refresher
+
+
+def get_write_queue():
+    """Очередь записи для текущей БД; поток-писатель запускается первой операцией."""
+    queue = app.extensions.get("write_queue")
+    if queue is None or queue.db_path != app.config["DATABASE"]:
+        if queue is not None:
+            queue.stop()
+        queue = writer.WriteQueue(app.config["DATABASE"], on_connect=app.extensions["db_on_connect"])
+        app.extensions["write_queue"] = queue
+    return queue
+
+
+def run_write(operation, *args):
+    """
+    Выполняет operation(conn, *args) в транзакции записи и возвращает её
+    результат: через очередь записи или, если она выключена, на соединении
+    запроса. Операция не фиксирует транзакцию сама.
+    """
+    if app.config.get("WRITE_QUEUE"):
+        # Работа писателя учитывается в метриках этого запроса
+        return get_write_queue().execute(metrics.bound(operation, metrics.current()), *args)
+    conn = get_connection()
+    with conn:
+        return operation(conn, *args)
+
+
+@app.before_request
+def start_notification_dispatcher():
+    if app.config.get("NOTIFICATIONS_DISPATCHER") and not app.testing:
+        dispatcher = get_dispatcher()
+        if not dispatcher.running:
+            dispatcher.start()
+    if app.config.get("DEADLINE_ESCALATION") and not app.testing:
+        escalator = get_escalator()
+        if not escalator.running:
+            escalator.start()
+    if app.config.get("ANALYTICS_REFRESH") and not app.testing:
+        refresher = get_analytics_refresher()
+        if not refresher.running:
+            refresher.start()
+
+
 def login_required(view_func):
     def wrapper(*args, **kwargs):
         if "user" not in session:
@@ -83,52 +311,60 @@ def admin_required(view_func):
     return wrapper
 
 
+def list_row(r, can_edit, show_internal=True, archived=False):
+    """
+    Строка списка заявок для шаблона _request_row.html.
+    show_internal=False — счётчик только видимых заказчику комментариев.
+    archived — заявка из архива (archive.py): только просмотр.
+    """
+    comment_count, last_comment_at = comments.counters(r, show_internal)
+    return {
+        'request_id': r['request_id'],
+        'request_number': r['request_number'],
+        'start_date': r['start_date'],
+        'climate_tech_type': r['climate_tech_type'],
+        'climate_tech_model': r['climate_tech_model'],
+        'problem_description': r['problem_description'],
+        'client_fio': r['client_fio'],
+        'request_status': r['request_status'],
+        'master_fio': r['master_fio'],
+        'master_phone': r['master_phone'],
+        'status_class': STATUS_CLASSES.get(r['request_status'], 'bg-info'),
+        'comment_count': comment_count,
+        'last_comment_at': last_comment_at,
+        'can_edit': can_edit and not archived,
+        'archived': archived,
+    }
+
+
 def can_edit_request(request_id, user):
     """
     Проверка прав на редактирование заявки
     Возвращает (может_редактировать, может_менять_статус, может_менять_всё)
     """
-    user_type = user.get("user_type")
-    user_id = user.get("user_id")
-    
     # Администратор, менеджер и менеджер по качеству могут всё
-    if user_type in ("Администратор", "Менеджер", "Менеджер по качеству"):
+    if user.get("user_type") in FULL_ACCESS_ROLES:
         return (True, True, True)  # Может всё
-    
+
     try:
         conn = get_connection()
         with conn:
             cur = conn.cursor()
-            cur.execute(
-                "SELECT client_id, master_id FROM requests WHERE request_id = ?",
-                (request_id,)
-            )
+            cur.execute(queries.REQUEST_OWNERS_SQL, (request_id,))
             row = cur.fetchone()
-            if not row:
-                return (False, False, False)
-            
-            client_id = row["client_id"]
-            master_id = row["master_id"]
     except:
-        return (False, False, False)
-    
-    if user_type == "Заказчик":
-        # Заказчик может редактировать только свои заявки (дату и проблему)
-        if client_id == user_id:
-            return (True, False, False)
-        return (False, False, False)
-    
-    if user_type == "Специалист":
-        # Специалист может менять статус и добавлять комментарии к назначенным заявкам
-        if master_id == user_id:
-            return (True, True, False)
-        return (False, False, False)
-    
-    if user_type == "Оператор":
-        # Оператор может редактировать базовые данные и менять статус
-        return (True, True, False)
-    
-    return (False, False, False)
+        return NO_RIGHTS
+
+    if not row:
+        return NO_RIGHTS
+    return request_rights(user, row["client_id"], row["master_id"])
+
+
+def can_view_request(request_id, user):
+    """Заказчик видит только свои заявки, сотрудники — все (как в списке заявок)."""
+    if user.get("user_type") != "Заказчик":
+        return True
+    return can_edit_request(request_id, user)[0]
 
 
 # =====================  МАРШРУТЫ  =====================
@@ -155,14 +391,7 @@ def login():
 
             with conn:
                 cur = conn.cursor()
-                cur.execute(
-                    """
-                    SELECT user_id, fio, user_type, is_active
-                    FROM users
-                    WHERE login = ? AND password = ?
-                    """,
-                    (login_value, password),
-                )
+                cur.execute(queries.LOGIN_SQL, (login_value, password))
                 row = cur.fetchone()
 
             if row is None:
@@ -238,26 +467,20 @@ def register():
             flash("Пароли не совпадают.", "warning")
         else:
             try:
-                conn = get_connection()
+                get_connection()
             except FileNotFoundError as exc:
                 flash(str(exc), "danger")
                 return redirect(url_for("register"))
 
-            with conn:
-                cur = conn.cursor()
-                try:
-                    cur.execute(
-                        """
-                        INSERT INTO users (fio, phone, login, password, user_type)
-                        VALUES (?, ?, ?, ?, 'Заказчик')
-                        """,
-                        (fio, phone if phone else None, login_value, password),
-                    )
-                    conn.commit()
-                    flash("Регистрация успешна! Теперь вы можете войти в систему.", "success")
-                    return redirect(url_for("login"))
-                except sqlite3.IntegrityError:
-                    flash("Логин уже используется. Выберите другой логин.", "danger")
+            try:
+                run_write(lambda conn: conn.execute(
+                    queries.INSERT_CLIENT_SQL, (fio, phone if phone else None, login_value, password)
+                ).lastrowid)
+            except sqlite3.IntegrityError:
+                flash("Логин уже используется. Выберите другой логин.", "danger")
+            else:
+                flash("Регистрация успешна! Теперь вы можете войти в систему.", "success")
+                return redirect(url_for("login"))
 
     return render_template("register.html", current_user=session.get("user"))
 
@@ -281,72 +504,284 @@ def requests_list():
             "requests_list.html",
             current_user=current_user,
             requests=[],
+            is_first_page=True,
         )
 
-    # Базовый запрос списка заявок
-    base_query = """
-        SELECT
-            r.request_id,
-            r.request_number,
-            r.start_date,
-            r.climate_tech_type,
-            r.climate_tech_model,
-            r.problem_description,
-            r.request_status,
-            r.master_id,
-            u.fio AS client_fio,
-            m.fio AS master_fio,
-            m.phone AS master_phone
-        FROM requests r
-        LEFT JOIN users u ON r.client_id = u.user_id
-        LEFT JOIN users m ON r.master_id = m.user_id
-    """
-
-    params = ()
+    filters, errors = pagination.parse_filters(request.args)
+    for message in errors:
+        flash(message, "warning")
     # Заказчик видит только свои заявки
     if current_user.get("user_type") == "Заказчик":
-        base_query += " WHERE r.client_id = ?"
-        params = (current_user.get("user_id"),)
+        filters["client_id"] = current_user.get("user_id")
 
-    base_query += " ORDER BY r.start_date DESC, r.request_id DESC"
+    cursor = pagination.decode_cursor(request.args.get("cursor"))
+    limit = pagination.page_size(request.args.get("per_page"))
+
+    # Архив (archive.py) читается, только если его попросили фильтром
+    archive_sql = None
+    if filters.get(pagination.HISTORY_FILTER) and archive.is_attached(conn):
+        archive_sql = queries.ARCHIVE_REQUESTS_LIST_SQL
 
     with conn:
-        cur = conn.cursor()
-        cur.execute(base_query, params)
-        rows = cur.fetchall()
-    
-    # Цветные бейджи статусов
-    status_classes = {
-        'Новая заявка': 'bg-secondary',
-        'В процессе ремонта': 'bg-warning text-dark',
-        'Ожидание комплектующих': 'bg-warning text-dark',
-        'Готова к выдаче': 'bg-primary',
-        'Завершена': 'bg-success',
-        'Отменена': 'bg-danger',
-    }
-    
+        rows, next_cursor = pagination.fetch_page(
+            conn, queries.REQUESTS_LIST_SQL, filters, cursor, limit, archive_sql
+        )
+
+        specialists = []
+        if current_user.get("user_type") != "Заказчик":
+            specialists = get_reference_cache().specialists(conn)
+
+    # Права считаем по уже загруженным строкам, без запроса на каждую заявку
+    rights = rights_for_rows(rows, current_user)
+
     # Формируем список заявок с дополнительной информацией
-    requests_list = []
-    for r in rows:
-        can_edit, can_status, can_all = can_edit_request(r['request_id'], current_user)
-        requests_list.append({
-            'request_id': r['request_id'],
-            'request_number': r['request_number'],
-            'start_date': r['start_date'],
-            'climate_tech_type': r['climate_tech_type'],
-            'climate_tech_model': r['climate_tech_model'],
-            'problem_description': r['problem_description'],
-            'client_fio': r['client_fio'],
-            'request_status': r['request_status'],
-            'master_fio': r['master_fio'],
-            'master_phone': r['master_phone'],
-            'status_class': status_classes.get(r['request_status'], 'bg-info'),
-            'can_edit': can_edit
-        })
+    show_internal = current_user.get("user_type") != "Заказчик"
+    requests_list = [
+        list_row(r, rights[r['request_id']][0], show_internal, archived=bool(r['archived'])) for r in rows
+    ]
     
+    # Параметры фильтра для ссылок на следующую страницу
+    filter_args = {k: v for k, v in request.args.items() if k in pagination.EQUALITY_FILTERS
+                   or k in pagination.DATE_FILTERS or k in ("per_page", pagination.HISTORY_FILTER)}
+
     return render_template("requests_list.html", 
                             current_user=current_user,
-                            requests=requests_list)
+                            requests=requests_list,
+                            filters=filters,
+                            filter_args=filter_args,
+                            next_cursor=next_cursor,
+                            is_first_page=cursor is None,
+                            statuses=REQUEST_STATUSES,
+                            specialists=specialists)
+
+
+@app.route("/requests/stream")
+@login_required
+def requests_stream():
+    """
+    Server-Sent Events со строками изменённых заявок для страницы списка.
+    Фильтры — те же параметры, что у /requests; заказчик получает только
+    свои заявки. Все подключения читают один общий поток (live_feed.py),
+    сами они к БД не обращаются. Сверх LIVE_FEED_MAX_SUBSCRIBERS
+    подключений — 503 с Retry-After: страница обходится без живой ленты.
+    """
+    current_user = session.get("user", {})
+    filters, _ = pagination.parse_filters(request.args)
+    if current_user.get("user_type") == "Заказчик":
+        filters["client_id"] = current_user.get("user_id")
+
+    show_internal = current_user.get("user_type") != "Заказчик"
+    watcher = get_request_watcher()
+    try:
+        subscription = watcher.subscribe(request.headers.get("Last-Event-ID"))
+    except live_feed.TooManySubscribers:
+        return Response(
+            "Слишком много подключений к живой ленте",
+            status=503,
+            mimetype="text/plain",
+            headers={"Retry-After": str(live_feed.RETRY_AFTER)},
+        )
+    keepalive = app.config.get("LIVE_FEED_KEEPALIVE", live_feed.KEEPALIVE)
+
+    def generate():
+        try:
+            yield f"retry: {int(keepalive * 1000)}\n\n"
+            for event in subscription.events(keepalive):
+                if event is None:
+                    yield ": ping\n\n"
+                    continue
+                action = live_feed.scope(event, filters)
+                if action is None:
+                    continue
+                data = {"action": action, "kind": event["kind"], "request_id": event["request_id"]}
+                if action == "upsert":
+                    row = event["row"]
+                    can_edit = request_rights(current_user, row["client_id"], row["master_id"])[0]
+                    data["html"] = render_template(
+                        "_request_row.html", r=list_row(row, can_edit, show_internal)
+                    )
+                message = f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+                if event["id"]:
+                    message = f"id: {event['id']}\n" + message
+                yield message
+        finally:
+            watcher.unsubscribe(subscription)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/requests/export")
+@login_required
+def export_requests():
+    """
+    Выгрузка заявок в CSV или XLSX (?format=csv|xlsx) с фильтрами списка.
+    Файл отдаётся потоком по мере чтения строк из БД.
+    """
+    current_user = session.get("user", {})
+    fmt = request.args.get("format", "csv")
+    if fmt not in export.FORMATS:
+        abort(400)
+    filters, errors = pagination.parse_filters(request.args)
+    if errors:
+        abort(400)
+    # Заказчик выгружает только свои заявки
+    if current_user.get("user_type") == "Заказчик":
+        filters["client_id"] = current_user.get("user_id")
+
+    try:
+        conn = get_connection()
+    except FileNotFoundError:
+        abort(404)
+
+    filename = f"requests_{datetime.now():%Y%m%d_%H%M}.{fmt}"
+    return Response(
+        stream_with_context(export.export_stream(conn, filters, fmt)),
+        mimetype=export.FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.route("/search")
+@login_required
+def search_page():
+    """Полнотекстовый поиск заявок (страница)."""
+    current_user = session.get("user", {})
+    query = request.args.get("q", "").strip()
+    results = []
+    if query:
+        try:
+            conn = get_connection()
+        except FileNotFoundError as exc:
+            flash(str(exc), "danger")
+        else:
+            results = search.search_requests(conn, query, current_user)
+    return render_template("search.html",
+                            current_user=current_user,
+                            query=query,
+                            results=results)
+
+
+@app.route("/api/search")
+@login_required
+def api_search():
+    """Полнотекстовый поиск заявок: JSON со сниппетами, по убыванию релевантности."""
+    current_user = session.get("user", {})
+    query = request.args.get("q", "").strip()
+    limit = request.args.get("limit", search.DEFAULT_LIMIT, type=int)
+    try:
+        conn = get_connection()
+    except FileNotFoundError:
+        abort(503)
+    results = search.search_requests(conn, query, current_user, limit=limit)
+    return jsonify({"query": query, "results": results})
+
+
+@app.route("/api/clients")
+@login_required
+def api_clients():
+    """Автодополнение заказчика в формах заявок: JSON с первыми совпадениями."""
+    current_user = session.get("user", {})
+    if current_user.get("user_type") == "Заказчик":
+        abort(403)
+    query = request.args.get("q", "").strip()
+    limit = request.args.get("limit", client_lookup.DEFAULT_LIMIT, type=int)
+    try:
+        conn = get_connection()
+    except FileNotFoundError:
+        abort(503)
+    results = client_lookup.lookup_clients(conn, query, limit=limit)
+    return jsonify({"query": query, "results": results})
+
+
+def _inventory_items():
+    """Позиции из JSON {"items": [{"part_id", "quantity"}, ...]} или из формы."""
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        items = data.get("items")
+        return items if isinstance(items, list) else []
+    return list(zip(request.form.getlist("part_id"), request.form.getlist("quantity")))
+
+
+@app.route("/api/parts")
+@login_required
+def api_parts():
+    """Остатки склада; ?low=1 — только детали на минимуме и ниже."""
+    current_user = session.get("user", {})
+    if current_user.get("user_type") == "Заказчик":
+        abort(403)
+    try:
+        conn = get_connection()
+    except FileNotFoundError:
+        abort(503)
+    return jsonify({"parts": inventory.list_parts(conn, low_only=request.args.get("low") == "1")})
+
+
+@app.route("/api/parts/restock", methods=["POST"])
+@login_required
+def api_parts_restock():
+    """Пополнение склада сразу по многим позициям (менеджеры и администратор)."""
+    current_user = session.get("user", {})
+    if current_user.get("user_type") not in FULL_ACCESS_ROLES:
+        abort(403)
+    try:
+        conn = get_connection()
+    except FileNotFoundError:
+        abort(503)
+    try:
+        result = inventory.restock(conn, _inventory_items())
+    except inventory.InventoryError as exc:
+        return jsonify({"error": str(exc), "part_ids": exc.part_ids}), 409
+    return jsonify(result)
+
+
+@app.route("/api/requests/<int:request_id>/parts")
+@login_required
+def api_request_parts(request_id):
+    """Детали, зарезервированные и списанные под заявку."""
+    if not can_edit_request(request_id, session.get("user", {}))[0]:
+        abort(403)
+    try:
+        conn = get_connection()
+    except FileNotFoundError:
+        abort(503)
+    return jsonify({"request_id": request_id, "parts": inventory.request_parts(conn, request_id)})
+
+
+@app.route("/api/requests/<int:request_id>/parts/<action>", methods=["POST"])
+@login_required
+def api_request_parts_action(request_id, action):
+    """
+    Резерв (reserve), списание (consume) и возврат на склад (release)
+    деталей заявки — для тех, кто может менять её статус.
+    Для release передаются только part_ids (без них — весь резерв заявки).
+    """
+    if action not in ("reserve", "consume", "release"):
+        abort(404)
+    if not can_edit_request(request_id, session.get("user", {}))[1]:
+        abort(403)
+    try:
+        conn = get_connection()
+    except FileNotFoundError:
+        abort(503)
+    try:
+        if action == "release":
+            data = request.get_json(silent=True)
+            part_ids = (data.get("part_ids") if isinstance(data, dict)
+                        else request.form.getlist("part_id"))
+            inventory.release(conn, request_id, part_ids)
+        elif action == "reserve":
+            inventory.reserve(conn, request_id, _inventory_items())
+        else:
+            inventory.consume(conn, request_id, _inventory_items())
+    except inventory.InventoryError as exc:
+        return jsonify({"error": str(exc), "part_ids": exc.part_ids}), 409
+    # Уменьшение остатка могло породить уведомление о низком запасе
+    get_dispatcher().wake()
+    return jsonify({"request_id": request_id, "parts": inventory.request_parts(conn, request_id)})
 
 
 @app.route("/requests/new", methods=["GET", "POST"])
@@ -359,33 +794,13 @@ def new_request():
         flash(str(exc), "danger")
         return render_template("new_request.html",
                                 current_user=current_user,
-                                clients=[],
+                                selected_client=None,
                                 specialists=[],
                                 today=datetime.now().strftime("%Y-%m-%d"))
 
-    with conn:
-        cur = conn.cursor()
-        # Для заказчика показываем только его самого как клиента,
-        # для остальных ролей – всех активных заказчиков
-        if current_user.get("user_type") == "Заказчик":
-            cur.execute(
-                """
-                SELECT user_id, fio
-                FROM users
-                WHERE user_id = ? AND user_type = 'Заказчик' AND is_active = 1
-                """,
-                (current_user.get("user_id"),),
-            )
-        else:
-            cur.execute(
-                """
-                SELECT user_id, fio
-                FROM users
-                WHERE user_type = 'Заказчик' AND is_active = 1
-                ORDER BY fio
-                """
-            )
-        clients = cur.fetchall()
+    # Выбранный заказчик (после ошибки в форме поле остаётся заполненным);
+    # весь список заказчиков в форму не попадает — см. /api/clients
+    selected_client = None
 
     if request.method == "POST":
         # Заказчик всегда создаёт заявки только на себя, даже если подменить форму
@@ -399,66 +814,99 @@ def new_request():
         problem = request.form.get("problem_description", "").strip()
         master_id = request.form.get("master_id", "").strip() or None
 
+        if current_user.get("user_type") != "Заказчик" and client_id:
+            selected_client = client_lookup.find_client(conn, client_id)
+
         if not (client_id and start_date and climate_type and climate_model and problem):
             flash("Заполните все обязательные поля.", "warning")
+        elif current_user.get("user_type") != "Заказчик" and selected_client is None:
+            flash("Выберите заказчика из списка.", "warning")
         else:
             try:
                 datetime.strptime(start_date, "%Y-%m-%d")
             except ValueError:
                 flash("Дата должна быть в формате ГГГГ-ММ-ДД.", "warning")
             else:
-                with conn:
-                    cur = conn.cursor()
-                    cur.execute(
-                        """
-                        INSERT INTO requests (
-                            start_date,
-                            climate_tech_type,
-                            climate_tech_model,
-                            problem_description,
-                            request_status,
-                            client_id,
-                            master_id
-                        )
-                        VALUES (?, ?, ?, ?, 'Новая заявка', ?, ?)
-                        """,
-                        (start_date, climate_type, climate_model, problem, client_id, master_id),
-                    )
-                    request_id = cur.lastrowid
-                    cur.execute(
-                        "SELECT request_number FROM requests WHERE request_id = ?",
-                        (request_id,),
-                    )
-                    row = cur.fetchone()
+                # Номер и срок заявки считаются в самом INSERT и читаются через RETURNING
+                values = {
+                    "start_date": start_date,
+                    "climate_tech_type": climate_type,
+                    "climate_tech_model": climate_model,
+                    "problem_description": problem,
+                    "request_status": "Новая заявка",
+                    "client_id": client_id,
+                    "master_id": master_id,
+                }
+                engine = get_assignment_engine()
+                auto_assign = master_id is None and app.config.get("AUTO_ASSIGN")
+
+                def create_request(conn):
+                    # Автоназначение — в той же транзакции, что и INSERT
+                    created = conn.execute(queries.INSERT_REQUEST_SQL, values).fetchall()[0]
+                    master = engine.assign_request(conn, created["request_id"]) if auto_assign else None
+                    return created, master
+
+                row, assigned = run_write(create_request)
+                request_id = row["request_id"]
+                if not auto_assign:
+                    engine.apply_change(None, None, master_id, "Новая заявка")
 
                 flash(
                     f"Заявка создана. ID: {request_id}, номер: {row['request_number']}",
                     "success",
                 )
+                if assigned is not None:
+                    master = conn.execute(queries.USER_FIO_SQL, (assigned,)).fetchone()
+                    flash(f"Мастер назначен автоматически: {master['fio']}.", "info")
                 return redirect(url_for("requests_list", created="true"))
 
-    # Получаем список специалистов для назначения
-    with conn:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT user_id, fio, phone
-            FROM users
-            WHERE user_type IN ('Специалист', 'Менеджер') AND is_active = 1
-            ORDER BY fio
-            """
-        )
-        specialists = cur.fetchall()
-    
+    # Список специалистов для назначения
+    specialists = get_reference_cache().specialists(conn)
+
     today = datetime.now().strftime("%Y-%m-%d")
     
     return render_template("new_request.html",
                             current_user=session.get("user"),
-                            clients=clients,
+                            selected_client=selected_client,
                             specialists=specialists,
                             today=today)
 
 
+@app.route("/requests/assign", methods=["POST"])
+@login_required
+@manager_required
+def assign_backlog():
+    """
+    Пакетное автоназначение: все открытые заявки без мастера за один проход.
+    rebuild=1 — перед этим перечитать нагрузку мастеров из БД.
+    """
+    try:
+        conn = get_connection()
+    except FileNotFoundError:
+        abort(503)
+    engine = get_assignment_engine()
+    if request.values.get("rebuild") == "1":
+        engine.rebuild(conn)
+    result = engine.assign_backlog(conn, request.values.get("limit", type=int))
+    if result["assigned"]:
+        get_dispatcher().wake()
+    if request.is_json or request.accept_mimetypes.best == "application/json":
+        return jsonify(result)
+    flash(
+        f"Назначено заявок: {result['assigned']}, без подходящего специалиста: {result['skipped']}.",
+        "success" if result["assigned"] else "info",
+    )
+    return redirect(url_for("requests_list"))
+
+
+@app.route("/api/assignment")
+@login_required
+@manager_required
+def api_assignment():
+    """Счётчики нагрузки мастеров автоназначения."""
+    return jsonify(get_assignment_engine().stats())
+
+
 @app.route("/clients/new", methods=["GET", "POST"])
 @login_required
 def new_client():
@@ -480,26 +928,20 @@ def new_client():
             flash("Заполните все поля.", "warning")
         else:
             try:
-                conn = get_connection()
+                get_connection()
             except FileNotFoundError as exc:
                 flash(str(exc), "danger")
                 return redirect(url_for("requests_list"))
 
-            with conn:
-                cur = conn.cursor()
-                try:
-                    cur.execute(
-                        """
-                        INSERT INTO users (fio, phone, login, password, user_type)
-                        VALUES (?, ?, ?, ?, 'Заказчик')
-                        """,
-                        (fio, phone, login_value, password),
-                    )
-                    conn.commit()
-                    flash("Заказчик успешно создан.", "success")
-                    return redirect(url_for("new_request"))
-                except sqlite3.IntegrityError:
-                    flash("Логин уже используется. Выберите другой логин.", "danger")
+            try:
+                run_write(lambda conn: conn.execute(
+                    queries.INSERT_CLIENT_SQL, (fio, phone, login_value, password)
+                ).lastrowid)
+            except sqlite3.IntegrityError:
+                flash("Логин уже используется. Выберите другой логин.", "danger")
+            else:
+                flash("Заказчик успешно создан.", "success")
+                return redirect(url_for("new_request"))
 
     return render_template("new_client.html", current_user=session.get("user"))
 
@@ -523,50 +965,15 @@ def edit_request(request_id):
     
     with conn:
         cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT 
-                r.request_id, r.request_number, r.start_date,
-                r.climate_tech_type, r.climate_tech_model,
-                r.problem_description, r.request_status,
-                r.completion_date, r.master_id, r.client_id,
-                u.fio AS client_fio,
-                m.fio AS master_fio,
-                m.phone AS master_phone
-            FROM requests r
-            LEFT JOIN users u ON r.client_id = u.user_id
-            LEFT JOIN users m ON r.master_id = m.user_id
-            WHERE r.request_id = ?
-            """,
-            (request_id,)
-        )
+        cur.execute(queries.REQUEST_EDIT_SQL, (request_id,))
         request_data = cur.fetchone()
         
         if not request_data:
             flash("Заявка не найдена.", "danger")
             return redirect(url_for("requests_list"))
         
-        # Получаем список специалистов для назначения
-        cur.execute(
-            """
-            SELECT user_id, fio, phone
-            FROM users
-            WHERE user_type IN ('Специалист', 'Менеджер') AND is_active = 1
-            ORDER BY fio
-            """
-        )
-        specialists = cur.fetchall()
-        
-        # Получаем список заказчиков (для менеджера)
-        cur.execute(
-            """
-            SELECT user_id, fio
-            FROM users
-            WHERE user_type = 'Заказчик' AND is_active = 1
-            ORDER BY fio
-            """
-        )
-        clients = cur.fetchall()
+    # Список специалистов; заказчик выбирается через /api/clients
+    specialists = get_reference_cache().specialists(conn)
     
     if request.method == "POST":
         start_date = request.form.get("start_date", "").strip()
@@ -577,86 +984,269 @@ def edit_request(request_id):
         completion_date = request.form.get("completion_date", "").strip() or None
         master_id = request.form.get("master_id", "").strip() or None
         client_id = request.form.get("client_id", "").strip() if can_all else None
+        priority = request.form.get("priority", "").strip() or request_data["priority"]
+        estimated_time = request.form.get("estimated_time", "").strip() or None
+        if can_all:
+            deadline_extension = request.form.get("deadline_extension", "").strip() or None
+            extension_reason = request.form.get("extension_reason", "").strip() or None
+        else:
+            deadline_extension = request_data["deadline_extension"]
+            extension_reason = request_data["extension_reason"]
         
         if not (start_date and climate_type and climate_model and problem):
             flash("Заполните все обязательные поля.", "warning")
+        elif can_status and priority not in deadlines.PRIORITIES:
+            flash("Выберите приоритет из списка.", "warning")
+        elif estimated_time is not None and not estimated_time.isdigit():
+            flash("Оценка времени — целое число часов.", "warning")
+        elif (client_id and client_id != str(request_data["client_id"])
+              and client_lookup.find_client(conn, client_id) is None):
+            flash("Выберите заказчика из списка.", "warning")
         else:
             try:
                 datetime.strptime(start_date, "%Y-%m-%d")
                 if completion_date:
                     datetime.strptime(completion_date, "%Y-%m-%d")
+                if deadline_extension:
+                    datetime.strptime(deadline_extension, "%Y-%m-%d")
             except ValueError:
                 flash("Дата должна быть в формате ГГГГ-ММ-ДД.", "warning")
             else:
-                with conn:
-                    cur = conn.cursor()
-                    
-                    # Формируем SQL запрос в зависимости от прав
-                    if can_all:
-                        # Менеджер может менять всё
-                        cur.execute(
-                            """
-                            UPDATE requests SET
-                                start_date = ?,
-                                climate_tech_type = ?,
-                                climate_tech_model = ?,
-                                problem_description = ?,
-                                request_status = ?,
-                                completion_date = ?,
-                                master_id = ?,
-                                client_id = ?
-                            WHERE request_id = ?
-                            """,
-                            (start_date, climate_type, climate_model, problem,
-                            status, completion_date, master_id, client_id or request_data['client_id'],
-                            request_id)
-                        )
-                    elif can_status:
-                        # Оператор/Специалист может менять статус и базовые данные
-                        cur.execute(
-                            """
-                            UPDATE requests SET
-                                start_date = ?,
-                                climate_tech_type = ?,
-                                climate_tech_model = ?,
-                                problem_description = ?,
-                                request_status = ?,
-                                completion_date = ?,
-                                master_id = ?
-                            WHERE request_id = ?
-                            """,
-                            (start_date, climate_type, climate_model, problem,
-                            status, completion_date, master_id, request_id)
-                        )
-                    else:
-                        # Заказчик может менять только дату и проблему
-                        cur.execute(
-                            """
-                            UPDATE requests SET
-                                start_date = ?,
-                                problem_description = ?
-                            WHERE request_id = ?
-                            """,
-                            (start_date, problem, request_id)
-                        )
+                # Формируем SQL запрос в зависимости от прав
+                if can_all:
+                    # Менеджер может менять всё
+                    update = (
+                        queries.UPDATE_REQUEST_ALL_SQL,
+                        (start_date, climate_type, climate_model, problem,
+                        status, completion_date, master_id, client_id or request_data['client_id'],
+                        priority, estimated_time, deadline_extension, extension_reason,
+                        request_id)
+                    )
+                elif can_status:
+                    # Оператор/Специалист может менять статус и базовые данные
+                    update = (
+                        queries.UPDATE_REQUEST_STATUS_SQL,
+                        (start_date, climate_type, climate_model, problem,
+                        status, completion_date, master_id, priority, estimated_time,
+                        request_id)
+                    )
+                else:
+                    # Заказчик может менять только дату и проблему
+                    update = (queries.UPDATE_REQUEST_CLIENT_SQL, (start_date, problem, request_id))
+                def save(conn):
+                    # Прежние мастер и статус — из той же транзакции, что и UPDATE:
+                    # данные формы могли устареть из-за параллельной правки
+                    previous = conn.execute(queries.REQUEST_MASTER_STATUS_SQL, (request_id,)).fetchone()
+                    # updated_at задан в самом UPDATE — триггер строку не переписывает
+                    if previous is None or not conn.execute(*update).rowcount:
+                        return None
+                    return previous
+
+                previous = run_write(save)
+                if previous is None:
+                    # Заявку успели удалить
+                    flash("Заявка не найдена.", "danger")
+                    return redirect(url_for("requests_list"))
                 
+                if can_status:
+                    get_assignment_engine().apply_change(
+                        previous[0], previous[1], master_id, status,
+                    )
+                # Смена статуса могла породить уведомления — доставим их сразу
+                get_dispatcher().wake()
                 flash("Заявка успешно обновлена.", "success")
                 return redirect(url_for("requests_list", edited="true"))
     
-    # Статусы заявок
-    statuses = ['Новая заявка', 'В процессе ремонта', 'Ожидание комплектующих', 
-                'Готова к выдаче', 'Завершена', 'Отменена']
-    
     return render_template("edit_request.html",
                             current_user=current_user,
                             request_data=request_data,
                             specialists=specialists,
-                            clients=clients if can_all else [],
-                            statuses=statuses,
+                            statuses=REQUEST_STATUSES,
+                            priorities=deadlines.PRIORITIES,
                             can_all=can_all,
                             can_status=can_status)
 
 
+def _deadline_page(conn, current_user):
+    """Страница списка сроков по параметрам запроса; мастер видит только свои заявки."""
+    view = request.args.get("view", "overdue")
+    if view not in deadlines.VIEWS:
+        view = "overdue"
+    master_id = current_user.get("user_id") if current_user.get("user_type") == "Специалист" else None
+    items, next_cursor = deadlines.fetch(
+        conn, view, master_id=master_id,
+        cursor=deadlines.decode_cursor(request.args.get("cursor")),
+        limit=deadlines.page_size(request.args.get("limit")),
+    )
+    return view, master_id, items, next_cursor
+
+
+@app.route("/requests/deadlines")
+@login_required
+def request_deadlines():
+    """Просроченные заявки и заявки со сроком сегодня (для сотрудников)."""
+    current_user = session.get("user", {})
+    if current_user.get("user_type") == "Заказчик":
+        flash("Сроки заявок доступны только сотрудникам.", "warning")
+        return redirect(url_for("requests_list"))
+    try:
+        conn = get_connection()
+    except FileNotFoundError as exc:
+        flash(str(exc), "danger")
+        return redirect(url_for("requests_list"))
+    view, master_id, items, next_cursor = _deadline_page(conn, current_user)
+    return render_template("deadlines.html",
+                            current_user=current_user,
+                            views=deadlines.VIEWS,
+                            view=view,
+                            counts=deadlines.counts(conn, master_id=master_id),
+                            items=items,
+                            status_classes=STATUS_CLASSES,
+                            next_cursor=next_cursor,
+                            is_first_page=not request.args.get("cursor"))
+
+
+@app.route("/api/requests/deadlines")
+@login_required
+def api_request_deadlines():
+    current_user = session.get("user", {})
+    if current_user.get("user_type") == "Заказчик":
+        abort(403)
+    try:
+        conn = get_connection()
+    except FileNotFoundError:
+        abort(503)
+    view, _, items, next_cursor = _deadline_page(conn, current_user)
+    return jsonify({"view": view, "items": items, "next_cursor": next_cursor})
+
+
+def _timeline_page(conn, request_id, current_user):
+    cursor = timeline.decode_cursor(request.args.get("cursor"))
+    limit = timeline.page_size(request.args.get("limit"))
+    events, next_cursor = timeline.fetch_events(
+        conn, request_id,
+        include_internal=current_user.get("user_type") != "Заказчик",
+        cursor=cursor, limit=limit,
+    )
+    return events, next_cursor, cursor is None
+
+
+@app.route("/requests/<int:request_id>/timeline")
+@login_required
+def request_timeline(request_id):
+    """История заявки: смены статуса, детали и комментарии, от новых к старым."""
+    current_user = session.get("user", {})
+    if not can_view_request(request_id, current_user):
+        flash("У вас нет доступа к этой заявке.", "danger")
+        return redirect(url_for("requests_list"))
+    try:
+        conn = get_connection()
+    except FileNotFoundError as exc:
+        flash(str(exc), "danger")
+        return redirect(url_for("requests_list"))
+    request_data = conn.execute(queries.REQUEST_HEADER_SQL, (request_id,)).fetchone()
+    if request_data is None:
+        flash("Заявка не найдена.", "danger")
+        return redirect(url_for("requests_list"))
+    events, next_cursor, is_first_page = _timeline_page(conn, request_id, current_user)
+    return render_template("request_timeline.html",
+                            current_user=current_user,
+                            can_comment=can_edit_request(request_id, current_user)[0],
+                            request_data=request_data,
+                            status_class=STATUS_CLASSES.get(request_data["request_status"], "bg-info"),
+                            events=events,
+                            next_cursor=next_cursor,
+                            is_first_page=is_first_page)
+
+
+@app.route("/api/requests/<int:request_id>/timeline")
+@login_required
+def api_request_timeline(request_id):
+    """История заявки в JSON: ?cursor=&limit= для следующих страниц."""
+    current_user = session.get("user", {})
+    if not can_view_request(request_id, current_user):
+        abort(403)
+    try:
+        conn = get_connection()
+    except FileNotFoundError:
+        abort(503)
+    events, next_cursor, _ = _timeline_page(conn, request_id, current_user)
+    return jsonify({"request_id": request_id, "events": events, "next_cursor": next_cursor})
+
+
+def _comment_items():
+    """Комментарии из JSON ({"message", "is_internal"} или {"comments": [...]}) или из формы."""
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        items = data.get("comments")
+        return items if isinstance(items, list) else [data]
+    return [{"message": request.form.get("message"), "is_internal": request.form.get("is_internal")}]
+
+
+@app.route("/api/requests/<int:request_id>/comments", methods=["GET", "POST"])
+@login_required
+def api_request_comments(request_id):
+    """
+    GET — комментарии заявки после ?after= (внутренние заказчику не видны).
+    POST — добавить один или несколько комментариев одной транзакцией.
+    """
+    current_user = session.get("user", {})
+    show_internal = current_user.get("user_type") != "Заказчик"
+    if not can_view_request(request_id, current_user):
+        abort(403)
+    try:
+        conn = get_connection()
+    except FileNotFoundError:
+        abort(503)
+
+    if request.method == "GET":
+        items = comments.list_comments(
+            conn, request_id, include_internal=show_internal,
+            after_id=request.args.get("after", 0, type=int),
+            limit=request.args.get("limit", comments.PAGE_SIZE, type=int),
+        )
+        return jsonify({"request_id": request_id, "comments": items})
+
+    if not can_edit_request(request_id, current_user)[0]:
+        abort(403)
+    try:
+        items = comments.normalize_comments(_comment_items(), allow_internal=show_internal)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    if not items:
+        return jsonify({"error": "Комментарий пустой."}), 400
+    ids = comments.add_comments(conn, request_id, current_user.get("user_id"), items)
+    return jsonify({"request_id": request_id, "ids": ids}), 201
+
+
+@app.route("/requests/<int:request_id>/comments", methods=["POST"])
+@login_required
+def add_request_comment(request_id):
+    """Комментарий из формы на странице истории заявки."""
+    current_user = session.get("user", {})
+    if not can_edit_request(request_id, current_user)[0]:
+        flash("У вас нет прав комментировать эту заявку.", "danger")
+        return redirect(url_for("requests_list"))
+    try:
+        conn = get_connection()
+    except FileNotFoundError as exc:
+        flash(str(exc), "danger")
+        return redirect(url_for("requests_list"))
+    try:
+        items = comments.normalize_comments(
+            _comment_items(), allow_internal=current_user.get("user_type") != "Заказчик"
+        )
+    except ValueError as exc:
+        flash(str(exc), "warning")
+    else:
+        if items:
+            comments.add_comments(conn, request_id, current_user.get("user_id"), items)
+            flash("Комментарий добавлен.", "success")
+        else:
+            flash("Комментарий пустой.", "warning")
+    return redirect(url_for("request_timeline", request_id=request_id))
+
+
 @app.route("/stats")
 @login_required
 def stats():
@@ -670,41 +1260,9 @@ def stats():
                                 avg_days_str=None,
                                 type_rows=[])
 
-    with conn:
-        cur = conn.cursor()
-
-        cur.execute(
-            """
-            SELECT COUNT(*) AS cnt
-            FROM requests
-            WHERE request_status = 'Завершена'
-            """
-        )
-        finished_count = cur.fetchone()["cnt"]
-
-        cur.execute(
-            """
-            SELECT
-                AVG(
-                    JULIANDAY(completion_date) - JULIANDAY(start_date)
-                ) AS avg_days
-            FROM requests
-            WHERE request_status = 'Завершена'
-                    AND completion_date IS NOT NULL
-            """
-        )
-        avg_row = cur.fetchone()
-        avg_days = avg_row["avg_days"]
-
-        cur.execute(
-            """
-            SELECT climate_tech_type, COUNT(*) AS cnt
-            FROM requests
-            GROUP BY climate_tech_type
-            ORDER BY cnt DESC
-            """
-        )
-        type_rows = cur.fetchall()
+    # Счётчики поддерживаются триггерами (см. stats_summary.py),
+    # поэтому здесь читается только небольшая сводная таблица
+    finished_count, avg_days, type_rows = stats_summary.read_stats(conn)
 
     avg_days_str = f"{avg_days:.2f}" if avg_days is not None else None
     
@@ -719,7 +1277,50 @@ def stats():
                             current_user=session.get("user"),
                             finished_count=finished_count,
                             avg_days_str=avg_days_str,
-                            type_rows=type_rows)
+                            type_rows=type_rows,
+                            periods=analytics.PERIODS,
+                            priorities=deadlines.PRIORITIES)
+
+
+@app.route("/api/stats")
+@login_required
+def api_stats():
+    """
+    Аналитика по дневным сводкам (analytics.py): ряд созданных и завершённых
+    заявок по period (day, week, month), длительность ремонта с медианой
+    и p90, разбивки по мастерам и приоритетам. Фильтры: date_from, date_to
+    (ГГГГ-ММ-ДД) и priority; разбивка по мастерам — помесячная.
+    Маршрут только читает: сводки дозаполняет поток analytics.Refresher.
+    """
+    try:
+        conn = get_connection()
+    except FileNotFoundError:
+        abort(503)
+    period = request.args.get("period", "day")
+    if period not in analytics.PERIODS:
+        return jsonify({"error": f"period: одно из {', '.join(analytics.PERIODS)}"}), 400
+    filters = {}
+    for name in ("date_from", "date_to"):
+        value = request.args.get(name, "").strip()
+        if value:
+            try:
+                datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                return jsonify({"error": f"{name}: дата в формате ГГГГ-ММ-ДД"}), 400
+            filters[name] = value
+    if request.args.get("priority"):
+        filters["priority"] = request.args["priority"]
+
+    # Новые строки попадут в сводки в фоне — к следующему запросу
+    get_analytics_refresher().wake()
+    return jsonify({
+        "period": period,
+        "filters": filters,
+        "series": analytics.series(conn, period, filters),
+        "duration": analytics.durations(conn, filters),
+        "by_master": analytics.breakdown(conn, "master", filters),
+        "by_priority": analytics.breakdown(conn, "priority", filters),
+    })
 
 
 @app.route("/users/manage", methods=["GET", "POST"])
@@ -743,40 +1344,25 @@ def manage_users():
             flash("Ошибка: не указаны данные.", "danger")
         else:
             try:
-                with conn:
-                    cur = conn.cursor()
-                    # Обновляем роль и статус
-                    is_active_value = 1 if is_active == "1" else 0
-                    cur.execute(
-                        """
-                        UPDATE users 
-                        SET user_type = ?, is_active = ?
-                        WHERE user_id = ?
-                        """,
-                        (new_role, is_active_value, user_id)
-                    )
-                    conn.commit()
-                    
-                    # Получаем имя пользователя для сообщения
-                    cur.execute("SELECT fio FROM users WHERE user_id = ?", (user_id,))
-                    user = cur.fetchone()
-                    if user:
-                        flash(f"Роль пользователя '{user['fio']}' изменена на '{new_role}'.", "success")
-                    else:
-                        flash("Роль изменена.", "success")
+                # Обновляем роль и статус; имя пользователя для сообщения — из RETURNING
+                is_active_value = 1 if is_active == "1" else 0
+                updated = run_write(lambda conn: conn.execute(
+                    queries.UPDATE_USER_ROLE_SQL, (new_role, is_active_value, user_id)
+                ).fetchall())
+                get_reference_cache().invalidate()
+                get_assignment_engine().invalidate()
+
+                if updated:
+                    flash(f"Роль пользователя '{updated[0]['fio']}' изменена на '{new_role}'.", "success")
+                else:
+                    flash("Роль изменена.", "success")
             except Exception as e:
                 flash(f"Ошибка: {str(e)}", "danger")
     
     # Получаем список всех пользователей
     with conn:
         cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT user_id, fio, phone, login, user_type, registration_date, is_active
-            FROM users
-            ORDER BY user_type, fio
-            """
-        )
+        cur.execute(queries.USERS_LIST_SQL)
         users = cur.fetchall()
     
     return render_template("manage_users.html",
@@ -784,43 +1370,169 @@ def manage_users():
                         users=users)
 
 
+@app.route("/notifications")
+@login_required
+def notifications_page():
+    """Уведомления текущего пользователя (последние FEED_SIZE)."""
+    current_user = session.get("user", {})
+    try:
+        conn = get_connection()
+    except FileNotFoundError as exc:
+        flash(str(exc), "danger")
+        return redirect(url_for("requests_list"))
+    items = notifications.user_notifications(conn, current_user.get("user_id"))
+    return render_template("notifications.html",
+                            current_user=current_user,
+                            items=items)
+
+
+@app.route("/notifications/read", methods=["POST"])
+@login_required
+def notifications_read():
+    """Отметить прочитанными все уведомления пользователя (или с id <= up_to)."""
+    current_user = session.get("user", {})
+    up_to = request.form.get("up_to", type=int)
+    try:
+        conn = get_connection()
+    except FileNotFoundError:
+        abort(503)
+    count = notifications.mark_read(conn, current_user.get("user_id"), up_to)
+    if app.config.get("NOTIFICATION_FEED_IN_MEMORY"):
+        get_notification_feed().discard(current_user.get("user_id"), up_to)
+    if request.accept_mimetypes.best == "application/json":
+        return jsonify({"marked": count})
+    return redirect(url_for("notifications_page"))
+
+
+@app.route("/api/notifications")
+@login_required
+def api_notifications():
+    """
+    Новые непрочитанные уведомления (id больше after) и число непрочитанных.
+    Читаются из таблицы notifications, поэтому любой процесс сервера видит
+    все уведомления; при NOTIFICATION_FEED_IN_MEMORY — из ленты в памяти.
+    """
+    current_user = session.get("user", {})
+    user_id = current_user.get("user_id")
+    after = request.args.get("after", 0, type=int)
+    try:
+        conn = get_connection()
+    except FileNotFoundError:
+        abort(503)
+    if app.config.get("NOTIFICATION_FEED_IN_MEMORY"):
+        items = get_notification_feed().recent(user_id, after)
+    else:
+        items = notifications.unread_after(conn, user_id, after)
+    return jsonify({
+        "unread": notifications.unread_count(conn, user_id),
+        "items": items,
+    })
+
+
+@app.route("/metrics")
+def metrics_page():
+    """
+    Метрики маршрутов и SQLite в текстовом формате Prometheus.
+    Доступ: менеджер или токен METRICS_TOKEN в заголовке Authorization.
+    """
+    token = app.config.get("METRICS_TOKEN")
+    if not (token and request.headers.get("Authorization") == f"Bearer {token}"):
+        if session.get("user", {}).get("user_type") != "Менеджер":
+            abort(403)
+    return Response(app.extensions["metrics"].render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/db/stats")
+@login_required
+@manager_required
+def db_stats():
+    """Статистика пула соединений с БД и очереди записи."""
+    return jsonify(dict(db.get_pool().stats(), write_queue=get_write_queue().stats()))
+
+
 @app.route("/qr/<int:request_id>")
 @login_required
 def qr_for_request(request_id: int):
     """
     Генерация QR‑кода для формы отзыва.
-    Для простоты ТЗ генерируем QR на одну и ту же форму,
-    можно добавить параметры (request_id, client_id) в URL.
+    В ссылку добавляется токен заявки, готовые PNG берутся из кэша,
+    а повторный запрос с тем же ETag получает 304.
     """
+    # Токен — секрет заявки, к которому привязан отзыв: только тем, кто видит заявку
+    if not can_view_request(request_id, session.get("user", {})):
+        abort(403)
     try:
         conn = get_connection()
     except FileNotFoundError:
         abort(404)
 
-    with conn:
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT request_id FROM requests WHERE request_id = ?",
-            (request_id,),
-        )
-        row = cur.fetchone()
-
-    if row is None:
+    token = qr_codes.get_token(conn, request_id)
+    if token is None:
         abort(404)
 
-    # Можно добавить идентификатор заявки как параметр в ссылку
-    url = f"{FEEDBACK_FORM_URL}"
+    url = qr_codes.feedback_url(token, app.config["FEEDBACK_FORM_ENTRY"])
+    etag = qr_codes.content_key(url)
+    if etag in request.if_none_match:
+        # Повторное сканирование: PNG не нужен ни из кэша, ни отрисованный
+        response = Response(status=304)
+    else:
+        etag, png = get_qr_cache().get(url)
+        response = Response(png, mimetype="image/png")
+
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = QR_CACHE_MAX_AGE
+    return response
+
+
+@app.route("/qr/labels")
+@login_required
+def qr_labels_sheet():
+    """
+    Лист наклеек с QR-кодами: ?ids=1,2,3 или фильтр status/date_from/date_to,
+    формат ?format=pdf|png. Заказчикам недоступно.
+    """
+    current_user = session.get("user", {})
+    if current_user.get("user_type") == "Заказчик":
+        flash("Печать наклеек доступна только сотрудникам.", "danger")
+        return redirect(url_for("requests_list"))
 
-    qr = qrcode.QRCode(box_size=10, border=4)
-    qr.add_data(url)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
+    fmt = request.args.get("format", "pdf")
+    if fmt not in qr_labels.FORMATS:
+        abort(400)
+
+    request_ids = None
+    raw_ids = request.args.get("ids", "").strip()
+    if raw_ids:
+        try:
+            request_ids = [int(part) for part in raw_ids.split(",") if part.strip()]
+        except ValueError:
+            abort(400)
+    filters, errors = pagination.parse_filters(request.args)
+    if errors:
+        abort(400)
 
-    buffer = io.BytesIO()
-    img.save(buffer, format="PNG")
-    buffer.seek(0)
+    try:
+        conn = get_connection()
+    except FileNotFoundError:
+        abort(404)
 
-    return send_file(buffer, mimetype="image/png")
+    rows = qr_labels.select_requests(conn, request_ids, filters)
+    if not rows:
+        abort(404)
+    if fmt == "png" and qr_labels.page_count(len(rows)) > qr_labels.MAX_PNG_PAGES:
+        abort(400, description=(
+            f"PNG — не больше {qr_labels.MAX_PNG_PAGES * qr_labels.LABELS_PER_PAGE} наклеек, "
+            "для большего числа выберите PDF."
+        ))
+    pool = get_label_pool() if len(rows) >= qr_labels.PARALLEL_THRESHOLD else None
+    document = qr_labels.build_label_sheet(conn, rows, fmt, pool, app.config["FEEDBACK_FORM_ENTRY"])
+    return send_file(
+        io.BytesIO(document),
+        mimetype=qr_labels.FORMATS[fmt],
+        as_attachment=True,
+        download_name=f"qr_labels.{fmt}",
+    )
 
 
 if __name__ == "__main__":
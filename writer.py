@@ -0,0 +1,179 @@
+"""
+Очередь записи: один поток-писатель с групповой фиксацией.
+
+Когда запись ведёт каждый поток запросов на своём соединении, одновременные
+сохранения заявок ждут друг друга на блокировке файла (busy_timeout,
+а при долгом ожидании — «database is locked»), и каждое сохранение
+фиксируется отдельно.
+
+Здесь запись в БД ведёт один поток со своим соединением. Потоки запросов
+передают ему операции — функции operation(conn, *args) — и ждут
+результат (concurrent.futures.Future). Писатель забирает из очереди
+все операции, накопившиеся, пока фиксировалась предыдущая пачка
+(не больше MAX_BATCH), и выполняет их в одной транзакции
+BEGIN IMMEDIATE ... COMMIT, каждую в своей точке сохранения:
+ошибка операции откатывает только её и передаётся вызывающему, остальные
+фиксируются. Результаты отдаются после COMMIT, так что вызывающий видит
+уже зафиксированные данные.
+
+Операция не должна сама завершать транзакцию (commit, rollback,
+«with conn:») и должна вернуть готовые значения, а не курсор.
+"""
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+from db import DEFAULT_PRAGMAS
+
+logger = logging.getLogger(__name__)
+
+# Сколько писатель дополнительно ждёт попутные операции после первой, с.
+# 0 — брать только уже ожидающие: под нагрузкой пачки складываются сами,
+# а одиночная запись не ждёт (см. benchmarks/bench_write_queue.py)
+MAX_DELAY = 0.0
+MAX_BATCH = 64
+# Сколько вызывающий ждёт результата операции, с
+RESULT_TIMEOUT = 30
+
+
+class WriteQueue:
+    """Поток-писатель: операции записи из разных потоков, групповая фиксация."""
+
+    def __init__(self, db_path, pragmas=DEFAULT_PRAGMAS, max_batch=MAX_BATCH, max_delay=MAX_DELAY,
+                 on_connect=()):
+        self.db_path = db_path
+        self.pragmas = pragmas
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        # Функции hook(conn) для соединения писателя (как ConnectionPool.on_connect)
+        self.on_connect = list(on_connect)
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._conn = None
+        self.batches = 0
+        self.operations = 0
+        self.failed = 0
+        self.largest_batch = 0
+
+    def _connection(self):
+        if self._conn is None:
+            # Транзакциями управляет сам писатель: BEGIN/SAVEPOINT/COMMIT
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            for name, value in self.pragmas:
+                conn.execute(f"PRAGMA {name} = {value}")
+            for hook in self.on_connect:
+                hook(conn)
+            self._conn = conn
+        return self._conn
+
+    def submit(self, operation, *args):
+        """Ставит operation(conn, *args) в очередь. Возвращает Future с её результатом."""
+        self.start()
+        future = Future()
+        self._queue.put((future, operation, args))
+        return future
+
+    def execute(self, operation, *args, timeout=RESULT_TIMEOUT):
+        """Выполняет операцию через очередь и возвращает её результат (или поднимает её ошибку)."""
+        return self.submit(operation, *args).result(timeout)
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Остановка: текущую пачку ещё фиксируем
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _commit(self, batch):
+        """Выполняет пачку в одной транзакции и раздаёт результаты после COMMIT."""
+        done = []
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            for future, operation, args in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT write_operation")
+                try:
+                    result = operation(conn, *args)
+                except Exception as exc:
+                    conn.execute("ROLLBACK TO write_operation")
+                    conn.execute("RELEASE write_operation")
+                    done.append((future, exc, False))
+                else:
+                    conn.execute("RELEASE write_operation")
+                    done.append((future, result, True))
+            conn.execute("COMMIT")
+        except sqlite3.Error as exc:
+            # Не удалось начать или зафиксировать транзакцию, либо операция её завершила сама
+            logger.exception("Ошибка групповой записи")
+            if self._conn is not None and self._conn.in_transaction:
+                self._conn.rollback()
+            started = {id(future) for future, _, _ in done}
+            done = [(future, exc, False) for future, _, _ in done]
+            done += [(future, exc, False) for future, _, _ in batch
+                     if id(future) not in started and not future.done()]
+
+        with self._lock:
+            self.batches += 1
+            self.operations += len(done)
+            self.largest_batch = max(self.largest_batch, len(batch))
+            self.failed += sum(1 for _, _, ok in done if not ok)
+        for future, value, ok in done:
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            self._commit(self._collect(item))
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="writer", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=5):
+        """Останавливает поток; уже поставленные операции выполняются."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "running": self.running,
+                "batches": self.batches,
+                "operations": self.operations,
+                "failed": self.failed,
+                "largest_batch": self.largest_batch,
+                "average_batch": round(self.operations / self.batches, 2) if self.batches else 0,
+            }